@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='examplemodel',
+            index=models.Index(fields=['-created_at', '-id'], name='example_created_id_idx'),
+        ),
+    ]
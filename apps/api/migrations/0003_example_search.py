@@ -0,0 +1,85 @@
+"""
+Search indexes for search_examples, see core/utils/search.py
+
+PostgreSQL gets GIN trigram indexes on name and description, built
+concurrently so large tables stay writable. SQLite gets an external
+content FTS5 table with the trigram tokenizer, kept in sync by triggers.
+Other databases fall back to unindexed `icontains` lookups.
+"""
+import sqlite3
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+POSTGRESQL_FORWARDS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS example_name_trgm_idx "
+    "ON example_model USING gin (name gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS example_description_trgm_idx "
+    "ON example_model USING gin (description gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARDS = [
+    "DROP INDEX CONCURRENTLY IF EXISTS example_name_trgm_idx",
+    "DROP INDEX CONCURRENTLY IF EXISTS example_description_trgm_idx",
+]
+
+SQLITE_FORWARDS = [
+    "CREATE VIRTUAL TABLE example_search USING fts5("
+    "name, description, content='example_model', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER example_search_ai AFTER INSERT ON example_model BEGIN "
+    "INSERT INTO example_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER example_search_ad AFTER DELETE ON example_model BEGIN "
+    "INSERT INTO example_search(example_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER example_search_au AFTER UPDATE OF name, description ON example_model BEGIN "
+    "INSERT INTO example_search(example_search, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO example_search(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "INSERT INTO example_search(example_search) VALUES ('rebuild')",
+]
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS example_search_ai",
+    "DROP TRIGGER IF EXISTS example_search_ad",
+    "DROP TRIGGER IF EXISTS example_search_au",
+    "DROP TABLE IF EXISTS example_search",
+]
+
+# The FTS5 trigram tokenizer ships with SQLite 3.34+
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def run(schema_editor, postgresql, sqlite):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = postgresql
+    elif vendor == "sqlite" and SQLITE_TRIGRAM:
+        statements = sqlite
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def create_search_indexes(apps, schema_editor):
+    run(schema_editor, POSTGRESQL_FORWARDS, SQLITE_FORWARDS)
+
+
+def drop_search_indexes(apps, schema_editor):
+    run(schema_editor, POSTGRESQL_BACKWARDS, SQLITE_BACKWARDS)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0002_example_created_id_idx'),
+    ]
+
+    operations = [
+        # No-op outside PostgreSQL
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
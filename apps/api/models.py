@@ -15,6 +15,10 @@ class ExampleModel(models.Model):
     class Meta:
         db_table = "example_model"
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination walks (created_at, id), see core/utils/pagination.py
+            models.Index(fields=["-created_at", "-id"], name="example_created_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,55 @@
+"""
+Per-request DataLoaders
+
+A fresh set of loaders is created for every request by ``get_loaders``
+(see ``get_context`` in core/asgi.py) so cached rows never leak between
+requests. Resolvers reach them through ``info.context["loaders"]``.
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from strawberry.dataloader import DataLoader
+
+from .types import ExampleType
+from apps.api.models import ExampleModel
+from core.utils.db import database_sync_to_async
+
+
+# (primary key, columns to load - see core.utils.selection.get_only_fields)
+ExampleKey = Tuple[int, Tuple[str, ...]]
+
+
+@database_sync_to_async
+def load_examples(keys: List[ExampleKey]) -> List[Optional[ExampleType]]:
+    """
+    Fetch every requested ExampleModel with a single id__in query,
+    loading the union of the columns selected across the batch
+    """
+    ids = {pk for pk, _ in keys}
+    columns = {column for _, selected in keys for column in selected}
+    queryset = ExampleModel.objects.filter(id__in=ids).values_list(*columns, named=True)
+    rows = {row.id: row for row in queryset}
+    return [
+        ExampleType.from_row(rows[pk]) if pk in rows else None
+        for pk, _ in keys
+    ]
+
+
+@dataclass
+class Loaders:
+    """
+    DataLoaders available to resolvers
+    Add your loaders here
+    """
+    example: DataLoader[ExampleKey, Optional[ExampleType]] = field(
+        default_factory=lambda: DataLoader(load_fn=load_examples)
+    )
+
+    def clear_all(self) -> None:
+        """Forget every cached row, e.g. after a mutation of a batch"""
+        for loader in vars(self).values():
+            loader.clear_all()
+
+
+def get_loaders() -> Loaders:
+    return Loaders()
@@ -1,7 +1,26 @@
 import strawberry
-from typing import Optional
-from .types import ExampleType, ExampleInput
+from typing import Dict, List, Optional, Sequence
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .types import (
+    EXAMPLES_TAG,
+    ExampleInput,
+    ExampleResult,
+    ExampleType,
+    ExampleUpdateInput,
+    MutationError,
+    example_tag,
+)
+from .subscriptions import ExampleChangeKind, publish_example_changes, publish_example_deletions
 from apps.api.models import ExampleModel
+from core.utils.cost import cost_policy, list_length
+from core.utils.db import database_sync_to_async
+from core.utils.response_cache import invalidate
+
+# Fields update_examples may change
+UPDATABLE_FIELDS = ("name", "description", "is_active")
 
 
 @strawberry.type
@@ -12,34 +31,240 @@ class Mutation:
     """
     
     @strawberry.mutation
-    def create_example(self, input: ExampleInput) -> ExampleType:
+    async def create_example(self, input: ExampleInput) -> ExampleType:
         """Create a new example in the database"""
-        obj = ExampleModel.objects.create(
-            name=input.name,
-            description=input.description,
-            is_active=input.is_active
-        )
-        return ExampleType.from_model(obj)
+        example = await insert_example(input)
+        await invalidate(EXAMPLES_TAG)
+        publish_example_changes(ExampleChangeKind.CREATED, [example])
+        return example
     
     @strawberry.mutation
-    def update_example(self, id: strawberry.ID, input: ExampleInput) -> Optional[ExampleType]:
+    async def update_example(self, id: strawberry.ID, input: ExampleInput) -> Optional[ExampleType]:
         """Update an existing example in the database"""
-        try:
-            obj = ExampleModel.objects.get(id=int(id))
-            obj.name = input.name
-            obj.description = input.description
-            obj.is_active = input.is_active
-            obj.save()
-            return ExampleType.from_model(obj)
-        except ExampleModel.DoesNotExist:
-            return None
+        pk = int(id)
+        example = await save_example(pk, input)
+        if example is not None:
+            await invalidate(EXAMPLES_TAG, example_tag(pk))
+            publish_example_changes(ExampleChangeKind.UPDATED, [example])
+        return example
     
     @strawberry.mutation
-    def delete_example(self, id: strawberry.ID) -> bool:
+    async def delete_example(self, id: strawberry.ID) -> bool:
         """Delete an example from the database"""
+        pk = int(id)
+        deleted = await remove_example(pk)
+        if deleted:
+            await invalidate(EXAMPLES_TAG, example_tag(pk))
+            publish_example_deletions([pk])
+        return deleted
+    
+    @strawberry.mutation(metadata=cost_policy(multiplier=list_length("input")))
+    async def create_examples(self, input: List[ExampleInput]) -> List[ExampleResult]:
+        """
+        Create many examples with one bulk INSERT in one transaction
+        Invalid items are reported in their result and skipped
+        """
+        check_bulk_size(input)
+        results = await insert_examples(input)
+        if any(result.error is None for result in results):
+            await invalidate(EXAMPLES_TAG)
+        publish_example_changes(
+            ExampleChangeKind.CREATED,
+            [result.example for result in results if result.error is None],
+        )
+        return results
+    
+    @strawberry.mutation(metadata=cost_policy(multiplier=list_length("input")))
+    async def update_examples(self, input: List[ExampleUpdateInput]) -> List[ExampleResult]:
+        """
+        Partially update many examples with one bulk UPDATE of the changed
+        columns in one transaction
+        """
+        check_bulk_size(input)
+        results = await save_examples(input)
+        await invalidate_results(results)
+        publish_example_changes(
+            ExampleChangeKind.UPDATED,
+            [result.example for result in results if result.error is None],
+        )
+        return results
+    
+    @strawberry.mutation(metadata=cost_policy(multiplier=list_length("ids")))
+    async def delete_examples(self, ids: List[strawberry.ID]) -> List[ExampleResult]:
+        """Delete many examples with one DELETE in one transaction"""
+        check_bulk_size(ids)
+        results = await remove_examples(ids)
+        await invalidate_results(results)
+        publish_example_deletions(result.id for result in results if result.error is None)
+        return results
+
+
+@database_sync_to_async
+def insert_example(input: ExampleInput) -> ExampleType:
+    obj = ExampleModel.objects.create(
+        name=input.name,
+        description=input.description,
+        is_active=input.is_active
+    )
+    return ExampleType.from_model(obj)
+
+
+@database_sync_to_async
+def save_example(pk: int, input: ExampleInput) -> Optional[ExampleType]:
+    try:
+        obj = ExampleModel.objects.get(id=pk)
+        obj.name = input.name
+        obj.description = input.description
+        obj.is_active = input.is_active
+        obj.save()
+        return ExampleType.from_model(obj)
+    except ExampleModel.DoesNotExist:
+        return None
+
+
+@database_sync_to_async
+def remove_example(pk: int) -> bool:
+    try:
+        obj = ExampleModel.objects.get(id=pk)
+        obj.delete()
+        return True
+    except ExampleModel.DoesNotExist:
+        return False
+
+
+def check_bulk_size(items: Sequence) -> None:
+    max_items = settings.GRAPHQL_BULK_MUTATION_MAX_ITEMS
+    if len(items) > max_items:
+        raise ValueError(f"At most {max_items} items are accepted per bulk mutation")
+
+
+async def invalidate_results(results: List[ExampleResult]) -> None:
+    tags = [example_tag(result.id) for result in results if result.error is None]
+    if tags:
+        await invalidate(EXAMPLES_TAG, *tags)
+
+
+def error_result(code: str, message: str, id: Optional[strawberry.ID] = None) -> ExampleResult:
+    return ExampleResult(id=id, error=MutationError(code=code, message=message))
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items()
+    )
+
+
+def parse_ids(ids: Sequence[strawberry.ID], results: List[Optional[ExampleResult]]) -> Dict[int, int]:
+    """
+    Map primary key -> input position, recording INVALID and DUPLICATE
+    errors in `results` for the items left out
+    """
+    positions: Dict[int, int] = {}
+    for index, id in enumerate(ids):
+        try:
+            pk = int(id)
+        except (TypeError, ValueError):
+            results[index] = error_result("INVALID", f"Invalid id: {id}", id)
+            continue
+        if pk in positions:
+            results[index] = error_result("DUPLICATE", f"Example {pk} appears more than once", id)
+            continue
+        positions[pk] = index
+    return positions
+
+
+@database_sync_to_async
+def insert_examples(inputs: List[ExampleInput]) -> List[ExampleResult]:
+    results: List[Optional[ExampleResult]] = [None] * len(inputs)
+    objs: List[ExampleModel] = []
+    positions: List[int] = []
+    for index, input in enumerate(inputs):
+        obj = ExampleModel(
+            name=input.name,
+            description=input.description,
+            is_active=input.is_active,
+        )
         try:
-            obj = ExampleModel.objects.get(id=int(id))
-            obj.delete()
-            return True
-        except ExampleModel.DoesNotExist:
-            return False
+            obj.clean_fields()
+        except ValidationError as error:
+            results[index] = error_result("INVALID", validation_message(error))
+            continue
+        objs.append(obj)
+        positions.append(index)
+
+    with transaction.atomic():
+        ExampleModel.objects.bulk_create(objs)
+
+    for index, obj in zip(positions, objs):
+        results[index] = ExampleResult(id=obj.pk, example=ExampleType.from_model(obj))
+    return results
+
+
+@database_sync_to_async
+def save_examples(inputs: List[ExampleUpdateInput]) -> List[ExampleResult]:
+    results: List[Optional[ExampleResult]] = [None] * len(inputs)
+    positions = parse_ids([input.id for input in inputs], results)
+
+    with transaction.atomic():
+        rows = ExampleModel.objects.select_for_update().in_bulk(list(positions))
+        changed_objs: List[ExampleModel] = []
+        changed_fields = set()
+        for pk, index in positions.items():
+            obj = rows.get(pk)
+            if obj is None:
+                results[index] = error_result("NOT_FOUND", f"Example {pk} does not exist", pk)
+                continue
+
+            input = inputs[index]
+            changes = {
+                field: getattr(input, field)
+                for field in UPDATABLE_FIELDS
+                if getattr(input, field) is not strawberry.UNSET
+                and getattr(input, field) != getattr(obj, field)
+            }
+            for field, value in changes.items():
+                setattr(obj, field, value)
+            try:
+                obj.clean_fields(exclude=[f.name for f in obj._meta.fields if f.name not in changes])
+            except ValidationError as error:
+                results[index] = error_result("INVALID", validation_message(error), pk)
+                continue
+
+            if changes:
+                changed_objs.append(obj)
+                changed_fields.update(changes)
+            results[index] = ExampleResult(id=pk, example=ExampleType.from_model(obj))
+
+        if changed_objs:
+            # bulk_update() bypasses save(), so auto_now is applied by hand
+            now = timezone.now()
+            for obj in changed_objs:
+                obj.updated_at = now
+            ExampleModel.objects.bulk_update(changed_objs, sorted(changed_fields) + ["updated_at"])
+            for obj in changed_objs:
+                results[positions[obj.pk]] = ExampleResult(
+                    id=obj.pk, example=ExampleType.from_model(obj)
+                )
+    return results
+
+
+@database_sync_to_async
+def remove_examples(ids: List[strawberry.ID]) -> List[ExampleResult]:
+    results: List[Optional[ExampleResult]] = [None] * len(ids)
+    positions = parse_ids(ids, results)
+
+    with transaction.atomic():
+        existing = set(
+            ExampleModel.objects.select_for_update()
+            .filter(id__in=list(positions))
+            .values_list("id", flat=True)
+        )
+        if existing:
+            ExampleModel.objects.filter(id__in=existing).delete()
+
+    for pk, index in positions.items():
+        if pk in existing:
+            results[index] = ExampleResult(id=pk)
+        else:
+            results[index] = error_result("NOT_FOUND", f"Example {pk} does not exist", pk)
+    return results
@@ -1,7 +1,24 @@
 import strawberry
-from typing import List, Optional
-from .types import ExampleType
+from typing import AsyncIterator, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import QuerySet
+from strawberry.relay import PageInfo
+from strawberry.types import Info
+from .types import EXAMPLES_TAG, ExampleConnection, ExampleType, example_tag
 from apps.api.models import ExampleModel
+from apps.api.search import example_search
+from core.utils.cost import cost_policy, page_size
+from core.utils.db import database_sync_to_async
+from core.utils.http_cache import cache_control
+from core.utils.incremental import is_streamed, stream_queryset
+from core.utils.pagination import Page, encode_cursor_values, page_queryset, paginate_queryset
+from core.utils.response_cache import cache_policy
+from core.utils.search import SEARCH_ORDERING, SearchHit, paginate_hits
+from core.utils.selection import get_only_fields, selected_field_names
+
+# Connection edges: cursors are built from (created_at, id)
+NODE_PATH = ("edges", "node")
+CURSOR_FIELDS = ("id", "created_at")
 
 
 @strawberry.type
@@ -11,37 +28,197 @@ class Query:
     Add your queries here
     """
     
-    @strawberry.field
+    @strawberry.field(metadata={**cache_policy(), **cache_control(max_age=3600)})
     def hello(self, name: Optional[str] = None) -> str:
         """Example query that returns a greeting"""
         if name:
             return f"Hello, {name}!"
         return "Hello, World!"
     
-    @strawberry.field
-    def examples(self, is_active: Optional[bool] = None) -> List[ExampleType]:
+    @strawberry.field(
+        metadata={
+            **cache_policy(tags=lambda arguments: [EXAMPLES_TAG]),
+            **cache_control(max_age=60),
+            **cost_policy(multiplier=page_size, multiplier_path="edges"),
+        }
+    )
+    async def examples(
+        self,
+        info: Info,
+        is_active: Optional[bool] = None,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None,
+    ) -> ExampleConnection:
         """
-        Query all examples from the database
+        Query a page of examples from the database
         Optionally filter by is_active status
+        Page size is capped by GRAPHQL_CONNECTION_MAX_RESULTS
+        Forward pages stream rows from a cursor when edges use @stream
         """
-        queryset = ExampleModel.objects.all()
+        columns = get_only_fields(info, ExampleModel, NODE_PATH, CURSOR_FIELDS)
+        # Tuples, not model instances: see ExampleType.from_row
+        queryset = ExampleModel.objects.values_list(*columns, named=True)
         
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active)
         
-        return [ExampleType.from_model(obj) for obj in queryset]
+        if is_streamed(info, "edges") and last is None and before is None:
+            return await stream_examples(info, queryset, first, after)
+        return await paginate_examples(queryset, first, after, last, before)
     
-    @strawberry.field
-    def example(self, id: strawberry.ID) -> Optional[ExampleType]:
+    @strawberry.field(
+        metadata={
+            **cache_policy(tags=lambda arguments: [example_tag(arguments["id"])]),
+            **cache_control(max_age=60),
+        }
+    )
+    async def example(self, info: Info, id: strawberry.ID) -> Optional[ExampleType]:
         """Query a single example by ID from the database"""
-        try:
-            obj = ExampleModel.objects.get(id=int(id))
-            return ExampleType.from_model(obj)
-        except ExampleModel.DoesNotExist:
-            return None
+        columns = tuple(get_only_fields(info, ExampleModel))
+        return await info.context["loaders"].example.load((int(id), columns))
     
-    @strawberry.field
-    def search_examples(self, name: str) -> List[ExampleType]:
-        """Search examples by name (case-insensitive contains)"""
-        queryset = ExampleModel.objects.filter(name__icontains=name)
-        return [ExampleType.from_model(obj) for obj in queryset]
+    @strawberry.field(
+        metadata={
+            **cache_policy(tags=lambda arguments: [EXAMPLES_TAG]),
+            **cache_control(max_age=30),
+            **cost_policy(cost=5, multiplier=page_size, multiplier_path="edges"),
+        }
+    )
+    async def search_examples(
+        self,
+        info: Info,
+        name: str,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None,
+    ) -> ExampleConnection:
+        """
+        Search examples by name and description, best matches first
+        At most GRAPHQL_SEARCH_MAX_RESULTS matches are returned
+        """
+        columns = get_only_fields(info, ExampleModel, NODE_PATH)
+        if is_streamed(info, "edges"):
+            return await stream_search_examples(name, columns, first, after, last, before)
+        return await search_examples_page(name, columns, first, after, last, before)
+
+
+@database_sync_to_async
+def paginate_examples(
+    queryset: QuerySet,
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    last: Optional[int] = None,
+    before: Optional[str] = None,
+) -> ExampleConnection:
+    page = paginate_queryset(queryset, first=first, after=after, last=last, before=before)
+    return ExampleConnection.from_page(page, queryset)
+
+
+async def stream_examples(
+    info: Info,
+    queryset: QuerySet,
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+) -> ExampleConnection:
+    """
+    Forward page of examples whose edges are sent with @stream: rows are
+    read from a cursor while the first part of the response is sent
+    """
+    if "page_info" in selected_field_names(info):
+        # Cursors and has_next_page from the cursor columns of the page only
+        keys = await paginate_examples(queryset.values_list(*CURSOR_FIELDS, named=True), first, after)
+        page_info = keys.page_info
+    else:
+        page_info = PageInfo(
+            has_next_page=False,
+            has_previous_page=after is not None,
+            start_cursor=None,
+            end_cursor=None,
+        )
+    rows = stream_queryset(page_queryset(queryset, first, after))
+    return ExampleConnection.from_stream(rows, page_info, queryset)
+
+
+def search_hits(
+    query: str,
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    last: Optional[int] = None,
+    before: Optional[str] = None,
+) -> Tuple[List[SearchHit], List[SearchHit], bool, bool]:
+    """All hits of `query`, with the hits of the requested page"""
+    hits = example_search.search(query)
+    page_hits, has_next_page, has_previous_page = paginate_hits(
+        hits, first=first, after=after, last=last, before=before
+    )
+    return hits, page_hits, has_next_page, has_previous_page
+
+
+def ranked_rows(page_hits: List[SearchHit], columns: List[str]) -> List[ExampleModel]:
+    """Rows of `page_hits`, in rank order"""
+    rows = ExampleModel.objects.only(*columns).in_bulk([pk for pk, _ in page_hits])
+    items = []
+    for pk, score in page_hits:
+        if pk in rows:
+            # Read by the cursor, see SEARCH_ORDERING
+            rows[pk].search_score = score
+            items.append(rows[pk])
+    return items
+
+
+@database_sync_to_async
+def search_examples_page(
+    query: str,
+    columns: List[str],
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    last: Optional[int] = None,
+    before: Optional[str] = None,
+) -> ExampleConnection:
+    hits, page_hits, has_next_page, has_previous_page = search_hits(query, first, after, last, before)
+    page = Page(ranked_rows(page_hits, columns), has_next_page, has_previous_page, ordering=SEARCH_ORDERING)
+    queryset = ExampleModel.objects.filter(pk__in=[pk for pk, _ in hits])
+    return ExampleConnection.from_page(page, queryset, node=ExampleType.from_model)
+
+
+async def stream_search_examples(
+    query: str,
+    columns: List[str],
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    last: Optional[int] = None,
+    before: Optional[str] = None,
+) -> ExampleConnection:
+    """
+    Page of search results whose edges are sent with @stream: page_info
+    comes from the hits, rows are fetched GRAPHQL_STREAM_CHUNK_SIZE at a time
+    """
+    hits, page_hits, has_next_page, has_previous_page = await database_sync_to_async(search_hits)(
+        query, first, after, last, before
+    )
+
+    def cursor(hit: SearchHit) -> str:
+        pk, score = hit
+        return encode_cursor_values([score, pk])
+
+    page_info = PageInfo(
+        has_next_page=has_next_page,
+        has_previous_page=has_previous_page,
+        start_cursor=cursor(page_hits[0]) if page_hits else None,
+        end_cursor=cursor(page_hits[-1]) if page_hits else None,
+    )
+    queryset = ExampleModel.objects.filter(pk__in=[pk for pk, _ in hits])
+    return ExampleConnection.from_stream(
+        stream_ranked_rows(page_hits, columns), page_info, queryset, SEARCH_ORDERING, node=ExampleType.from_model
+    )
+
+
+async def stream_ranked_rows(page_hits: List[SearchHit], columns: List[str]) -> AsyncIterator[ExampleModel]:
+    size = settings.GRAPHQL_STREAM_CHUNK_SIZE
+    fetch = database_sync_to_async(ranked_rows)
+    for start in range(0, len(page_hits), size):
+        for row in await fetch(page_hits[start:start + size], columns):
+            yield row
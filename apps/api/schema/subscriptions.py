@@ -0,0 +1,119 @@
+import asyncio
+import contextlib
+import strawberry
+from collections import OrderedDict
+from enum import Enum
+from typing import AsyncGenerator, Iterable, List, Optional, Tuple
+from .types import ExampleType
+from apps.api.models import ExampleModel
+from core.utils.db import database_sync_to_async
+from core.utils.pubsub import publish, subscribe
+
+# Pub/sub channel of ExampleModel writes, see core/utils/pubsub.py
+EXAMPLES_CHANNEL = "examples"
+
+# Rows loaded for recent changes, shared by every subscriber of the worker
+SHARED_LOADS = 256
+
+
+@strawberry.enum
+class ExampleChangeKind(Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+
+@strawberry.type
+class ExampleChange:
+    """
+    One write to an example
+    The example is read when the change arrives, so it holds the latest
+    state of the row, and is null once the row is deleted
+    """
+    kind: ExampleChangeKind
+    id: strawberry.ID
+    version: strawberry.Private[Optional[str]] = None
+
+    @strawberry.field
+    async def example(self) -> Optional[ExampleType]:
+        if self.kind == ExampleChangeKind.DELETED:
+            return None
+        return await asyncio.shield(load_changed_example(int(self.id), self.version))
+
+
+@strawberry.type
+class Subscription:
+    """
+    GraphQL Subscription root type, served over WebSocket
+    (graphql-transport-ws)
+    Add your subscriptions here
+    """
+
+    @strawberry.subscription
+    async def example_changes(
+        self, ids: Optional[List[strawberry.ID]] = None
+    ) -> AsyncGenerator[ExampleChange, None]:
+        """
+        Examples created, updated and deleted from now on, optionally
+        only the ones with the given ids
+        """
+        wanted = {int(id) for id in ids} if ids is not None else None
+        async with contextlib.aclosing(subscribe(EXAMPLES_CHANNEL)) as messages:
+            async for message in messages:
+                if wanted is not None and message["id"] not in wanted:
+                    continue
+                yield ExampleChange(
+                    kind=ExampleChangeKind(message["kind"]),
+                    id=strawberry.ID(str(message["id"])),
+                    version=message.get("version"),
+                )
+
+
+def publish_example_changes(kind: ExampleChangeKind, examples: Iterable[ExampleType]) -> None:
+    """Announce written examples to the subscribers of every worker"""
+    for example in examples:
+        publish(
+            EXAMPLES_CHANNEL,
+            {
+                "kind": kind.value,
+                "id": int(example.id),
+                # Changes of the same row are told apart by updated_at
+                "version": example.updated_at.isoformat() if example.updated_at else None,
+            },
+        )
+
+
+def publish_example_deletions(ids: Iterable) -> None:
+    for pk in ids:
+        publish(EXAMPLES_CHANNEL, {"kind": ExampleChangeKind.DELETED.value, "id": int(pk)})
+
+
+_loads: "OrderedDict[Tuple[int, Optional[str]], asyncio.Future]" = OrderedDict()
+
+
+def load_changed_example(pk: int, version: Optional[str]) -> "asyncio.Future[Optional[ExampleType]]":
+    """
+    One read of the row per change and worker, however many clients
+    subscribed to it
+    """
+    key = (pk, version)
+    future = _loads.get(key)
+    if future is None:
+        future = asyncio.ensure_future(get_example(pk))
+        future.add_done_callback(lambda done: forget_failed_load(key, done))
+        _loads[key] = future
+        while len(_loads) > SHARED_LOADS:
+            _loads.popitem(last=False)
+    return future
+
+
+def forget_failed_load(key: Tuple[int, Optional[str]], future: asyncio.Future) -> None:
+    # The next subscriber retries
+    if future.cancelled() or future.exception() is not None:
+        _loads.pop(key, None)
+
+
+@database_sync_to_async
+def get_example(pk: int) -> Optional[ExampleType]:
+    obj = ExampleModel.objects.filter(id=pk).first()
+    return ExampleType.from_model(obj) if obj is not None else None
@@ -1,32 +1,158 @@
+import contextlib
 import strawberry
-from typing import Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+from django.db.models import QuerySet
+from strawberry.relay import PageInfo
+from strawberry.types import Info
 from apps.api.models import ExampleModel
+from core.utils.cost import cost_policy
+from core.utils.db import database_sync_to_async
+from core.utils.pagination import DEFAULT_ORDERING, Page, encode_cursor
+from core.utils.selection import get_only_fields
 
+# Response cache tags, see core/utils/response_cache.py
+EXAMPLES_TAG = "examples"
 
-@strawberry.type
+
+def example_tag(pk) -> str:
+    # IDs are strings: "01" and "1" name the same row
+    return f"example:{int(pk)}"
+
+
+# Columns of ExampleType left empty when a row doesn't hold them
+EMPTY_COLUMNS = dict.fromkeys(("name", "description", "is_active", "created_at", "updated_at"))
+
+
+@strawberry.federation.type(keys=["id"])
 class ExampleType:
     """
     Example GraphQL type mapped from Django ExampleModel
+    Federated entity resolvable by the gateway through its id
     """
     id: strawberry.ID
     name: str
     description: Optional[str] = None
     is_active: bool = True
-    created_at: str
-    updated_at: str
+    created_at: datetime
+    updated_at: datetime
 
     @staticmethod
     def from_model(model: ExampleModel) -> "ExampleType":
-        """Convert Django model instance to GraphQL type"""
+        """
+        Convert Django model instance to GraphQL type
+        Columns deferred with .only() were not selected by the client and
+        are left empty instead of being fetched one row at a time.
+        Datetimes are kept as they are for the response encoder.
+        """
+        deferred = model.get_deferred_fields()
+
+        def value(name: str):
+            return None if name in deferred else getattr(model, name)
+
         return ExampleType(
             id=strawberry.ID(str(model.id)),
-            name=model.name,
-            description=model.description,
-            is_active=model.is_active,
-            created_at=model.created_at.isoformat(),
-            updated_at=model.updated_at.isoformat(),
+            name=value("name"),
+            description=value("description"),
+            is_active=value("is_active"),
+            created_at=value("created_at"),
+            updated_at=value("updated_at"),
+        )
+
+    @staticmethod
+    def from_row(row: Any) -> "ExampleType":
+        """
+        Convert a `values_list(*columns, named=True)` row to GraphQL type
+        Lists read tuples instead of model instances, so no model is
+        initialised per row. Columns missing from the row (not selected)
+        are left empty, like deferred ones in from_model.
+        """
+        values = dict(EMPTY_COLUMNS)
+        values.update(zip(row._fields, row))
+        values["id"] = strawberry.ID(str(values["id"]))
+        return ExampleType(**values)
+
+    @classmethod
+    def resolve_reference(
+        cls, info: Info, id: strawberry.ID
+    ) -> Awaitable[Optional["ExampleType"]]:
+        """Resolve an `_entities` representation through the batched loader"""
+        columns = tuple(get_only_fields(info, ExampleModel))
+        return info.context["loaders"].example.load((int(id), columns))
+
+
+@strawberry.type
+class ExampleEdge:
+    """
+    Relay edge wrapping an ExampleType
+    """
+    cursor: str
+    node: ExampleType
+
+
+@strawberry.type
+class ExampleConnection:
+    """
+    Relay connection over ExampleModel rows
+    total_count is only queried when the client selects it
+    """
+    edges: List[ExampleEdge]
+    page_info: PageInfo
+    queryset: strawberry.Private[QuerySet]
+
+    # COUNT(*) reads every matching row, unlike a page
+    @strawberry.field(metadata=cost_policy(cost=10))
+    async def total_count(self) -> int:
+        """Number of rows matching the filters, ignoring pagination"""
+        return await count_queryset(self.queryset)
+
+    @staticmethod
+    def from_page(
+        page: Page,
+        queryset: QuerySet,
+        node: Callable[[Any], ExampleType] = ExampleType.from_row,
+    ) -> "ExampleConnection":
+        """
+        Build a connection from a keyset page of named `values_list` rows
+        (or of ExampleModel instances, with node=ExampleType.from_model)
+        """
+        cursor = page.cursor
+        edges = [ExampleEdge(cursor=cursor(obj), node=node(obj)) for obj in page.items]
+        return ExampleConnection(
+            edges=edges,
+            page_info=PageInfo(
+                has_next_page=page.has_next_page,
+                has_previous_page=page.has_previous_page,
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+            ),
+            queryset=queryset,
         )
 
+    @staticmethod
+    def from_stream(
+        rows: AsyncIterator[Any],
+        page_info: PageInfo,
+        queryset: QuerySet,
+        ordering: Sequence[str] = DEFAULT_ORDERING,
+        node: Callable[[Any], ExampleType] = ExampleType.from_row,
+    ) -> "ExampleConnection":
+        """
+        Build a connection whose edges are made as `rows` arrive, for
+        edges sent with @stream (see core/utils/incremental.py)
+        """
+        async def edges():
+            async with contextlib.aclosing(rows):
+                async for obj in rows:
+                    yield ExampleEdge(cursor=encode_cursor(obj, ordering), node=node(obj))
+
+        return ExampleConnection(edges=edges(), page_info=page_info, queryset=queryset)
+
+
+@database_sync_to_async
+def count_queryset(queryset: QuerySet) -> int:
+    return queryset.count()
+
 
 @strawberry.input
 class ExampleInput:
@@ -36,3 +162,36 @@ class ExampleInput:
     name: str
     description: Optional[str] = None
     is_active: bool = True
+
+
+@strawberry.input
+class ExampleUpdateInput:
+    """
+    Partial update of one example for update_examples
+    Omitted fields are left unchanged
+    """
+    id: strawberry.ID
+    name: Optional[str] = strawberry.UNSET
+    description: Optional[str] = strawberry.UNSET
+    is_active: Optional[bool] = strawberry.UNSET
+
+
+@strawberry.type
+class MutationError:
+    """
+    Error of one item of a bulk mutation
+    code is one of INVALID, NOT_FOUND, DUPLICATE
+    """
+    code: str
+    message: str
+
+
+@strawberry.type
+class ExampleResult:
+    """
+    Outcome of one item of a bulk mutation, in input order
+    Either error is set or the item was applied
+    """
+    id: Optional[strawberry.ID] = None
+    example: Optional[ExampleType] = None
+    error: Optional[MutationError] = None
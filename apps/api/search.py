@@ -0,0 +1,12 @@
+"""
+Search indexes of the api app, see core/utils/search.py
+"""
+from apps.api.models import ExampleModel
+from core.utils.search import SearchIndex
+
+# Backed by migration 0003_example_search
+example_search = SearchIndex(
+    ExampleModel,
+    fields=("name", "description"),
+    fts_table="example_search",
+)
@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from core.asgi import fastapp
+from core.utils.response_cache import set_response_cache
+
+GRAPHQL_URL = "/api/graphql/"
+
+
+@pytest.fixture(autouse=True)
+def response_cache():
+    """A fresh response cache for every test"""
+    set_response_cache(None)
+    yield
+    set_response_cache(None)
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(fastapp)
+
+
+@pytest.fixture
+def graphql(client):
+    """POST one operation to the GraphQL endpoint, returning the response"""
+
+    def post(query: str, variables=None, **kwargs):
+        return client.post(GRAPHQL_URL, json={"query": query, "variables": variables}, **kwargs)
+
+    return post
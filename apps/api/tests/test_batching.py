@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from apps.api.models import ExampleModel
+from apps.api.schema import loaders, mutations
+
+EXAMPLE_QUERY = "query ($id: ID!) { example(id: $id) { id name } }"
+GRAPHQL_URL = "/api/graphql/"
+
+
+@pytest.fixture(autouse=True)
+def batch_settings(settings):
+    settings.GRAPHQL_BATCH_MAX_OPERATIONS = 3
+    # Every operation reaches the resolvers
+    settings.GRAPHQL_RESPONSE_CACHE_BACKEND = ""
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_results_keep_order_and_share_loaders(client, monkeypatch):
+    first, second = (ExampleModel.objects.create(name=name) for name in ("First", "Second"))
+    original = loaders.load_examples
+    batches = []
+
+    async def counting_load(keys):
+        batches.append(sorted(keys))
+        return await original(keys)
+
+    monkeypatch.setattr(loaders, "load_examples", counting_load)
+
+    response = client.post(
+        GRAPHQL_URL,
+        json=[
+            {"query": EXAMPLE_QUERY, "variables": {"id": str(second.id)}},
+            {"query": EXAMPLE_QUERY, "variables": {"id": str(first.id)}},
+        ],
+    )
+
+    assert response.status_code == 200
+    assert [result["data"] for result in response.json()] == [
+        {"example": {"id": str(second.id), "name": "Second"}},
+        {"example": {"id": str(first.id), "name": "First"}},
+    ]
+    assert [[pk for pk, _ in keys] for keys in batches] == [sorted([first.id, second.id])]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_invalid_operations_fail_on_their_own(client):
+    response = client.post(
+        GRAPHQL_URL,
+        json=[
+            "not an operation",
+            {"query": "subscription { examples { id } }"},
+            {"query": "{ __typename }"},
+        ],
+    )
+
+    assert response.status_code == 200
+    first, second, third = response.json()
+    assert first["errors"][0]["message"] == "Each operation of a batch must be an object"
+    assert first["data"] is None
+    assert second["data"] is None and second["errors"]
+    assert third["data"] == {"__typename": "Query"}
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        ([], "The batch contains no operation"),
+        ([{"query": "{ __typename }"}] * 4, "At most 3 operations are accepted per batch"),
+    ],
+)
+def test_rejected_batches(client, body, message):
+    response = client.post(GRAPHQL_URL, json=body)
+
+    assert response.status_code == 400
+    assert response.text == message
+
+
+def test_batches_can_be_disabled(client, settings):
+    settings.GRAPHQL_BATCH_MAX_OPERATIONS = 0
+
+    response = client.post(GRAPHQL_URL, json=[{"query": "{ __typename }"}])
+
+    assert response.status_code == 400
+    assert response.text == "Batched requests are not supported"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_mutations_run_in_array_order(client, monkeypatch, settings):
+    settings.GRAPHQL_BATCH_MAX_OPERATIONS = 4
+    example = ExampleModel.objects.create(name="Original")
+    original_save = mutations.save_example
+    saved = []
+
+    async def save_example(pk, input):
+        # The first mutation is the slowest: it must still finish first
+        await asyncio.sleep(0.05 if not saved else 0)
+        saved.append(input.name)
+        return await original_save(pk, input)
+
+    monkeypatch.setattr(mutations, "save_example", save_example)
+    update = "mutation ($id: ID!, $name: String!) { update_example(id: $id, input: { name: $name }) { name } }"
+    variables = {"id": str(example.id)}
+
+    response = client.post(
+        GRAPHQL_URL,
+        json=[
+            {"query": update, "variables": {**variables, "name": "First"}},
+            {"query": EXAMPLE_QUERY, "variables": variables},
+            {"query": update, "variables": {**variables, "name": "Second"}},
+            {"query": EXAMPLE_QUERY, "variables": variables},
+        ],
+    )
+
+    assert saved == ["First", "Second"]
+    assert [result["data"] for result in response.json()] == [
+        {"update_example": {"name": "First"}},
+        {"example": {"id": str(example.id), "name": "First"}},
+        {"update_example": {"name": "Second"}},
+        {"example": {"id": str(example.id), "name": "Second"}},
+    ]
+    example.refresh_from_db()
+    assert example.name == "Second"
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from apps.api.models import ExampleModel
+from apps.api.schema import loaders, mutations
+from core.asgi import get_context
+from core.schema import schema
+from core.utils import coalescing
+
+EXAMPLE_QUERY = "query ($id: ID!) { example(id: $id) { name } }"
+UPDATE_MUTATION = """
+mutation ($id: ID!) {
+  update_example(id: $id, input: { name: "Updated" }) { name }
+}
+"""
+
+
+@pytest.fixture(autouse=True)
+def without_response_cache(settings):
+    # Coalescing only: every read reaches the resolvers
+    settings.GRAPHQL_RESPONSE_CACHE_BACKEND = ""
+
+
+async def execute(query, variables):
+    return await schema.execute(query, variable_values=variables, context_value=await get_context())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_identical_reads_share_one_execution(monkeypatch):
+    example = ExampleModel.objects.create(name="Shared")
+    variables = {"id": str(example.id)}
+    original = loaders.load_examples
+    batches = []
+
+    async def counting_load(keys):
+        batches.append(keys)
+        await asyncio.sleep(0.05)
+        return await original(keys)
+
+    monkeypatch.setattr(loaders, "load_examples", counting_load)
+
+    async def scenario():
+        return await asyncio.gather(*(execute(EXAMPLE_QUERY, variables) for _ in range(5)))
+
+    results = async_to_sync(scenario)()
+
+    assert [result.data for result in results] == [{"example": {"name": "Shared"}}] * 5
+    assert len(batches) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_after_a_mutation_do_not_join_reads_started_during_it(monkeypatch):
+    example = ExampleModel.objects.create(name="Original")
+    variables = {"id": str(example.id)}
+    original_load = loaders.load_examples
+    original_save = mutations.save_example
+
+    async def scenario():
+        mutation_started, mutation_go = asyncio.Event(), asyncio.Event()
+        leader_read, reads_go = asyncio.Event(), asyncio.Event()
+
+        async def slow_save(pk, input):
+            mutation_started.set()
+            await mutation_go.wait()
+            return await original_save(pk, input)
+
+        async def slow_load(keys):
+            rows = await original_load(keys)
+            leader_read.set()
+            await reads_go.wait()
+            return rows
+
+        monkeypatch.setattr(mutations, "save_example", slow_save)
+        monkeypatch.setattr(loaders, "load_examples", slow_load)
+
+        # The mutation starts, then a read reads the old row while it runs
+        mutation = asyncio.ensure_future(execute(UPDATE_MUTATION, variables))
+        await mutation_started.wait()
+        leader = asyncio.ensure_future(execute(EXAMPLE_QUERY, variables))
+        await leader_read.wait()
+        # The mutation commits while that read is still in flight
+        mutation_go.set()
+        await mutation
+        follower = asyncio.ensure_future(execute(EXAMPLE_QUERY, variables))
+        await asyncio.sleep(0.05)
+        reads_go.set()
+        return await leader, await follower
+
+    leader, follower = async_to_sync(scenario)()
+
+    assert leader.data == {"example": {"name": "Original"}}
+    assert follower.data == {"example": {"name": "Updated"}}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_do_not_join_executions_older_than_the_max_age(monkeypatch, settings):
+    settings.GRAPHQL_COALESCE_MAX_AGE_SECONDS = 0.05
+    example = ExampleModel.objects.create(name="Shared")
+    variables = {"id": str(example.id)}
+    original = loaders.load_examples
+    batches = []
+
+    async def scenario():
+        reads_go = asyncio.Event()
+
+        async def slow_load(keys):
+            batches.append(keys)
+            await reads_go.wait()
+            return await original(keys)
+
+        monkeypatch.setattr(loaders, "load_examples", slow_load)
+
+        leader = asyncio.ensure_future(execute(EXAMPLE_QUERY, variables))
+        await asyncio.sleep(0.1)
+        # Another worker may have committed a mutation since the leader started
+        late = asyncio.ensure_future(execute(EXAMPLE_QUERY, variables))
+        await asyncio.sleep(0.01)
+        # Joins the late operation's execution, which is recent enough
+        follower = asyncio.ensure_future(execute(EXAMPLE_QUERY, variables))
+        await asyncio.sleep(0.01)
+        reads_go.set()
+        return await asyncio.gather(leader, late, follower)
+
+    results = async_to_sync(scenario)()
+
+    assert [result.data for result in results] == [{"example": {"name": "Shared"}}] * 3
+    assert len(batches) == 2
+    assert coalescing._in_flight == {}
@@ -0,0 +1,88 @@
+import gzip
+
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from core.utils.compression import CompressionMiddleware, negotiate_encoding
+
+LARGE = {"items": ["example"] * 500}
+
+
+async def large(request):
+    return JSONResponse(LARGE, headers={"ETag": '"v1"'})
+
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+
+async def image(request):
+    return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+
+async def stream(request):
+    async def chunks():
+        for index in range(3):
+            yield f'{{"chunk": {index}}}\n'.encode()
+
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+app = Starlette(
+    routes=[
+        Route("/large", large),
+        Route("/small", small),
+        Route("/image", image),
+        Route("/stream", stream),
+    ]
+)
+app.add_middleware(CompressionMiddleware, minimum_size=1024, encodings=("zstd", "br", "gzip"))
+client = TestClient(app)
+
+
+def raw_get(path, accept_encoding):
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_large_responses_are_gzipped():
+    response, body = raw_get("/large", "gzip, deflate")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert int(response.headers["Content-Length"]) == len(body)
+    assert gzip.decompress(body) == JSONResponse(LARGE).body
+
+
+def test_small_responses_are_not_compressed():
+    response, body = raw_get("/small", "gzip")
+    assert "Content-Encoding" not in response.headers
+    assert body == b'{"ok":true}'
+
+
+def test_no_accept_encoding_means_identity():
+    response, body = raw_get("/large", "identity")
+    assert "Content-Encoding" not in response.headers
+    assert body == JSONResponse(LARGE).body
+
+
+def test_incompressible_types_pass_through():
+    response, _ = raw_get("/image", "gzip")
+    assert "Content-Encoding" not in response.headers
+
+
+def test_streaming_responses_stay_streaming():
+    response, body = raw_get("/stream", "gzip")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(body) == b'{"chunk": 0}\n{"chunk": 1}\n{"chunk": 2}\n'
+
+
+def test_negotiation_honours_q_values_and_server_order():
+    preferred = ["zstd", "br", "gzip"]
+    assert negotiate_encoding("gzip, br", preferred) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip", preferred) == "gzip"
+    assert negotiate_encoding("gzip;q=0, *", preferred) == "zstd"
+    assert negotiate_encoding("identity", preferred) is None
@@ -0,0 +1,78 @@
+import pytest
+
+from core.utils import cost
+
+EXAMPLES_QUERY = "query ($first: Int) { examples(first: $first) { edges { node { id } } } }"
+
+
+@pytest.fixture(autouse=True)
+def client_budgets(monkeypatch):
+    # Budgets are created from the settings on first use
+    monkeypatch.setattr(cost, "_client_budgets", None)
+
+
+def rejection(response):
+    [error] = response.json()["errors"]
+    return error["extensions"]
+
+
+def test_connection_cost_grows_with_page_size(graphql, settings):
+    settings.GRAPHQL_MAX_COST = 1
+
+    small = rejection(graphql(EXAMPLES_QUERY, {"first": 5}))
+    large = rejection(graphql(EXAMPLES_QUERY, {"first": 50}))
+
+    assert small == {"code": "QUERY_TOO_EXPENSIVE", "cost": 11, "max_cost": 1}
+    assert large["cost"] == 101
+
+
+def test_entities_cost_grows_with_representations(graphql, settings):
+    settings.GRAPHQL_MAX_COST = 100
+    representations = [{"__typename": "ExampleType", "id": str(pk)} for pk in range(200)]
+
+    response = graphql(
+        "query ($r: [_Any!]!) { _entities(representations: $r) { ... on ExampleType { id } } }",
+        {"r": representations},
+    )
+
+    assert rejection(response) == {"code": "QUERY_TOO_EXPENSIVE", "cost": 201, "max_cost": 100}
+
+
+@pytest.mark.parametrize(
+    "mutation",
+    [
+        'create_examples(input: [{ name: "a" }, { name: "b" }, { name: "c" }]) { id }',
+        'update_examples(input: [{ id: "1" }, { id: "2" }, { id: "3" }]) { id }',
+        'delete_examples(ids: ["1", "2", "3"]) { id }',
+    ],
+)
+def test_bulk_mutation_cost_grows_with_items(graphql, settings, mutation):
+    settings.GRAPHQL_MAX_COST = 1
+
+    response = graphql(f"mutation {{ {mutation} }}")
+
+    assert rejection(response)["cost"] == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_client_budget_rate_limits(graphql, settings):
+    settings.GRAPHQL_CLIENT_COST_BUDGET = 25
+    settings.GRAPHQL_CLIENT_COST_WINDOW = 60
+
+    assert "errors" not in graphql(EXAMPLES_QUERY, {"first": 5}).json()
+    assert "errors" not in graphql(EXAMPLES_QUERY, {"first": 5}).json()
+    limited = rejection(graphql(EXAMPLES_QUERY, {"first": 5}))
+
+    assert limited["code"] == "RATE_LIMITED"
+    assert limited["retry_after"] > 0
+    # Budgets are per client
+    other = graphql(EXAMPLES_QUERY, {"first": 5}, headers={"apollographql-client-name": "other"})
+    assert "errors" not in other.json()
+
+
+def test_operation_over_the_whole_budget_is_too_expensive(graphql, settings):
+    settings.GRAPHQL_CLIENT_COST_BUDGET = 25
+
+    response = graphql(EXAMPLES_QUERY, {"first": 50})
+
+    assert rejection(response) == {"code": "QUERY_TOO_EXPENSIVE", "cost": 101, "max_cost": 25}
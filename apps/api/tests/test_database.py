@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import django
+import pytest
+
+from core.utils import db, settings as settings_utils
+from core.utils.settings import configure_database
+
+POSTGRES = "django.db.backends.postgresql"
+
+
+def postgres():
+    return {"ENGINE": POSTGRES, "NAME": "app", "OPTIONS": {}}
+
+
+def test_pool_mode_builds_the_pool_options(monkeypatch):
+    monkeypatch.setattr(settings_utils.django, "VERSION", (5, 1, 0, "final", 0))
+
+    database = configure_database(postgres(), "pool", pool_min_size=1, pool_max_size=4, pool_timeout=5.0)
+
+    assert database["CONN_MAX_AGE"] == 0
+    assert database["CONN_HEALTH_CHECKS"] is True
+    assert database["OPTIONS"]["pool"] == {"min_size": 1, "max_size": 4, "timeout": 5.0}
+
+
+def test_pool_mode_falls_back_to_persistent_before_django_5_1(monkeypatch):
+    monkeypatch.setattr(settings_utils.django, "VERSION", (5, 0, 14, "final", 0))
+    database = postgres()
+    database["OPTIONS"]["pool"] = True
+
+    configure_database(database, "pool", conn_max_age=30)
+
+    assert database["CONN_MAX_AGE"] == 30
+    assert "pool" not in database["OPTIONS"]
+
+
+def test_pool_mode_is_persistent_on_other_engines():
+    database = configure_database({"ENGINE": "django.db.backends.sqlite3"}, "pool", conn_max_age=30)
+
+    assert database["CONN_MAX_AGE"] == 30
+    assert "pool" not in database.get("OPTIONS", {})
+
+
+@pytest.mark.skipif(django.VERSION >= (5, 1), reason="the pool options are valid from Django 5.1")
+def test_installed_django_does_not_get_pool_options():
+    database = configure_database(postgres(), "pool")
+
+    assert "pool" not in database["OPTIONS"]
+
+
+class FakeConnections:
+    def __init__(self, databases, wrappers):
+        self.settings = databases
+        self.wrappers = wrappers
+
+    def __iter__(self):
+        return iter(self.settings)
+
+    def __getitem__(self, alias):
+        return self.wrappers[alias]
+
+
+def test_collector_reads_pool_statistics(monkeypatch):
+    monkeypatch.setattr(settings_utils.django, "VERSION", (5, 1, 0, "final", 0))
+    stats = {
+        "pool_size": 3,
+        "pool_available": 1,
+        "pool_max": 8,
+        "requests_waiting": 2,
+        "requests_wait_ms": 1500,
+        "requests_num": 40,
+    }
+    fake = FakeConnections(
+        {
+            "default": configure_database(postgres(), "pool"),
+            "replica_1": configure_database(postgres(), "persistent"),
+        },
+        {
+            "default": SimpleNamespace(pool=SimpleNamespace(get_stats=lambda: stats)),
+            # No pool attribute, as on Django 5.0
+            "replica_1": SimpleNamespace(),
+        },
+    )
+    monkeypatch.setattr(db, "connections", fake)
+
+    metrics = {
+        metric.name: [(sample.labels, sample.value) for sample in metric.samples]
+        for metric in db.DatabasePoolCollector().collect()
+    }
+
+    assert metrics["database_pool_size"] == [({"alias": "default"}, 3)]
+    assert metrics["database_pool_available"] == [({"alias": "default"}, 1)]
+    assert metrics["database_pool_max_size"] == [({"alias": "default"}, 8)]
+    assert metrics["database_pool_requests_waiting"] == [({"alias": "default"}, 2)]
+    assert metrics["database_pool_wait_seconds"][0] == ({"alias": "default"}, 1.5)
+    assert metrics["database_pool_requests"][0] == ({"alias": "default"}, 40)
+
+
+def test_collector_skips_pool_aliases_without_a_pool(monkeypatch):
+    databases = {"default": postgres()}
+    databases["default"]["OPTIONS"]["pool"] = {"min_size": 1}
+    monkeypatch.setattr(db, "connections", FakeConnections(databases, {"default": SimpleNamespace()}))
+
+    assert all(not metric.samples for metric in db.DatabasePoolCollector().collect())
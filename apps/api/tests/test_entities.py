@@ -0,0 +1,46 @@
+import pytest
+
+from apps.api.models import ExampleModel
+from core.utils.testing import assert_query_budget
+
+ENTITIES_QUERY = """
+query ($representations: [_Any!]!) {
+  _entities(representations: $representations) {
+    ... on ExampleType { id name }
+  }
+}
+"""
+
+
+@pytest.mark.django_db(transaction=True)
+def test_entities_resolve_in_one_query():
+    examples = ExampleModel.objects.bulk_create(
+        ExampleModel(name=f"Example {i}") for i in range(500)
+    )
+    representations = [{"__typename": "ExampleType", "id": str(example.id)} for example in examples]
+
+    result = assert_query_budget(
+        ENTITIES_QUERY, max_queries=1, variables={"representations": representations}
+    )
+
+    assert result.data["_entities"] == [
+        {"id": str(example.id), "name": example.name} for example in examples
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_entities_keep_order_and_missing_ids():
+    example = ExampleModel.objects.create(name="Present")
+    representations = [
+        {"__typename": "ExampleType", "id": "999999"},
+        {"__typename": "ExampleType", "id": str(example.id)},
+        {"__typename": "ExampleType", "id": str(example.id)},
+    ]
+
+    result = assert_query_budget(
+        ENTITIES_QUERY, max_queries=1, variables={"representations": representations}
+    )
+
+    assert result.data["_entities"] == [None, {"id": str(example.id), "name": "Present"}] + [
+        {"id": str(example.id), "name": "Present"}
+    ]
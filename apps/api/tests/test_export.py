@@ -0,0 +1,85 @@
+import asyncio
+import gc
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from apps.api.models import ExampleModel
+from core.utils import export
+from core.utils.export import ExportFormat, export_response
+
+
+@pytest.fixture
+def examples(transactional_db):
+    return [ExampleModel.objects.create(name=f"Example {i}") for i in range(3)]
+
+
+def test_csv_export(client, examples):
+    response = client.get("/api/export/examples/", params={"format": "csv"})
+
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    lines = response.text.splitlines()
+    assert lines[0] == "id,name,description,is_active,created_at,updated_at"
+    assert [line.split(",")[1] for line in lines[1:]] == ["Example 0", "Example 1", "Example 2"]
+
+
+def test_ndjson_export(client, examples):
+    response = client.get("/api/export/examples/", params={"format": "ndjson"})
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["id"], row["name"]) for row in rows] == [(obj.id, obj.name) for obj in examples]
+
+
+def test_xlsx_export(client, examples):
+    from openpyxl import load_workbook
+
+    response = client.get("/api/export/examples/", params={"format": "xlsx", "is_active": True})
+
+    sheet = load_workbook(io.BytesIO(response.content)).active
+    values = list(sheet.values)
+    assert values[0] == ("id", "name", "description", "is_active", "created_at", "updated_at")
+    assert [row[1] for row in values[1:]] == ["Example 0", "Example 1", "Example 2"]
+
+
+def test_abandoned_xlsx_export_stops_reading_rows(monkeypatch):
+    from openpyxl.worksheet._writer import ALL_TEMP_FILES
+
+    read = []
+    unraisable = []
+    monkeypatch.setattr(sys, "unraisablehook", unraisable.append)
+    temp_files = set(ALL_TEMP_FILES)
+
+    def endless_rows(queryset, fields):
+        for pk in itertools.count():
+            read.append(pk)
+            time.sleep(0.001)
+            yield (pk, f"Example {pk}")
+
+    monkeypatch.setattr(export, "iter_rows", endless_rows)
+
+    async def scenario():
+        body = export_response(None, ("id", "name"), ExportFormat.XLSX, "examples").body_iterator
+        # Nothing is sent before the workbook is complete: the client leaves first
+        first_chunk = asyncio.ensure_future(body.__anext__())
+        await asyncio.sleep(0.05)
+        first_chunk.cancel()
+        await asyncio.sleep(0.05)
+        rows_read = len(read)
+        await asyncio.sleep(0.1)
+        return rows_read
+
+    rows_read = async_to_sync(scenario)()
+
+    assert rows_read > 0
+    assert len(read) == rows_read
+    # The sheet's temporary file is closed and removed, not left for exit
+    gc.collect()
+    assert [path for path in ALL_TEMP_FILES if path not in temp_files] == []
+    assert [path for path in temp_files if os.path.exists(path)] == []
+    assert unraisable == []
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from apps.api.models import ExampleModel
+from core.utils.incremental import MULTIPART_END, PART_HEADER
+
+
+def multipart_parts(body: bytes):
+    assert body.endswith(MULTIPART_END)
+    return [json.loads(part) for part in body[: -len(MULTIPART_END)].split(PART_HEADER)[1:]]
+
+
+def test_sdl_declares_incremental_directives(graphql):
+    response = graphql("{ _service { sdl } }")
+
+    assert response.status_code == 200
+    sdl = response.json()["data"]["_service"]["sdl"]
+    assert "directive @defer(if: Boolean! = true, label: String) on FRAGMENT_SPREAD | INLINE_FRAGMENT" in sdl
+    assert "directive @stream(if: Boolean! = true, label: String, initialCount: Int! = 0) on FIELD" in sdl
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_sends_remaining_items_in_later_parts(graphql):
+    ids = [str(ExampleModel.objects.create(name=f"Example {i}").id) for i in range(3)]
+
+    response = graphql(
+        "{ examples(first: 3) { edges @stream(initialCount: 1) { node { id } } } }",
+        headers={"Accept": "multipart/mixed"},
+    )
+
+    assert response.headers["content-type"].startswith("multipart/mixed")
+    first, *rest = multipart_parts(response.content)
+    assert first["hasNext"] is True
+    streamed = [edge["node"]["id"] for edge in first["data"]["examples"]["edges"]]
+    for part in rest:
+        for payload in part.get("incremental", []):
+            streamed.extend(edge["node"]["id"] for edge in payload["items"])
+    assert streamed == ids[::-1]
+    assert rest[-1]["hasNext"] is False
+
+
+@pytest.mark.django_db(transaction=True)
+def test_defer_sends_fragment_in_later_part(graphql):
+    example = ExampleModel.objects.create(name="Deferred")
+
+    response = graphql(
+        "query ($id: ID!) { example(id: $id) { id ... @defer(label: \"rest\") { name } } }",
+        {"id": str(example.id)},
+        headers={"Accept": "multipart/mixed"},
+    )
+
+    first, *rest = multipart_parts(response.content)
+    assert first["data"] == {"example": {"id": str(example.id)}}
+    deferred = [payload for part in rest for payload in part.get("incremental", [])]
+    assert deferred == [{"data": {"name": "Deferred"}, "path": ["example"], "label": "rest"}]
+
+
+def test_directives_are_ignored_without_multipart_accept(graphql):
+    response = graphql("{ ... @defer { hello } }")
+
+    assert response.json()["data"] == {"hello": "Hello, World!"}
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from core.utils.document_cache import document_hash, get_document_cache
+
+QUERY = '{ hello(name: "persisted") }'
+
+
+@pytest.fixture(autouse=True)
+def document_cache():
+    get_document_cache().clear()
+    yield get_document_cache()
+    get_document_cache().clear()
+
+
+def persisted(sha256_hash):
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}
+
+
+def error_codes(response):
+    return [error["extensions"]["code"] for error in response.json()["errors"]]
+
+
+def test_unknown_hash_is_not_found(client):
+    response = client.post("/api/graphql/", json={"extensions": persisted(document_hash(QUERY))})
+
+    assert error_codes(response) == ["PERSISTED_QUERY_NOT_FOUND"]
+
+
+def test_registered_query_is_served_by_hash(client):
+    extensions = persisted(document_hash(QUERY))
+    registered = client.post("/api/graphql/", json={"query": QUERY, "extensions": extensions})
+    assert registered.json()["data"] == {"hello": "Hello, persisted!"}
+
+    response = client.post("/api/graphql/", json={"extensions": extensions})
+
+    assert response.json()["data"] == {"hello": "Hello, persisted!"}
+
+
+def test_registered_query_is_served_by_hash_over_get(client):
+    extensions = persisted(document_hash(QUERY))
+    client.post("/api/graphql/", json={"query": QUERY, "extensions": extensions})
+
+    response = client.get(
+        "/api/graphql/",
+        params={"extensions": json.dumps(extensions)},
+        # Without a query, any other Accept gets the GraphiQL page
+        headers={"Accept": "application/json"},
+    )
+
+    assert response.json()["data"] == {"hello": "Hello, persisted!"}
+
+
+def test_hash_mismatch_is_rejected(client):
+    response = client.post("/api/graphql/", json={"query": QUERY, "extensions": persisted("0" * 64)})
+
+    assert error_codes(response) == ["BAD_USER_INPUT"]
+
+
+def test_invalid_documents_are_not_cached(graphql, document_cache):
+    response = graphql("{ missing_field }")
+
+    assert response.json()["errors"]
+    assert document_cache.get(document_hash("{ missing_field }"), record=False) is None
+
+
+def test_validated_documents_are_cached(graphql, document_cache):
+    graphql(QUERY)
+    cached = document_cache.get(document_hash(QUERY), record=False)
+
+    response = graphql(QUERY)
+
+    assert response.json()["data"] == {"hello": "Hello, persisted!"}
+    assert document_cache.get(document_hash(QUERY), record=False) is cached
@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+import psycopg
+from asgiref.sync import async_to_sync
+
+from core.utils.pubsub import PostgresBackend
+
+
+class FakeConnection:
+    """A LISTEN connection delivering `payloads`, then failing with `error`"""
+
+    def __init__(self, payloads, error):
+        self.payloads = payloads
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, query):
+        pass
+
+    async def notifies(self):
+        for payload in self.payloads:
+            yield SimpleNamespace(payload=payload)
+        raise self.error
+
+
+def test_listener_skips_malformed_notifications_and_reconnects(monkeypatch):
+    connections = [
+        FakeConnection(
+            ["not json", '{"channel": "examples"}', '{"channel": "examples", "message": {"id": 1}}'],
+            RuntimeError("unexpected"),
+        ),
+        FakeConnection(['{"channel": "examples", "message": {"id": 2}}'], psycopg.OperationalError()),
+    ]
+    received = []
+
+    async def connect(self):
+        if not connections:
+            await asyncio.Event().wait()
+        return connections.pop(0)
+
+    monkeypatch.setattr(PostgresBackend, "connect", connect)
+    monkeypatch.setattr(PostgresBackend, "RECONNECT_SECONDS", 0)
+
+    async def listen():
+        backend = PostgresBackend()
+        await backend.start(lambda channel, message: received.append((channel, message)))
+        try:
+            await asyncio.wait_for(asyncio.shield(backend._listener), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+        # Still listening after both failures
+        assert not backend._listener.done()
+        await backend.close()
+
+    async_to_sync(listen)()
+    assert received == [("examples", {"id": 1}), ("examples", {"id": 2})]
+
+
+def test_shutdown_closes_the_broker(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import core.asgi
+
+    closed = []
+
+    async def close_broker():
+        closed.append(True)
+
+    monkeypatch.setattr(core.asgi, "close_broker", close_broker)
+    with TestClient(core.asgi.fastapp):
+        assert closed == []
+    assert closed == [True]
@@ -0,0 +1,64 @@
+import pytest
+from django.db import connection
+
+from apps.api.models import ExampleModel
+from core.utils.queries import QueryStats
+from core.utils.testing import assert_query_budget
+
+EXAMPLES_QUERY = """
+query ($first: Int, $after: String) {
+  examples(first: $first, after: $after) {
+    edges { node { id name } }
+    page_info { has_next_page end_cursor }
+  }
+}
+"""
+
+
+@pytest.fixture
+def examples(transactional_db):
+    return ExampleModel.objects.bulk_create(ExampleModel(name=f"Example {i}") for i in range(30))
+
+
+def test_examples_page_query_budget(examples):
+    result = assert_query_budget(EXAMPLES_QUERY, max_queries=1, variables={"first": 20})
+
+    page = result.data["examples"]
+    assert len(page["edges"]) == 20
+    assert page["page_info"]["has_next_page"] is True
+
+
+def test_examples_next_page_query_budget(examples):
+    first_page = assert_query_budget(EXAMPLES_QUERY, max_queries=1, variables={"first": 20})
+    after = first_page.data["examples"]["page_info"]["end_cursor"]
+
+    result = assert_query_budget(EXAMPLES_QUERY, max_queries=1, variables={"first": 20, "after": after})
+
+    page = result.data["examples"]
+    assert len(page["edges"]) == 10
+    assert page["page_info"]["has_next_page"] is False
+
+
+def test_total_count_adds_one_query(examples):
+    result = assert_query_budget(
+        "{ examples(first: 5) { total_count edges { node { id } } } }", max_queries=2
+    )
+
+    assert result.data["examples"]["total_count"] == 30
+
+
+def test_query_budget_fails_over_budget(examples):
+    with pytest.raises(AssertionError, match="2 SQL statements run, budget is 1"):
+        assert_query_budget("{ examples(first: 5) { total_count edges { node { id } } } }", max_queries=1)
+
+
+@pytest.mark.django_db
+def test_repeated_statements_are_reported():
+    stats = QueryStats()
+    with connection.execute_wrapper(stats):
+        for pk in range(3):
+            ExampleModel.objects.filter(id=pk).exists()
+
+    [(statement, count)] = stats.repeated(threshold=3)
+    assert count == 3
+    assert "WHERE" in statement and "?" in statement
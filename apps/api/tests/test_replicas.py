@@ -0,0 +1,66 @@
+import pytest
+import strawberry
+from asgiref.sync import async_to_sync
+
+from apps.api.schema import loaders
+from apps.api.schema.types import ExampleType, example_tag
+from core.utils import replicas
+from core.utils.replicas import ReplicaSet, read_databases
+from core.utils.response_cache import invalidate
+
+EXAMPLE_QUERY = '{ example(id: "1") { id } }'
+
+
+@pytest.fixture
+def reads(monkeypatch, settings):
+    """Databases each example load would read from, without a real replica"""
+    settings.DATABASE_REPLICAS = ["replica_1"]
+    settings.GRAPHQL_COALESCE_QUERIES = False
+    monkeypatch.setattr(replicas, "_replica_set", ReplicaSet(["replica_1"], retry_after=30))
+    databases = []
+
+    async def load(keys):
+        databases.append(read_databases()[0])
+        return [
+            ExampleType(id=strawberry.ID(str(pk)), name="Example", created_at=None, updated_at=None)
+            for pk, _ in keys
+        ]
+
+    monkeypatch.setattr(loaders, "load_examples", load)
+    return databases
+
+
+def test_queries_read_from_replicas(graphql, reads):
+    graphql(EXAMPLE_QUERY)
+
+    assert reads == ["replica_1"]
+
+
+def test_sticky_clients_read_from_the_primary(client, graphql, reads):
+    client.cookies.set(replicas.STICKY_COOKIE, "1")
+
+    graphql(EXAMPLE_QUERY)
+
+    assert reads == ["default"]
+
+
+def test_cache_fills_after_an_invalidation_read_from_the_primary(graphql, reads, settings):
+    settings.DATABASE_REPLICA_STICKY_SECONDS = 60
+    graphql(EXAMPLE_QUERY)
+
+    async_to_sync(invalidate)(example_tag(1))
+    graphql(EXAMPLE_QUERY)
+    # Served from the cache filled by the primary
+    graphql(EXAMPLE_QUERY)
+
+    assert reads == ["replica_1", "default"]
+
+
+def test_cache_fills_after_the_sticky_window_read_from_replicas(graphql, reads, settings):
+    settings.DATABASE_REPLICA_STICKY_SECONDS = 0
+    graphql(EXAMPLE_QUERY)
+
+    async_to_sync(invalidate)(example_tag(1))
+    graphql(EXAMPLE_QUERY)
+
+    assert reads == ["replica_1", "replica_1"]
@@ -0,0 +1,70 @@
+import pytest
+
+from apps.api.models import ExampleModel
+
+EXAMPLE_QUERY = "query ($id: ID!) { example(id: $id) { name } }"
+EXAMPLES_QUERY = "{ examples(first: 10) { edges { node { name } } } }"
+
+
+@pytest.fixture
+def example(transactional_db):
+    return ExampleModel.objects.create(name="Original")
+
+
+def example_name(graphql, id):
+    return graphql(EXAMPLE_QUERY, {"id": id}).json()["data"]["example"]["name"]
+
+
+def test_reads_are_served_from_the_cache(graphql, example):
+    assert example_name(graphql, str(example.id)) == "Original"
+    # Bypasses the mutations, so nothing is invalidated
+    ExampleModel.objects.filter(id=example.id).update(name="Changed")
+
+    assert example_name(graphql, str(example.id)) == "Original"
+
+
+@pytest.mark.parametrize("id_format", ["{}", "0{}"])
+def test_update_example_invalidates_reads(graphql, example, id_format):
+    read_id = id_format.format(example.id)
+    assert example_name(graphql, read_id) == "Original"
+
+    graphql(
+        'mutation ($id: ID!) { update_example(id: $id, input: { name: "Updated" }) { name } }',
+        {"id": str(example.id)},
+    )
+
+    assert example_name(graphql, read_id) == "Updated"
+
+
+def test_delete_example_invalidates_reads(graphql, example):
+    assert example_name(graphql, "0" + str(example.id)) == "Original"
+
+    graphql("mutation ($id: ID!) { delete_example(id: $id) }", {"id": str(example.id)})
+
+    assert graphql(EXAMPLE_QUERY, {"id": "0" + str(example.id)}).json()["data"]["example"] is None
+
+
+def test_bulk_mutations_invalidate_lists_and_rows(graphql, example):
+    assert graphql(EXAMPLES_QUERY).json()["data"]["examples"]["edges"] == [{"node": {"name": "Original"}}]
+    assert example_name(graphql, "0" + str(example.id)) == "Original"
+
+    graphql(
+        'mutation ($id: ID!) { update_examples(input: [{ id: $id, name: "Bulk" }]) { id } }',
+        {"id": str(example.id)},
+    )
+
+    assert graphql(EXAMPLES_QUERY).json()["data"]["examples"]["edges"] == [{"node": {"name": "Bulk"}}]
+    assert example_name(graphql, "0" + str(example.id)) == "Bulk"
+
+
+def test_cached_reads_are_not_shared_across_auth_scopes(graphql, example):
+    def read(**headers):
+        response = graphql(EXAMPLE_QUERY, {"id": str(example.id)}, headers=headers)
+        return response.json()["data"]["example"]["name"]
+
+    assert read(Authorization="Bearer alice") == "Original"
+    ExampleModel.objects.filter(id=example.id).update(name="Changed")
+
+    assert read(Authorization="Bearer alice") == "Original"
+    assert read(Authorization="Bearer bob") == "Changed"
+    assert read(Cookie="session=carol") == "Changed"
@@ -0,0 +1,88 @@
+"""
+Concurrent-request throughput of blocking vs thread-pooled resolvers
+
+Each SQL statement is delayed to emulate a network round trip to
+Postgres. The "blocking" schema reproduces the previous sync resolvers,
+which ran the ORM on the event loop thread; the others run the real
+schema with different DATABASE_THREAD_POOL_SIZE values.
+
+    python -m benchmarks.async_resolvers
+"""
+import asyncio
+import os
+from typing import List, Optional
+
+from benchmarks.utils import print_results
+from benchmarks.utils import run_load
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+from benchmarks.utils import simulated_query_latency
+
+QUERY_LATENCY = 0.01
+REQUESTS = 200
+CONCURRENCY = 50
+PAYLOAD = {"query": "{ examples(is_active: true) { edges { node { id name } } } }"}
+BLOCKING_PAYLOAD = {"query": "{ examples(is_active: true) { id name } }"}
+
+
+def blocking_app():
+    import strawberry
+    from fastapi import FastAPI
+    from strawberry.fastapi import GraphQLRouter
+    from strawberry.schema.config import StrawberryConfig
+
+    from apps.api.models import ExampleModel
+    from apps.api.schema.types import ExampleType
+
+    @strawberry.type
+    class Query:
+        @strawberry.field
+        def examples(self, is_active: Optional[bool] = None) -> List[ExampleType]:
+            queryset = ExampleModel.objects.all()
+            if is_active is not None:
+                queryset = queryset.filter(is_active=is_active)
+            return [ExampleType.from_model(obj) for obj in queryset]
+
+    schema = strawberry.Schema(
+        query=Query, config=StrawberryConfig(auto_camel_case=False)
+    )
+    app = FastAPI()
+    app.include_router(GraphQLRouter(schema, path="/"), prefix="/api/graphql")
+    return app
+
+
+async def main() -> None:
+    from django.test import override_settings
+
+    from core.asgi import fastapp
+    from core.utils.db import shutdown_executor
+
+    results = {}
+
+    with simulated_query_latency(QUERY_LATENCY):
+        # The old resolvers only ran with Django's async safety check off
+        os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
+        results["blocking (sync resolvers)"] = await run_load(
+            blocking_app(), BLOCKING_PAYLOAD, REQUESTS, CONCURRENCY
+        )
+        del os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"]
+
+        for pool_size in (0, 1, 8, 32):
+            shutdown_executor()
+            with override_settings(DATABASE_THREAD_POOL_SIZE=pool_size):
+                results[f"async, pool size {pool_size}"] = await run_load(
+                    fastapp, PAYLOAD, REQUESTS, CONCURRENCY
+                )
+        shutdown_executor()
+
+    print_results(
+        f"{REQUESTS} requests, concurrency {CONCURRENCY}, "
+        f"{QUERY_LATENCY * 1000:.0f}ms per SQL statement",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(20)
+    asyncio.run(main())
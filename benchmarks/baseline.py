@@ -0,0 +1,109 @@
+"""
+JSON baselines for the benchmark suite (benchmarks.micro, benchmarks.load)
+
+A run saves its results with `--save PATH`; a later run given
+`--compare PATH` fails (exit status 1) when a metric got worse than the
+baseline by more than `--tolerance` (a fraction, 0.25 by default).
+Latencies (`p99_ms`, `us_per_row`...) are lower-is-better, `throughput`
+and rates (`..._per_s`) higher-is-better; other metrics are informational.
+Millisecond latencies must also grow by MIN_REGRESSION_MS to count.
+
+Baselines only compare runs on the same machine: in CI, save one from
+the main branch and compare the branch under test against it, e.g.
+
+    python -m benchmarks.load --save .benchmarks/load.json     # main
+    python -m benchmarks.load --compare .benchmarks/load.json  # branch
+"""
+import argparse
+import json
+import os
+import platform
+from typing import Callable, Dict, List, Optional
+
+Results = Dict[str, Dict[str, float]]
+
+DEFAULT_TOLERANCE = 0.25
+# Tail latencies of sub-millisecond requests jitter by more than the
+# tolerance; slowdowns of `_ms` metrics below this are not regressions
+MIN_REGRESSION_MS = 1.0
+
+
+def parse_args(
+    description: str,
+    add_arguments: Optional[Callable[[argparse.ArgumentParser], None]] = None,
+) -> argparse.Namespace:
+    """Command line of a benchmark; `add_arguments` adds its own options"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail on regressions against a JSON baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="accepted slowdown as a fraction of the baseline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--database-url",
+        help="run against this database (e.g. a local Postgres) instead of a fresh SQLite file",
+    )
+    if add_arguments is not None:
+        add_arguments(parser)
+    return parser.parse_args()
+
+
+def direction(metric: str) -> int:
+    """1 when higher is better, -1 when lower is better, 0 to ignore"""
+    if metric == "throughput" or metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_us")) or metric.startswith(("ms_per_", "us_per_")):
+        return -1
+    return 0
+
+
+def save_baseline(path: str, name: str, results: Results) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(
+            {"benchmark": name, "python": platform.python_version(), "results": results},
+            file,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def find_regressions(baseline: Results, results: Results, tolerance: float) -> List[str]:
+    """Metrics of `results` worse than `baseline` by more than `tolerance`"""
+    regressions = []
+    for row, metrics in results.items():
+        for metric, value in metrics.items():
+            expected = baseline.get(row, {}).get(metric)
+            sign = direction(metric)
+            if not sign or not expected:
+                continue
+            change = (value - expected) / expected * sign
+            if metric.endswith("_ms") and value - expected < MIN_REGRESSION_MS:
+                continue
+            if change < -tolerance:
+                regressions.append(f"{row}: {metric} {expected} -> {value} ({change:+.0%})")
+    return regressions
+
+
+def report(name: str, results: Results, args: argparse.Namespace) -> int:
+    """Save and/or compare `results` as asked on the command line, returning the exit status"""
+    if args.save:
+        save_baseline(args.save, name, results)
+        print(f"\nBaseline saved to {args.save}")
+    if not args.compare:
+        return 0
+    with open(args.compare) as file:
+        baseline = json.load(file)["results"]
+    regressions = find_regressions(baseline, results, args.tolerance)
+    if not regressions:
+        print(f"\nNo regression against {args.compare} (tolerance {args.tolerance:.0%})")
+        return 0
+    print(f"\nRegressions against {args.compare} (tolerance {args.tolerance:.0%}):")
+    for regression in regressions:
+        print(f"  {regression}")
+    return 1
@@ -0,0 +1,78 @@
+"""
+50 small operations (`example(id)` and `hello`) sent as 50 requests,
+one after the other and all at once, versus one batched request
+
+Requests go through the whole ASGI app, middleware included. SQL
+statements are counted over all the operations.
+
+    python -m benchmarks.batching
+"""
+import asyncio
+import time
+
+from benchmarks.utils import captured_statements
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+OPERATIONS = 50
+REPEAT = 20
+EXAMPLE = "query Example($id: ID!) { example(id: $id) { id name description } }"
+
+
+def operations(ids) -> list:
+    return [
+        {"query": EXAMPLE, "variables": {"id": pk}} if index % 5 else {"query": "{ hello }"}
+        for index, pk in enumerate(ids[:OPERATIONS])
+    ]
+
+
+async def measure(app, payloads: list, mode: str) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+
+        async def send() -> list:
+            if mode == "batch":
+                response = await client.post("/api/graphql/", json=payloads)
+                return response.json()
+            if mode == "concurrent":
+                responses = await asyncio.gather(
+                    *(client.post("/api/graphql/", json=payload) for payload in payloads)
+                )
+            else:
+                responses = [await client.post("/api/graphql/", json=payload) for payload in payloads]
+            return [response.json() for response in responses]
+
+        await send()
+        with captured_statements() as statements:
+            started = time.perf_counter()
+            for _ in range(REPEAT):
+                results = await send()
+            elapsed = (time.perf_counter() - started) / REPEAT
+
+    assert len(results) == OPERATIONS and not any("errors" in result for result in results)
+    return {
+        "requests": 1 if mode == "batch" else OPERATIONS,
+        "ms_per_50_operations": round(elapsed * 1000, 2),
+        "sql_statements": len(statements) // REPEAT,
+    }
+
+
+async def main(ids) -> None:
+    from core.asgi import fastapp
+
+    payloads = operations(ids)
+    results = {
+        "50 requests, sequential": await measure(fastapp, payloads, "sequential"),
+        "50 requests, concurrent": await measure(fastapp, payloads, "concurrent"),
+        "1 batch of 50": await measure(fastapp, payloads, "batch"),
+    }
+    print_results(f"{OPERATIONS} operations, mean of {REPEAT} runs", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    ids = seed_examples(OPERATIONS)
+    asyncio.run(main(ids))
@@ -0,0 +1,104 @@
+"""
+Throughput of per-row mutations vs create_examples / update_examples /
+delete_examples
+
+An importer writes ITEMS rows, renames them and deletes them, once with
+one `*_example` operation per row and once with a single bulk mutation
+per step. Every SQL statement is delayed to emulate a remote database.
+
+    python -m benchmarks.bulk_mutations
+"""
+import asyncio
+import time
+
+from benchmarks.utils import captured_statements
+from benchmarks.utils import print_results
+from benchmarks.utils import setup_django
+from benchmarks.utils import simulated_query_latency
+
+QUERY_LATENCY = 0.001
+ITEMS = 1_000
+
+CREATE = "mutation($input: ExampleInput!) { create_example(input: $input) { id } }"
+UPDATE = (
+    "mutation($id: ID!, $input: ExampleInput!) "
+    "{ update_example(id: $id, input: $input) { id } }"
+)
+DELETE = "mutation($id: ID!) { delete_example(id: $id) }"
+CREATE_MANY = (
+    "mutation($input: [ExampleInput!]!) "
+    "{ create_examples(input: $input) { id error { code } } }"
+)
+UPDATE_MANY = (
+    "mutation($input: [ExampleUpdateInput!]!) "
+    "{ update_examples(input: $input) { id error { code } } }"
+)
+DELETE_MANY = "mutation($ids: [ID!]!) { delete_examples(ids: $ids) { id error { code } } }"
+
+
+async def execute(query: str, variables: dict) -> dict:
+    from core.asgi import get_context
+    from core.schema import schema
+
+    result = await schema.execute(
+        query, variable_values=variables, context_value=await get_context()
+    )
+    assert result.errors is None, result.errors
+    return result.data
+
+
+async def per_row() -> list:
+    ids = []
+    for index in range(ITEMS):
+        data = await execute(CREATE, {"input": {"name": f"row {index}"}})
+        ids.append(data["create_example"]["id"])
+    created = time.perf_counter()
+    for id in ids:
+        await execute(UPDATE, {"id": id, "input": {"name": f"renamed {id}"}})
+    updated = time.perf_counter()
+    for id in ids:
+        await execute(DELETE, {"id": id})
+    return [created, updated]
+
+
+async def bulk() -> list:
+    data = await execute(CREATE_MANY, {"input": [{"name": f"row {i}"} for i in range(ITEMS)]})
+    ids = [result["id"] for result in data["create_examples"]]
+    created = time.perf_counter()
+    await execute(
+        UPDATE_MANY, {"input": [{"id": id, "name": f"renamed {id}"} for id in ids]}
+    )
+    updated = time.perf_counter()
+    await execute(DELETE_MANY, {"ids": ids})
+    return [created, updated]
+
+
+def measure(run) -> dict:
+    with captured_statements() as statements:
+        started = time.perf_counter()
+        created, updated = asyncio.run(run())
+        finished = time.perf_counter()
+    return {
+        "create_rows_per_s": round(ITEMS / (created - started)),
+        "update_rows_per_s": round(ITEMS / (updated - created)),
+        "delete_rows_per_s": round(ITEMS / (finished - updated)),
+        "sql_statements": len(statements),
+    }
+
+
+def main() -> None:
+    with simulated_query_latency(QUERY_LATENCY):
+        results = {
+            "per-row mutations": measure(per_row),
+            "bulk mutations": measure(bulk),
+        }
+    print_results(
+        f"{ITEMS} rows created, updated and deleted, "
+        f"{QUERY_LATENCY * 1000:.0f}ms per SQL statement",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    main()
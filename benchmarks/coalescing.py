@@ -0,0 +1,63 @@
+"""
+Thundering herd of identical `examples(is_active: true)` reads, with and
+without in-flight coalescing
+
+Every SQL statement sleeps a little to stand in for a remote database,
+so concurrent requests overlap. Statements are counted over the run.
+
+    python -m benchmarks.coalescing
+"""
+import asyncio
+import time
+
+from benchmarks.utils import installed_execute_wrapper
+from benchmarks.utils import print_results
+from benchmarks.utils import run_load
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+REQUESTS = 1_000
+CONCURRENCY = 100
+QUERY_LATENCY = 0.005
+PAYLOAD = {"query": "{ examples(is_active: true, first: 20) { edges { node { id name } } } }"}
+
+
+async def herd(app) -> dict:
+    statements = []
+
+    def slow_execute(execute, sql, params, many, context):
+        statements.append(sql)
+        time.sleep(QUERY_LATENCY)
+        return execute(sql, params, many, context)
+
+    with installed_execute_wrapper(slow_execute):
+        result = await run_load(app, PAYLOAD, REQUESTS, CONCURRENCY)
+    return {
+        "throughput": result["throughput"],
+        "p50_ms": result["p50_ms"],
+        "p99_ms": result["p99_ms"],
+        "sql_statements": len(statements),
+    }
+
+
+async def main() -> None:
+    from django.conf import settings
+
+    from core.asgi import fastapp
+
+    results = {}
+    settings.GRAPHQL_COALESCE_QUERIES = False
+    results["no coalescing"] = await herd(fastapp)
+    settings.GRAPHQL_COALESCE_QUERIES = True
+    results["coalescing"] = await herd(fastapp)
+    print_results(
+        f"{REQUESTS} identical reads, concurrency {CONCURRENCY}, "
+        f"{QUERY_LATENCY * 1000:g} ms per statement",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(100)
+    asyncio.run(main())
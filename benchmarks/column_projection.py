@@ -0,0 +1,82 @@
+"""
+Narrow queries over wide-text rows: full rows vs projected columns
+
+`examples { edges { node { id name } } }` used to read every column,
+including the large `description` TextField. Resolvers now load only the
+selected columns (core.utils.selection).
+
+    python -m benchmarks.column_projection
+"""
+import asyncio
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+ROWS = 2_000
+DESCRIPTION_SIZE = 32 * 1024
+PAGE_SIZE = 200
+REPEAT = 20
+
+NARROW = f"{{ examples(first: {PAGE_SIZE}) {{ edges {{ node {{ id name }} }} }} }}"
+WIDE = (
+    f"{{ examples(first: {PAGE_SIZE}) "
+    "{ edges { node { id name description created_at updated_at } } } }"
+)
+
+
+def orm_page(columns) -> dict:
+    """Fetch and convert one page the way the examples resolver does"""
+    from apps.api.models import ExampleModel
+    from apps.api.schema.types import ExampleType
+    from core.utils.pagination import paginate_queryset
+
+    queryset = ExampleModel.objects.only(*columns)
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        page = paginate_queryset(queryset, first=PAGE_SIZE)
+        [ExampleType.from_model(obj) for obj in page.items]
+    elapsed = (time.perf_counter() - started) / REPEAT
+
+    rows = ExampleModel.objects.values_list(*columns)[:PAGE_SIZE]
+    fetched = sum(len(str(value)) for row in rows for value in row)
+    return {"ms_per_page": round(elapsed * 1000, 3), "bytes_fetched": fetched}
+
+
+async def graphql(query: str) -> dict:
+    from core.asgi import get_context
+    from core.schema import schema
+
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = await schema.execute(query, context_value=await get_context())
+        assert result.errors is None, result.errors
+    elapsed = (time.perf_counter() - started) / REPEAT
+    return {"ms_per_request": round(elapsed * 1000, 3)}
+
+
+def main() -> None:
+    from apps.api.models import ExampleModel
+
+    all_columns = [field.name for field in ExampleModel._meta.concrete_fields]
+    print_results(
+        f"ORM: {PAGE_SIZE}-row page, {DESCRIPTION_SIZE // 1024}KB descriptions",
+        {
+            "id, name (projected)": orm_page(["id", "name", "created_at"]),
+            "all columns (previous)": orm_page(all_columns),
+        },
+    )
+    print_results(
+        "GraphQL: end to end",
+        {
+            "narrow selection": asyncio.run(graphql(NARROW)),
+            "wide selection": asyncio.run(graphql(WIDE)),
+        },
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(ROWS, description_size=DESCRIPTION_SIZE)
+    main()
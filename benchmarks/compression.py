@@ -0,0 +1,80 @@
+"""
+Bytes saved against CPU time per response size for each encoding
+
+Bodies are real `examples` responses, grown by repeating their edges
+with distinct ids. zstd and br are skipped when their package is not
+installed.
+
+    python -m benchmarks.compression
+"""
+import asyncio
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+SIZES = (10, 200, 2_000, 20_000)
+ENCODINGS = (("gzip", 1), ("gzip", 6), ("br", 4), ("br", 9), ("zstd", 3), ("zstd", 9))
+PAGE_SIZE = 200
+QUERY = (
+    "{ examples(first: %d) { edges { cursor node "
+    "{ id name description is_active created_at updated_at } } } }" % PAGE_SIZE
+)
+
+
+async def page_edges() -> list:
+    from core.asgi import get_context
+    from core.schema import schema
+
+    result = await schema.execute(QUERY, context_value=await get_context())
+    return result.data["examples"]["edges"]
+
+
+def body(edges: list, rows: int) -> bytes:
+    from core.utils.encoding import dumps
+
+    grown = [
+        {**edge, "node": {**edge["node"], "id": str(index)}}
+        for index, edge in zip(range(rows), (edges[i % len(edges)] for i in range(rows)))
+    ]
+    return dumps({"data": {"examples": {"edges": grown}}})
+
+
+def measure(data: bytes, encoding: str, level: int) -> dict:
+    from core.utils.compression import available_encodings
+
+    make = available_encodings()[encoding]
+    repeat = max(1, 2_000_000 // len(data))
+    started = time.process_time()
+    for _ in range(repeat):
+        compressor = make(level)
+        compressed = compressor.compress(data) + compressor.finish()
+    cpu = (time.process_time() - started) / repeat
+    return {
+        "kb": round(len(compressed) / 1024, 1),
+        "saved": f"{1 - len(compressed) / len(data):.0%}",
+        "cpu_ms": round(cpu * 1000, 3),
+        "mb_per_s": round(len(data) / cpu / 1e6),
+    }
+
+
+def main() -> None:
+    from core.utils.compression import available_encodings
+
+    edges = asyncio.run(page_edges())
+    available = available_encodings()
+    for rows in SIZES:
+        data = body(edges, rows)
+        results = {
+            f"{encoding} level {level}": measure(data, encoding, level)
+            for encoding, level in ENCODINGS
+            if encoding in available
+        }
+        print_results(f"{rows} examples, {len(data) / 1024:.1f} KB uncompressed", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(PAGE_SIZE)
+    main()
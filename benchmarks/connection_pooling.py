@@ -0,0 +1,76 @@
+"""
+Request latency with and without connection reuse (DATABASE_POOL_MODE)
+
+Every new connection is delayed to emulate the TCP + TLS + auth
+handshake of a remote Postgres, and every statement to emulate the
+round trip. "none" pays the handshake on each ORM call; "persistent"
+keeps each ORM thread's connection and health-checks it before reuse.
+
+The psycopg "pool" mode needs PostgreSQL: point BENCHMARK_DATABASE_URL at
+a scratch database to include it (its tables are created there).
+
+    python -m benchmarks.connection_pooling
+    BENCHMARK_DATABASE_URL=postgresql://... python -m benchmarks.connection_pooling
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import run_load
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+from benchmarks.utils import simulated_query_latency
+
+CONNECT_LATENCY = 0.02
+QUERY_LATENCY = 0.001
+REQUESTS = 500
+CONCURRENCY = 20
+PAYLOAD = {"query": "{ examples(first: 10) { edges { node { id name } } } }"}
+
+
+def simulate_connect_latency(sender, connection, **kwargs) -> None:
+    time.sleep(CONNECT_LATENCY)
+
+
+async def main() -> None:
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    from core.asgi import fastapp
+    from core.utils.db import shutdown_executor
+    from core.utils.settings import configure_database
+
+    database = connections.settings["default"]
+    modes = ["none", "persistent"]
+    if database["ENGINE"] == "django.db.backends.postgresql":
+        modes.append("pool")
+
+    results = {}
+    connection_created.connect(simulate_connect_latency)
+    try:
+        with simulated_query_latency(QUERY_LATENCY):
+            for mode in modes:
+                # Fresh ORM threads so no connection outlives the previous mode
+                shutdown_executor()
+                connections.close_all()
+                configure_database(database, mode, pool_max_size=CONCURRENCY)
+                results[mode] = await run_load(fastapp, PAYLOAD, REQUESTS, CONCURRENCY)
+                if mode == "pool":
+                    connections["default"].close_pool()
+    finally:
+        connection_created.disconnect(simulate_connect_latency)
+        shutdown_executor()
+
+    print_results(
+        f"{REQUESTS} requests, concurrency {CONCURRENCY}, "
+        f"{CONNECT_LATENCY * 1000:.0f}ms per connect, "
+        f"{QUERY_LATENCY * 1000:.0f}ms per SQL statement",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    setup_django(database_url=os.environ.get("BENCHMARK_DATABASE_URL"))
+    seed_examples(50)
+    asyncio.run(main())
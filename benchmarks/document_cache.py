@@ -0,0 +1,76 @@
+"""
+Per-request parse + validate overhead with and without the document cache
+
+Executes a typical gateway operation against the federation schema with
+and without DocumentCacheExtension. The resolvers are cheap (`hello`,
+`__typename`), so the difference is the parse/validate work skipped on
+cache hits.
+
+    python -m benchmarks.document_cache
+"""
+import asyncio
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import setup_django
+
+REPEAT = 2_000
+
+QUERY = """
+query GatewayOperation($name: String) {
+  hello(name: $name)
+  a: hello(name: "a")
+  b: hello(name: "b")
+  __typename
+  ...ServiceFields
+}
+
+fragment ServiceFields on Query {
+  _service { __typename }
+  examplesType: __type(name: "ExampleType") {
+    name
+    fields { name type { name kind ofType { name kind } } }
+  }
+}
+"""
+
+
+async def run(schema) -> dict:
+    variables = {"name": "bench"}
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = await schema.execute(QUERY, variable_values=variables)
+        assert result.errors is None, result.errors
+    elapsed = time.perf_counter() - started
+    return {
+        "us_per_request": round(elapsed / REPEAT * 1_000_000, 1),
+        "requests_per_s": round(REPEAT / elapsed),
+    }
+
+
+def main() -> None:
+    import strawberry
+    from strawberry.schema.config import StrawberryConfig
+
+    from apps.api.schema.mutations import Mutation
+    from apps.api.schema.queries import Query
+    from core.schema import schema
+
+    uncached = strawberry.federation.Schema(
+        query=Query,
+        mutation=Mutation,
+        config=StrawberryConfig(auto_camel_case=False),
+        enable_federation_2=True,
+    )
+    print_results(
+        f"{REPEAT} executions of one operation",
+        {
+            "no document cache": asyncio.run(run(uncached)),
+            "document cache": asyncio.run(run(schema)),
+        },
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    main()
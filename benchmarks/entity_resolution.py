@@ -0,0 +1,72 @@
+"""
+SQL round trips needed to resolve federation entities
+
+Resolves ENTITIES `_entities` representations plus repeated
+`example(id)` fields and reports how many statements were executed.
+With the per-request DataLoader each case needs a single id__in query.
+
+    python -m benchmarks.entity_resolution
+"""
+import asyncio
+import time
+from typing import List
+
+from benchmarks.utils import captured_statements
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+ENTITIES = 500
+
+ENTITIES_QUERY = """
+query ($representations: [_Any!]!) {
+  _entities(representations: $representations) {
+    ... on ExampleType { id name }
+  }
+}
+"""
+
+REPEATED_QUERY = """
+{
+  a: example(id: 1) { id name }
+  b: example(id: 2) { id name }
+  c: example(id: 1) { id description }
+  d: example(id: 3) { id }
+}
+"""
+
+
+async def execute(query: str, variables: dict = None) -> dict:
+    from core.asgi import get_context
+    from core.schema import schema
+
+    with captured_statements() as statements:
+        started = time.perf_counter()
+        result = await schema.execute(
+            query, variable_values=variables, context_value=await get_context()
+        )
+        elapsed = time.perf_counter() - started
+    assert result.errors is None, result.errors
+    return {
+        "statements": len(statements),
+        "elapsed_ms": round(elapsed * 1000, 3),
+    }
+
+
+async def main(ids: List[int]) -> None:
+    representations = [{"__typename": "ExampleType", "id": str(pk)} for pk in ids]
+
+    print_results(
+        "Federation entity resolution",
+        {
+            f"_entities x{len(ids)}": await execute(
+                ENTITIES_QUERY, {"representations": representations}
+            ),
+            "repeated example(id)": await execute(REPEATED_QUERY),
+        },
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    asyncio.run(main(seed_examples(ENTITIES)))
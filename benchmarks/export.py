@@ -0,0 +1,76 @@
+"""
+Peak memory of /api/export/examples/ for growing tables
+
+Streams the export route's body for each format and table size while
+tracemalloc records the peak of Python allocations (database thread
+included). tracemalloc slows everything down, so the timings only
+compare runs with each other. "in memory" is the previous way out: load every row, then
+serialize the whole result set at once.
+
+    python -m benchmarks.export
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+SIZES = (1_000, 10_000, 100_000)
+FORMATS = ("csv", "ndjson", "xlsx")
+
+
+async def stream(format: str) -> int:
+    from core.asgi import export_examples
+    from core.utils.export import ExportFormat
+
+    response = await export_examples(format=ExportFormat(format))
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+def in_memory() -> int:
+    from apps.api.models import ExampleModel
+    from apps.api.schema.types import ExampleType
+
+    examples = [ExampleType.from_model(obj) for obj in ExampleModel.objects.order_by("id")]
+    return len(json.dumps([vars(example) for example in examples], default=str))
+
+
+def measure(run) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "output_mb": round(size / 2**20, 1),
+        "peak_mb": round(peak / 2**20, 2),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def main() -> None:
+    # Warm up imports so they don't count towards the first peak
+    seed_examples(1)
+    for format in FORMATS:
+        asyncio.run(stream(format))
+    seeded = 1
+    for rows in SIZES:
+        seed_examples(rows - seeded)
+        seeded = rows
+        results = {
+            format: measure(lambda: asyncio.run(stream(format))) for format in FORMATS
+        }
+        results["in memory (json)"] = measure(in_memory)
+        print_results(f"{rows} rows", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    main()
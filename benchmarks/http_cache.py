@@ -0,0 +1,68 @@
+"""
+Cost of repeated reads: POST, GET served by the response cache, and
+conditional GET revalidated with If-None-Match
+
+Every request reads the same page of `examples`; SQL statements and
+response body bytes are counted over all requests.
+
+    python -m benchmarks.http_cache
+"""
+import asyncio
+import time
+
+from benchmarks.utils import captured_statements
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+REQUESTS = 500
+QUERY = "{ examples(first: 100) { edges { node { id name description created_at } } } }"
+
+
+async def repeated_reads(app, method: str, conditional: bool = False) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+
+        async def read(headers: dict) -> httpx.Response:
+            if method == "GET":
+                return await client.get("/api/graphql/", params={"query": QUERY}, headers=headers)
+            return await client.post("/api/graphql/", json={"query": QUERY}, headers=headers)
+
+        etag = (await read({})).headers.get("etag")
+        headers = {"if-none-match": etag} if conditional and etag else {}
+        received = 0
+        with captured_statements() as statements:
+            started = time.perf_counter()
+            for _ in range(REQUESTS):
+                response = await read(headers)
+                received += len(response.content)
+            elapsed = time.perf_counter() - started
+
+    return {
+        "status": response.status_code,
+        "ms_per_request": round(elapsed / REQUESTS * 1000, 3),
+        "sql_statements": len(statements),
+        "body_kb": round(received / 1024),
+    }
+
+
+async def main() -> None:
+    from django.conf import settings
+
+    from core.asgi import fastapp
+    from core.utils.response_cache import set_response_cache
+
+    results = {"POST, no response cache": await repeated_reads(fastapp, "POST")}
+    settings.GRAPHQL_RESPONSE_CACHE_BACKEND = "local"
+    set_response_cache(None)
+    results["GET, response cache"] = await repeated_reads(fastapp, "GET")
+    results["GET, If-None-Match"] = await repeated_reads(fastapp, "GET", conditional=True)
+    print_results(f"{REQUESTS} repeated reads of 100 examples", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(100)
+    asyncio.run(main())
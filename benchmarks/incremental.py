@@ -0,0 +1,100 @@
+"""
+Time to the first byte and to the last one by page size, for `examples`
+returned at once and with `edges @stream(initialCount: 10)`
+
+Requests go straight to the ASGI app, timing the response body chunks
+as the server sends them.
+
+    python -m benchmarks.incremental
+"""
+import asyncio
+import json
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+PAGE_SIZES = (100, 1_000, 10_000)
+REPEAT = 5
+QUERY = "{ examples(first: %d) { edges%s { cursor node { id name description created_at } } } }"
+STREAM = " @stream(initialCount: 10)"
+MULTIPART = "multipart/mixed;deferSpec=20220824, application/json"
+
+
+async def timed_request(app, query: str, accept: str) -> dict:
+    body = json.dumps({"query": query}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/graphql/",
+        "raw_path": b"/api/graphql/",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/json"),
+            (b"accept", accept.encode()),
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    sent = False
+    blocked = asyncio.Event()
+
+    async def receive() -> dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client stays connected
+        await blocked.wait()
+        return {"type": "http.disconnect"}
+
+    first = None
+    size = 0
+
+    async def send(message: dict) -> None:
+        nonlocal first, size
+        if message["type"] == "http.response.body" and message.get("body"):
+            first = first or time.perf_counter()
+            size += len(message["body"])
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return {"first": first - started, "last": time.perf_counter() - started, "size": size}
+
+
+async def measure(app, page_size: int, streamed: bool) -> dict:
+    query = QUERY % (page_size, STREAM if streamed else "")
+    accept = MULTIPART if streamed else "application/json"
+    await timed_request(app, query, accept)
+    samples = [await timed_request(app, query, accept) for _ in range(REPEAT)]
+    return {
+        "first_byte_ms": round(min(sample["first"] for sample in samples) * 1000, 2),
+        "last_byte_ms": round(min(sample["last"] for sample in samples) * 1000, 2),
+        "kb": round(samples[0]["size"] / 1024),
+    }
+
+
+async def main() -> None:
+    from django.conf import settings
+
+    from core.asgi import fastapp
+
+    settings.GRAPHQL_CONNECTION_MAX_RESULTS = max(PAGE_SIZES)
+    settings.GRAPHQL_MAX_COST = 0
+    results = {}
+    for page_size in PAGE_SIZES:
+        results[f"{page_size} rows, at once"] = await measure(fastapp, page_size, streamed=False)
+        results[f"{page_size} rows, @stream"] = await measure(fastapp, page_size, streamed=True)
+    print_results(f"examples by page size (best of {REPEAT})", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(max(PAGE_SIZES))
+    asyncio.run(main())
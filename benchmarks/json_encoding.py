@@ -0,0 +1,67 @@
+"""
+CPU time per request with the standard library and the orjson encoder
+
+Large pages of `examples` are requested one at a time through the ASGI
+app; CPU time (process time) per request is measured for the whole
+stack and for encoding the response alone.
+
+    python -m benchmarks.json_encoding
+"""
+import asyncio
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+REQUESTS = 200
+PAGE_SIZE = 200
+PAYLOAD = {
+    "query": "{ examples(first: %d) { edges { cursor node "
+    "{ id name description is_active created_at updated_at } } } }" % PAGE_SIZE
+}
+
+
+async def cpu_per_request(app) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        (await client.post("/api/graphql/", json=PAYLOAD)).raise_for_status()
+        started = time.process_time()
+        for _ in range(REQUESTS):
+            (await client.post("/api/graphql/", json=PAYLOAD)).raise_for_status()
+        return (time.process_time() - started) / REQUESTS
+
+
+async def main() -> None:
+    from django.conf import settings
+
+    from core.asgi import fastapp, get_context
+    from core.schema import schema
+    from core.utils.encoding import dumps
+    from strawberry.http import process_result
+
+    result = await schema.execute(PAYLOAD["query"], context_value=await get_context())
+    response = process_result(result)
+
+    results = {}
+    for encoder in ("json", "orjson"):
+        settings.JSON_ENCODER = encoder
+        started = time.process_time()
+        for _ in range(REQUESTS):
+            body = dumps(response)
+        encode_ms = (time.process_time() - started) / REQUESTS * 1000
+        results[encoder] = {
+            "cpu_ms_per_request": round(await cpu_per_request(fastapp) * 1000, 3),
+            "encode_ms": round(encode_ms, 3),
+            "body_kb": round(len(body) / 1024),
+        }
+
+    print_results(f"{REQUESTS} requests for {PAGE_SIZE} examples each", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(PAGE_SIZE)
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Fetching and converting a 10k-row list: model instances vs named tuples
+
+Reads every row with `.only(*columns)` and ExampleType.from_model, as
+list queries used to, and with `.values_list(*columns, named=True)` and
+ExampleType.from_row, as they do now. Reports time per row and the
+memory allocated per row while converting (tracemalloc, run separately
+from the timings).
+
+    python -m benchmarks.list_conversion
+"""
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+ROWS = 10_000
+ROUNDS = 5
+COLUMNS = ("id", "name", "description", "is_active", "created_at", "updated_at")
+
+
+def measure(convert) -> dict:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        nodes = convert()
+        timings.append(time.perf_counter() - started)
+    assert len(nodes) == ROWS
+
+    tracemalloc.start()
+    nodes = convert()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "us_per_row": round(statistics.median(timings) / ROWS * 1_000_000, 3),
+        "peak_bytes_per_row": round(peak / ROWS),
+    }
+
+
+def main() -> None:
+    from apps.api.models import ExampleModel
+    from apps.api.schema.types import ExampleType
+
+    def models() -> list:
+        return [ExampleType.from_model(obj) for obj in ExampleModel.objects.only(*COLUMNS)]
+
+    def rows() -> list:
+        return [ExampleType.from_row(row) for row in ExampleModel.objects.values_list(*COLUMNS, named=True)]
+
+    print_results(
+        f"Fetch + convert {ROWS} rows (median of {ROUNDS})",
+        {
+            "only() + from_model": measure(models),
+            "values_list() + from_row": measure(rows),
+        },
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(ROWS)
+    main()
@@ -0,0 +1,76 @@
+"""
+ASGI-level load test of fastapp with the production schema and settings
+
+Drives the FastAPI application in process through httpx with a few
+representative operations against seeded rows (a fresh SQLite file, or
+--database-url, e.g. a local Postgres) and reports throughput and
+p50/p95/p99 latency for each. Save and compare JSON baselines with
+--save / --compare (see benchmarks/baseline.py).
+
+    python -m benchmarks.load [--requests N] [--concurrency N] [--save PATH] [--compare PATH]
+"""
+import asyncio
+import sys
+
+from benchmarks.baseline import parse_args
+from benchmarks.baseline import report
+from benchmarks.utils import print_results
+from benchmarks.utils import run_load
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+ROWS = 1_000
+REQUESTS = 500
+CONCURRENCY = 20
+WARMUP = 20
+
+FIELDS = "id name description is_active created_at updated_at"
+
+
+def scenarios(ids: list) -> dict:
+    return {
+        "hello": {"query": "{ hello }"},
+        "example(id)": {
+            "query": f"query Example($id: ID!) {{ example(id: $id) {{ {FIELDS} }} }}",
+            "variables": {"id": str(ids[len(ids) // 2])},
+        },
+        "examples(first: 20)": {
+            "query": f"{{ examples(is_active: true, first: 20) {{ edges {{ node {{ {FIELDS} }} }} }} }}"
+        },
+        "examples(first: 100)": {
+            "query": f"{{ examples(first: 100) {{ total_count edges {{ node {{ {FIELDS} }} }} }} }}"
+        },
+        "_entities x 20": {
+            "query": (
+                "query Entities($representations: [_Any!]!) "
+                "{ _entities(representations: $representations) { ... on ExampleType { id name } } }"
+            ),
+            "variables": {
+                "representations": [{"__typename": "ExampleType", "id": str(pk)} for pk in ids[:20]]
+            },
+        },
+    }
+
+
+async def main(ids: list, requests: int, concurrency: int) -> dict:
+    from core.asgi import fastapp
+
+    results = {}
+    for label, payload in scenarios(ids).items():
+        await run_load(fastapp, payload, WARMUP, concurrency)
+        results[label] = await run_load(fastapp, payload, requests, concurrency)
+    print_results(f"{requests} requests per operation, concurrency {concurrency}", results)
+    return results
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="requests per operation")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight")
+
+
+if __name__ == "__main__":
+    args = parse_args("ASGI-level load test of fastapp", add_arguments)
+    setup_django(database_url=args.database_url)
+    ids = seed_examples(ROWS)
+    results = asyncio.run(main(ids, args.requests, args.concurrency))
+    sys.exit(report("load", results, args))
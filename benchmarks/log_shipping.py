@@ -0,0 +1,125 @@
+"""
+Request latency with logging off, with synchronous handlers, and with
+the queued, batched pipeline of core/utils/logs.py
+
+At DEBUG every request logs its SQL statements. Records go to a console
+stream whose writes are delayed to emulate a congested stdout pipe, and
+to a local Fluent forward receiver. Synchronous handlers pay both on the
+request path; the queued pipeline only enqueues.
+
+    python -m benchmarks.log_shipping
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import run_load
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+WRITE_LATENCY = 0.0002
+REQUESTS = 1_000
+CONCURRENCY = 20
+PAYLOAD = {"query": "{ examples(first: 10) { edges { node { id name } } } }"}
+
+
+class SlowStream:
+    """Stream whose writes take WRITE_LATENCY"""
+
+    def write(self, text: str) -> int:
+        time.sleep(WRITE_LATENCY)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class FluentReceiver:
+    """Accept Fluent forward connections and count the bytes received"""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self) -> None:
+        while True:
+            connection, _ = self.server.accept()
+            threading.Thread(target=self.read, args=(connection,), daemon=True).start()
+
+    def read(self, connection: socket.socket) -> None:
+        while data := connection.recv(65536):
+            self.received += len(data)
+
+
+def configure(mode: str, port: int) -> None:
+    from fluent.handler import FluentHandler, FluentRecordFormatter
+
+    from core.utils.logs import FluentBatchHandler, start_log_listener, stop_log_listener
+
+    stop_log_listener()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    level = logging.WARNING if mode == "off" else logging.DEBUG
+    root.setLevel(level)
+    logging.getLogger("django").setLevel(level)
+    if mode == "off":
+        return
+
+    console = logging.StreamHandler(SlowStream())
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-8s %(name)-15s %(message)s"))
+    handler_class = FluentHandler if mode == "sync" else FluentBatchHandler
+    fluent = handler_class("python.logging", host="127.0.0.1", port=port)
+    fluent.setFormatter(FluentRecordFormatter({"level": "%(levelname)s", "location": "%(module)s.%(funcName)s"}))
+    root.addHandler(console)
+    root.addHandler(fluent)
+    if mode == "queued":
+        start_log_listener()
+
+
+async def main() -> None:
+    from prometheus_client import REGISTRY
+
+    from core.asgi import fastapp
+    from core.utils.logs import stop_log_listener
+
+    receiver = FluentReceiver()
+    # setup_django() silences INFO and below
+    logging.disable(logging.NOTSET)
+
+    results = {}
+    labels = {
+        "off": "logging off",
+        "sync": "DEBUG, synchronous handlers",
+        "queued": "DEBUG, queued + batched",
+    }
+    for mode, label in labels.items():
+        configure(mode, receiver.port)
+        received = receiver.received
+        results[label] = await run_load(fastapp, PAYLOAD, REQUESTS, CONCURRENCY)
+        stop_log_listener()
+        results[label]["fluent_kb"] = round((receiver.received - received) / 1024)
+
+    configure("off", receiver.port)
+    dropped = REGISTRY.get_sample_value("log_records_dropped_total")
+    print_results(
+        f"{REQUESTS} requests, concurrency {CONCURRENCY}, "
+        f"{WRITE_LATENCY * 1000:.1f}ms per console write "
+        f"({dropped:.0f} records dropped)",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    os.environ["LOG_LEVEL"] = "DEBUG"
+    setup_django()
+    seed_examples(50)
+    asyncio.run(main())
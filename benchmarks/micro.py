@@ -0,0 +1,170 @@
+"""
+Micro-benchmarks of the per-row and per-request hot paths
+
+- ExampleType.from_model, ExampleType.from_row and
+  core.utils.models.model_to_dict over in-memory rows (no database)
+- parse + validate of a typical operation against the schema
+- resolver execution through schema.execute, against seeded rows
+
+Each figure is the median of several timed rounds. Save and compare JSON
+baselines with --save / --compare (see benchmarks/baseline.py).
+
+    python -m benchmarks.micro [--save PATH] [--compare PATH]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from benchmarks.baseline import parse_args
+from benchmarks.baseline import report
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+ROWS = 10_000
+ROUNDS = 5
+PARSE_REPEAT = 500
+EXECUTE_REPEAT = 200
+
+OPERATION = """
+query ExamplesPage($first: Int, $after: String) {
+  examples(is_active: true, first: $first, after: $after) {
+    edges { cursor node { id name description is_active created_at updated_at } }
+    page_info { has_next_page end_cursor }
+  }
+}
+"""
+EXAMPLE = "query Example($id: ID!) { example(id: $id) { id name description is_active } }"
+
+
+def median_seconds(run: Callable[[], None], rounds: int = ROUNDS) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+async def median_seconds_async(run: Callable[[], Awaitable[None]], rounds: int = ROUNDS) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def per_row(seconds: float, count: int) -> dict:
+    return {
+        "us_per_row": round(seconds / count * 1_000_000, 3),
+        "rows_per_s": round(count / seconds),
+    }
+
+
+def conversions() -> dict:
+    from apps.api.models import ExampleModel
+    from apps.api.schema.types import ExampleType
+    from core.utils.models import model_to_dict
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        ExampleModel(
+            id=i + 1,
+            name=f"example {i}",
+            description="x" * 64,
+            is_active=True,
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(ROWS)
+    ]
+    columns = ("id", "name", "description", "is_active", "created_at", "updated_at")
+    Row = namedtuple("Row", columns)
+    tuples = [Row(*(getattr(row, column) for column in columns)) for row in rows]
+    fields = ["id", "name", "description", "is_active"]
+    return {
+        "ExampleType.from_model": per_row(
+            median_seconds(lambda: [ExampleType.from_model(row) for row in rows]), ROWS
+        ),
+        "ExampleType.from_row": per_row(
+            median_seconds(lambda: [ExampleType.from_row(row) for row in tuples]), ROWS
+        ),
+        "model_to_dict": per_row(
+            median_seconds(lambda: [model_to_dict(row) for row in rows]), ROWS
+        ),
+        "model_to_dict(fields, exclude)": per_row(
+            median_seconds(lambda: [model_to_dict(row, fields=fields, exclude=["id"]) for row in rows]),
+            ROWS,
+        ),
+    }
+
+
+def parse_and_validate() -> dict:
+    from graphql import parse, validate
+
+    from core.schema import schema
+
+    def run() -> None:
+        for _ in range(PARSE_REPEAT):
+            assert not validate(schema._schema, parse(OPERATION))
+
+    seconds = median_seconds(run)
+    return {
+        "parse + validate": {
+            "us_per_op": round(seconds / PARSE_REPEAT * 1_000_000, 1),
+            "ops_per_s": round(PARSE_REPEAT / seconds),
+        }
+    }
+
+
+async def execution(ids: list) -> dict:
+    from apps.api.schema.loaders import get_loaders
+    from core.schema import schema
+    from core.utils.queries import QueryStats
+
+    async def execute(query: str, variables: dict) -> None:
+        for _ in range(EXECUTE_REPEAT):
+            result = await schema.execute(
+                query,
+                variable_values=variables,
+                context_value={"loaders": get_loaders(), "queries": QueryStats()},
+            )
+            assert result.errors is None, result.errors
+
+    results = {}
+    for label, query, variables in (
+        ("execute example(id)", EXAMPLE, {"id": str(ids[len(ids) // 2])}),
+        ("execute examples(first: 20)", OPERATION, {"first": 20}),
+        ("execute examples(first: 100)", OPERATION, {"first": 100}),
+    ):
+        seconds = await median_seconds_async(lambda: execute(query, variables))
+        results[label] = {
+            "us_per_op": round(seconds / EXECUTE_REPEAT * 1_000_000, 1),
+            "ops_per_s": round(EXECUTE_REPEAT / seconds),
+        }
+    return results
+
+
+def main(ids: list) -> dict:
+    results = {}
+    results.update(conversions())
+    results.update(parse_and_validate())
+    results.update(asyncio.run(execution(ids)))
+    print_results(
+        f"Micro-benchmarks, median of {ROUNDS} rounds "
+        f"({ROWS} rows, {PARSE_REPEAT} parses, {EXECUTE_REPEAT} executions per round)",
+        results,
+    )
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_args("Micro-benchmarks of the per-row and per-request hot paths")
+    setup_django(database_url=args.database_url)
+    ids = seed_examples(1_000)
+    sys.exit(report("micro", main(ids), args))
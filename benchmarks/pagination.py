@@ -0,0 +1,58 @@
+"""
+Cost of deep pages: keyset cursors vs OFFSET
+
+Walks to a page far into the table and compares the time of fetching it
+through a keyset cursor (what `examples` does) with the equivalent
+OFFSET query.
+
+    python -m benchmarks.pagination
+"""
+import time
+
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+ROWS = 200_000
+PAGE_SIZE = 20
+PAGES = (1, 100, 5_000, 9_999)
+REPEAT = 20
+
+
+def timed(fetch) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        fetch()
+    return (time.perf_counter() - started) / REPEAT * 1000
+
+
+def main() -> None:
+    from apps.api.models import ExampleModel
+    from core.utils.pagination import DEFAULT_ORDERING
+    from core.utils.pagination import encode_cursor
+    from core.utils.pagination import paginate_queryset
+
+    queryset = ExampleModel.objects.all()
+    results = {}
+    for page in PAGES:
+        offset = (page - 1) * PAGE_SIZE
+        ordered = queryset.order_by(*DEFAULT_ORDERING)
+        cursor = encode_cursor(ordered[offset - 1]) if offset else None
+
+        results[f"page {page}"] = {
+            "keyset_ms": round(
+                timed(lambda: paginate_queryset(queryset, first=PAGE_SIZE, after=cursor)),
+                3,
+            ),
+            "offset_ms": round(
+                timed(lambda: list(ordered[offset : offset + PAGE_SIZE + 1])), 3
+            ),
+        }
+
+    print_results(f"{ROWS} rows, page size {PAGE_SIZE}", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(ROWS)
+    main()
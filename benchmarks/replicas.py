@@ -0,0 +1,93 @@
+"""
+Where reads and writes go with read replicas, with SQLite files standing
+in for the primary and two replicas (copies taken after seeding)
+
+A read load runs alongside a stream of mutations, first with every
+statement on the primary, then with query operations on the replicas.
+The last run breaks one replica to show reads failing over.
+
+    python -m benchmarks.replicas
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+from benchmarks.utils import installed_execute_wrapper
+from benchmarks.utils import print_results
+from benchmarks.utils import run_load
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+READS = 1_000
+WRITES = 100
+CONCURRENCY = 20
+DIRECTORY = tempfile.mkdtemp(prefix="replicas-")
+PRIMARY = os.path.join(DIRECTORY, "primary.sqlite3")
+REPLICAS = [os.path.join(DIRECTORY, f"replica_{index}.sqlite3") for index in (1, 2)]
+READ_PAYLOAD = {"query": "{ examples(first: 20) { edges { node { id name } } } }"}
+WRITE_PAYLOAD = {
+    "query": 'mutation { create_example(input: {name: "written", description: "benchmark"}) { id } }'
+}
+
+
+async def mixed_load(app) -> dict:
+    statements: Counter = Counter()
+
+    def count(execute, sql, params, many, context):
+        statements[context["connection"].alias] += 1
+        return execute(sql, params, many, context)
+
+    with installed_execute_wrapper(count):
+        reads, _ = await asyncio.gather(
+            run_load(app, READ_PAYLOAD, READS, CONCURRENCY),
+            run_load(app, WRITE_PAYLOAD, WRITES, 1),
+        )
+    return {"throughput": reads["throughput"], "p99_ms": reads["p99_ms"], **dict(sorted(statements.items()))}
+
+
+async def read_your_writes(app) -> bool:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        created = await client.post("/api/graphql/", json=WRITE_PAYLOAD)
+        pk = created.json()["data"]["create_example"]["id"]
+        read = await client.post("/api/graphql/", json={"query": "{ example(id: %s) { id } }" % pk})
+        return read.json()["data"]["example"] is not None
+
+
+async def main() -> None:
+    from django.conf import settings
+
+    from core.asgi import fastapp
+
+    replicas = settings.DATABASE_REPLICAS
+    results = {}
+    settings.DATABASE_REPLICAS = []
+    results["primary only"] = await mixed_load(fastapp)
+    settings.DATABASE_REPLICAS = replicas
+    results["replicas"] = await mixed_load(fastapp)
+
+    # A replica that can no longer be opened
+    os.remove(REPLICAS[1])
+    os.mkdir(REPLICAS[1])
+    results["replica_2 down"] = await mixed_load(fastapp)
+
+    print_results(
+        f"{READS} reads (concurrency {CONCURRENCY}) alongside {WRITES} mutations, "
+        "statements per database",
+        results,
+    )
+    print(f"\nRead own write right after a mutation: {await read_your_writes(fastapp)}")
+    shutil.rmtree(DIRECTORY)
+
+
+if __name__ == "__main__":
+    os.environ["DATABASE_REPLICA_URLS"] = ",".join(f"sqlite:///{path}" for path in REPLICAS)
+    setup_django(PRIMARY)
+    seed_examples(100)
+    for path in REPLICAS:
+        shutil.copy(PRIMARY, path)
+    asyncio.run(main())
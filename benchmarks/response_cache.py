@@ -0,0 +1,86 @@
+"""
+Skewed read traffic with and without the response cache
+
+Clients read a hot set of examples (`example(id:)` and the first page of
+`examples`) while a small share of requests update one of them. Every
+SQL statement is delayed to emulate a remote database. With the cache,
+reads only reach the database after a mutation invalidated them.
+
+    python -m benchmarks.response_cache
+"""
+import asyncio
+import random
+import time
+
+from benchmarks.utils import captured_statements
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+from benchmarks.utils import simulated_query_latency
+
+QUERY_LATENCY = 0.002
+REQUESTS = 2_000
+HOT_SET = 20
+WRITE_RATIO = 0.02
+
+EXAMPLE = "query Example($id: ID!) { example(id: $id) { id name is_active } }"
+EXAMPLES = "{ examples(first: 20) { edges { node { id name } } } }"
+UPDATE = (
+    "mutation Update($id: ID!, $name: String!) "
+    "{ update_example(id: $id, input: {name: $name}) { id } }"
+)
+
+
+async def run(ids) -> dict:
+    from core.asgi import get_context
+    from core.schema import schema
+
+    rng = random.Random(0)
+    with captured_statements() as statements:
+        started = time.perf_counter()
+        for index in range(REQUESTS):
+            roll = rng.random()
+            if roll < WRITE_RATIO:
+                query = UPDATE
+                variables = {"id": rng.choice(ids), "name": f"renamed {index}"}
+            elif roll < 0.5:
+                query, variables = EXAMPLES, None
+            else:
+                query, variables = EXAMPLE, {"id": rng.choice(ids)}
+            result = await schema.execute(
+                query, variable_values=variables, context_value=await get_context()
+            )
+            assert result.errors is None, result.errors
+        elapsed = time.perf_counter() - started
+    return {
+        "ms_per_request": round(elapsed / REQUESTS * 1000, 3),
+        "sql_statements": len(statements),
+    }
+
+
+def main(ids) -> None:
+    from django.test import override_settings
+
+    from core.utils.response_cache import set_response_cache
+
+    results = {}
+    with simulated_query_latency(QUERY_LATENCY):
+        results["no response cache"] = asyncio.run(run(ids))
+        with override_settings(GRAPHQL_RESPONSE_CACHE_BACKEND="local"):
+            set_response_cache(None)
+            results["local response cache"] = asyncio.run(run(ids))
+        with override_settings(GRAPHQL_RESPONSE_CACHE_BACKEND="django"):
+            set_response_cache(None)
+            results["django cache alias"] = asyncio.run(run(ids))
+        set_response_cache(None)
+
+    print_results(
+        f"{REQUESTS} requests over {HOT_SET} hot rows, {WRITE_RATIO:.0%} writes, "
+        f"{QUERY_LATENCY * 1000:.0f}ms per SQL statement",
+        results,
+    )
+
+
+if __name__ == "__main__":
+    setup_django()
+    main([str(pk) for pk in seed_examples(HOT_SET)])
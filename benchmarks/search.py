@@ -0,0 +1,89 @@
+"""
+search_examples over a large table: FTS5 trigram index vs icontains
+
+Fills the table with names and descriptions drawn from a random word
+list, then times one page of search results through the search index
+(what `search_examples` does on SQLite) and through the previous
+`name__icontains` filter, for a rare and a common needle. On
+PostgreSQL the same search runs on the GIN trigram indexes.
+
+    python -m benchmarks.search
+"""
+import random
+import string
+import time
+from typing import List
+
+from benchmarks.utils import print_results
+from benchmarks.utils import setup_django
+
+ROWS = 1_000_000
+WORDS = 20_000
+PAGE_SIZE = 20
+REPEAT = 5
+
+
+def seed(rows: int) -> List[str]:
+    """Insert `rows` rows of random words, return the word list"""
+    from apps.api.models import ExampleModel
+
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+        for _ in range(WORDS)
+    ]
+    for start in range(0, rows, 10_000):
+        ExampleModel.objects.bulk_create(
+            [
+                ExampleModel(
+                    name=" ".join(rng.choices(words, k=3)),
+                    description=" ".join(rng.choices(words, k=8)),
+                )
+                for _ in range(min(10_000, rows - start))
+            ]
+        )
+    return words
+
+
+def timed(fetch) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        fetch()
+    return (time.perf_counter() - started) / REPEAT * 1000
+
+
+def main(words: List[str]) -> None:
+    from apps.api.models import ExampleModel
+    from apps.api.search import example_search
+    from core.utils.pagination import paginate_queryset
+    from core.utils.search import paginate_hits
+
+    def indexed(needle: str) -> None:
+        hits = example_search.search(needle)
+        page_hits, _, _ = paginate_hits(hits, first=PAGE_SIZE)
+        ExampleModel.objects.in_bulk([pk for pk, _ in page_hits])
+
+    def icontains(needle: str) -> None:
+        queryset = ExampleModel.objects.filter(name__icontains=needle)
+        paginate_queryset(queryset, first=PAGE_SIZE)
+
+    needles = {
+        "rare needle (1 word)": words[0],
+        "common needle (3 chars)": words[1][:3],
+        "no match": "zzzzzzzzzz",
+    }
+    results = {}
+    for label, needle in needles.items():
+        matches = ExampleModel.objects.filter(name__icontains=needle).count()
+        results[label] = {
+            "name_matches": matches,
+            "search_index_ms": round(timed(lambda: indexed(needle)), 3),
+            "icontains_ms": round(timed(lambda: icontains(needle)), 3),
+        }
+
+    print_results(f"{ROWS} rows, page size {PAGE_SIZE}", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    main(seed(ROWS))
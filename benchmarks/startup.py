@@ -0,0 +1,134 @@
+"""
+Cold boot and memory of gunicorn workers, with and without preload_app
+
+Reports the time to import the application in a fresh interpreter, then
+starts gunicorn with gunicorn.conf.py for each mode and reports the
+time until every worker has started its application, and the memory of
+the master and the workers after they served some requests. PSS splits
+shared pages between the processes sharing them, so its total is the
+memory the whole server really uses; USS is what each worker holds for
+itself. Linux only (/proc/<pid>/smaps_rollup).
+
+    python -m benchmarks.startup
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.utils import BENCHMARK_DATABASE
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+
+WORKERS = 4
+PORT = 8765
+REQUESTS = 200
+IMPORT_RUNS = 3
+READY = "Application startup complete."
+PAYLOAD = {"query": "{ examples(first: 20) { edges { node { id name } } } }"}
+
+
+def environment(**extra: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{BENCHMARK_DATABASE}",
+        "DJANGO_SETTINGS_MODULE": "core.settings.base",
+        "LOG_LEVEL": "INFO",
+        **extra,
+    }
+
+
+def import_seconds() -> float:
+    """Best time to import core.asgi (Django, schema, FastAPI app) from scratch"""
+    code = "import time; started = time.perf_counter(); import core.asgi; print(time.perf_counter() - started)"
+    runs = [
+        float(subprocess.run(
+            [sys.executable, "-c", code], env=environment(), capture_output=True, text=True, check=True
+        ).stdout)
+        for _ in range(IMPORT_RUNS)
+    ]
+    return min(runs)
+
+
+def memory(pid: int) -> dict:
+    """Resident, proportional and unique set sizes of `pid`, in kB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "uss": values["Private_Clean"] + values["Private_Dirty"],
+    }
+
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as file:
+        return [int(child) for child in file.read().split()]
+
+
+def run_gunicorn(preload: bool) -> dict:
+    import httpx
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "core.asgi:fastapp"],
+        env=environment(WORKERS=str(WORKERS), PORT=str(PORT), PRELOAD_APP=str(preload).lower()),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    ready = threading.Event()
+    booted = []
+
+    def watch() -> None:
+        for line in server.stderr:
+            if READY in line:
+                booted.append(time.perf_counter())
+                if len(booted) == WORKERS:
+                    ready.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+    try:
+        if not ready.wait(120):
+            raise RuntimeError("gunicorn workers did not start")
+        boot = booted[-1] - started
+
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORT}") as client:
+            for _ in range(REQUESTS):
+                client.post("/api/graphql/", json=PAYLOAD).raise_for_status()
+
+        master = memory(server.pid)
+        workers = [memory(pid) for pid in children(server.pid)]
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    mb = 1024
+    return {
+        "boot_s": round(boot, 2),
+        "master_pss_mb": round(master["pss"] / mb, 1),
+        "worker_rss_mb": round(sum(worker["rss"] for worker in workers) / len(workers) / mb, 1),
+        "worker_uss_mb": round(sum(worker["uss"] for worker in workers) / len(workers) / mb, 1),
+        "total_pss_mb": round((master["pss"] + sum(worker["pss"] for worker in workers)) / mb, 1),
+    }
+
+
+def main() -> None:
+    print(f"\nImport of core.asgi in a fresh interpreter: {import_seconds():.2f} s (best of {IMPORT_RUNS})")
+    results = {
+        "no preload": run_gunicorn(preload=False),
+        "preload + gc.freeze": run_gunicorn(preload=True),
+    }
+    print_results(f"gunicorn with {WORKERS} workers, after {REQUESTS} requests", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(100)
+    main()
@@ -0,0 +1,96 @@
+"""
+Mutation latency and change delivery by number of `example_changes`
+subscribers
+
+Subscribers run the subscription through the schema, as the WebSocket
+handler does; mutations go through the ASGI app. Mutations return
+before the fan-out, which runs in the pub/sub broker's task, and each
+change reads its row once whatever the number of subscribers. What the
+mutations still lose with many subscribers is the event loop time the
+subscribers spend executing their selection for every change.
+
+    python -m benchmarks.subscriptions
+"""
+import asyncio
+import time
+
+from benchmarks.utils import captured_statements
+from benchmarks.utils import print_results
+from benchmarks.utils import seed_examples
+from benchmarks.utils import setup_django
+from benchmarks.utils import summarize
+
+SUBSCRIBERS = (0, 100, 1_000, 5_000)
+MUTATIONS = 10
+SUBSCRIPTION = "subscription { example_changes { kind id example { id name updated_at } } }"
+MUTATION = 'mutation { update_example(id: %d, input: {name: "changed %d"}) { id } }'
+
+
+async def subscriber(schema, received: list, expected: int, done: asyncio.Event) -> None:
+    results = await schema.subscribe(SUBSCRIPTION, context_value={})
+    async for result in results:
+        assert result.errors is None, result.errors
+        received.append(time.perf_counter())
+        if len(received) == expected:
+            done.set()
+
+
+async def measure(app, schema, pk: int, subscribers: int) -> dict:
+    import httpx
+
+    from apps.api.schema.subscriptions import EXAMPLES_CHANNEL
+    from core.utils.pubsub import get_broker
+
+    received: list = []
+    done = asyncio.Event()
+    tasks = [
+        asyncio.create_task(subscriber(schema, received, MUTATIONS * subscribers, done))
+        for _ in range(subscribers)
+    ]
+    while get_broker().subscribers(EXAMPLES_CHANNEL) < subscribers:
+        await asyncio.sleep(0.01)
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        with captured_statements() as statements:
+            started = time.perf_counter()
+            for index in range(MUTATIONS):
+                request_started = time.perf_counter()
+                response = await client.post("/api/graphql/", json={"query": MUTATION % (pk, index)})
+                latencies.append(time.perf_counter() - request_started)
+                assert "errors" not in response.json(), response.json()
+            if subscribers:
+                await done.wait()
+            delivered = (max(received) if received else time.perf_counter()) - started
+        # update_example itself runs a SELECT and an UPDATE
+        change_statements = len(statements) - MUTATIONS * 2
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    timings = summarize(latencies, delivered)
+    return {
+        "mutation_p50_ms": timings["p50_ms"],
+        "mutation_p99_ms": timings["p99_ms"],
+        "all_delivered_ms": round(delivered * 1000, 1),
+        "sql_per_change": change_statements / MUTATIONS,
+    }
+
+
+async def main() -> None:
+    from apps.api.models import ExampleModel
+    from core.asgi import fastapp
+    from core.schema import schema
+
+    pk = await ExampleModel.objects.values_list("id", flat=True).afirst()
+    results = {}
+    for subscribers in SUBSCRIBERS:
+        results[f"{subscribers} subscribers"] = await measure(fastapp, schema, pk, subscribers)
+    print_results(f"{MUTATIONS} update_example mutations", results)
+
+
+if __name__ == "__main__":
+    setup_django()
+    seed_examples(10)
+    asyncio.run(main())
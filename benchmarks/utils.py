@@ -0,0 +1,172 @@
+"""
+Shared helpers for the benchmark scripts
+
+Benchmarks run against a throwaway SQLite database so they need no
+external services. Run them from the project root, e.g.:
+    python -m benchmarks.async_resolvers
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Iterator, List, Optional
+
+BENCHMARK_DATABASE = os.path.join(tempfile.gettempdir(), "benchmarks.sqlite3")
+
+
+def setup_django(
+    database_path: str = BENCHMARK_DATABASE, database_url: Optional[str] = None
+) -> None:
+    """
+    Point Django at a fresh SQLite database (or at `database_url`) and
+    create the tables
+    """
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    else:
+        if os.path.exists(database_path):
+            os.remove(database_path)
+        os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.base")
+    # Measure the resolvers, not the response cache (see benchmarks.response_cache)
+    os.environ["GRAPHQL_RESPONSE_CACHE_BACKEND"] = ""
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    logging.disable(logging.INFO)
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+def seed_examples(count: int, description_size: int = 64) -> List[int]:
+    """Insert `count` ExampleModel rows and return every row id"""
+    from apps.api.models import ExampleModel
+
+    description = "x" * description_size
+    ExampleModel.objects.bulk_create(
+        [
+            ExampleModel(name=f"example {i}", description=description)
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+    return list(ExampleModel.objects.order_by("id").values_list("id", flat=True))
+
+
+@contextlib.contextmanager
+def installed_execute_wrapper(wrapper: Callable) -> Iterator[None]:
+    """
+    Install `wrapper` on every connection opened while the block runs,
+    including the ones opened by ORM worker threads
+    """
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    from core.utils.db import shutdown_executor
+
+    def install(sender, connection, **kwargs):
+        # execute_wrappers outlives reconnects of the same DatabaseWrapper
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    # Pool threads keep persistent connections open: start new ones so
+    # every connection used in the block is opened (and wrapped) in it
+    shutdown_executor()
+    connections.close_all()
+    connection_created.connect(install, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        shutdown_executor()
+        connections.close_all()
+        for connection in connections.all(initialized_only=True):
+            if wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(wrapper)
+
+
+@contextlib.contextmanager
+def simulated_query_latency(seconds: float) -> Iterator[None]:
+    """Sleep for `seconds` on every SQL statement, emulating a remote DB"""
+
+    def slow_execute(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    with installed_execute_wrapper(slow_execute):
+        yield
+
+
+@contextlib.contextmanager
+def captured_statements() -> Iterator[List[str]]:
+    """Collect the SQL executed from any thread while the block runs"""
+    statements: List[str] = []
+
+    def capture(execute, sql, params, many, context):
+        statements.append(sql)
+        return execute(sql, params, many, context)
+
+    with installed_execute_wrapper(capture):
+        yield statements
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> dict:
+    """Throughput and latency percentiles (milliseconds) for a run"""
+    return {
+        "requests": len(latencies),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_load(
+    app,
+    payload: dict,
+    requests: int,
+    concurrency: int,
+    path: str = "/api/graphql/",
+    headers: Optional[dict] = None,
+) -> dict:
+    """POST `payload` `requests` times with `concurrency` in flight"""
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://testserver", headers=headers
+    ) as client:
+
+        async def one() -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(path, json=payload)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return summarize(latencies, elapsed)
+
+
+def print_results(title: str, rows: dict) -> None:
+    print(f"\n{title}")
+    for label, result in rows.items():
+        details = "  ".join(f"{key}={value}" for key, value in result.items())
+        print(f"  {label:<28} {details}")
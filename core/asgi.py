@@ -1,67 +1,127 @@
-"""
-ASGI config for core project.
-
-It exposes the ASGI callable as a module-level variable named ``application``.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
-"""
-import os
-
-from django.core.asgi import get_asgi_application
-from prometheus_fastapi_instrumentator import Instrumentator
-
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.base")
-
-application = get_asgi_application()
-
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from strawberry.fastapi import GraphQLRouter
-
-from core.schema import schema
-
-# Simple context getter - customize as needed
-async def get_context():
-    return {}
-
-# GraphQL
-graphql_app = GraphQLRouter(schema, path="/", context_getter=get_context)
-fastapp = FastAPI(title="Django GraphQL Federation API")
-
-# Prometheus metrics
-Instrumentator().instrument(fastapp).expose(fastapp)
-
-# CORS configuration
-origins = [
-    "http://localhost:8000",
-    "http://localhost:3000",
-    "https://studio.apollographql.com",
-]
-
-fastapp.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include GraphQL router
-fastapp.include_router(graphql_app, prefix="/api/graphql")
-
-
-@fastapp.get("/api/health/", status_code=200)
-def health_check():
-    """Health check endpoint"""
-    return {"status": "ok", "service": "django-graphql-federation"}
-
-
-@fastapp.get("/api/info/")
-def application_info():
-    """Application information endpoint"""
-    return {
-        "name": "Django GraphQL Federation Template",
-        "version": "1.0.0",
-        "description": "A template for building GraphQL Federation services with Django, FastAPI, and Strawberry"
-    }
+"""
+ASGI config for core project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
+"""
+import contextlib
+import os
+from typing import Optional
+
+from django.core.asgi import get_asgi_application
+from prometheus_fastapi_instrumentator import Instrumentator
+from strawberry.subscriptions import GRAPHQL_TRANSPORT_WS_PROTOCOL
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.base")
+
+application = get_asgi_application()
+
+from django.conf import settings
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from apps.api.models import ExampleModel
+from apps.api.schema.loaders import get_loaders
+from core.router import GraphQLRouter
+from core.schema import schema
+from core.utils.compression import CompressionMiddleware
+from core.utils.db import shutdown_executor
+from core.utils.encoding import JSONResponse
+from core.utils.export import ExportFormat, export_response
+from core.utils.pubsub import close_broker
+from core.utils.queries import QueryStats
+
+# Context getter - runs once per request, customize as needed
+async def get_context():
+    # "queries" collects the SQL statements of the operation, see core/utils/queries.py
+    return {"loaders": get_loaders(), "queries": QueryStats()}
+
+# GraphQL
+graphql_app = GraphQLRouter(
+    schema,
+    path="/",
+    context_getter=get_context,
+    allow_queries_via_get=settings.GRAPHQL_QUERIES_VIA_GET,
+    # Subscriptions over WebSocket, see apps/api/schema/subscriptions.py
+    subscription_protocols=(GRAPHQL_TRANSPORT_WS_PROTOCOL,),
+)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Let in-flight ORM calls finish and stop pub/sub before the worker exits"""
+    yield
+    shutdown_executor()
+    await close_broker()
+
+
+fastapp = FastAPI(
+    title="Django GraphQL Federation API",
+    default_response_class=JSONResponse,
+    lifespan=lifespan,
+)
+
+# Prometheus metrics
+Instrumentator().instrument(fastapp).expose(fastapp)
+
+# CORS configuration
+origins = [
+    "http://localhost:8000",
+    "http://localhost:3000",
+    "https://studio.apollographql.com",
+]
+
+fastapp.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Response compression, see core/utils/compression.py
+fastapp.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    encodings=settings.COMPRESSION_ENCODINGS,
+    levels={
+        "gzip": settings.COMPRESSION_GZIP_LEVEL,
+        "br": settings.COMPRESSION_BROTLI_LEVEL,
+        "zstd": settings.COMPRESSION_ZSTD_LEVEL,
+    },
+)
+
+# Include GraphQL router
+fastapp.include_router(graphql_app, prefix="/api/graphql")
+
+
+@fastapp.get("/api/health/", status_code=200)
+def health_check():
+    """Health check endpoint"""
+    return {"status": "ok", "service": "django-graphql-federation"}
+
+
+@fastapp.get("/api/export/examples/")
+async def export_examples(format: ExportFormat = ExportFormat.CSV, is_active: Optional[bool] = None):
+    """Stream every example as CSV, NDJSON or XLSX"""
+    queryset = ExampleModel.objects.order_by("id")
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    return export_response(
+        queryset,
+        ("id", "name", "description", "is_active", "created_at", "updated_at"),
+        format,
+        filename="examples",
+    )
+
+
+@fastapp.get("/api/info/")
+def application_info():
+    """Application information endpoint"""
+    return {
+        "name": "Django GraphQL Federation Template",
+        "version": "1.0.0",
+        "description": "A template for building GraphQL Federation services with Django, FastAPI, and Strawberry"
+    }
@@ -0,0 +1,321 @@
+"""
+GraphQL router serving the federation schema
+
+Extends Strawberry's FastAPI GraphQLRouter with Apollo Automatic
+Persisted Queries: a client may send only
+`extensions.persistedQuery.sha256Hash`; when the hash is unknown it gets
+a `PersistedQueryNotFound` error and retries with the full query, which
+registers it. Persisted queries are served from the document cache
+(core/utils/document_cache.py), so a hash hit also skips parsing and
+validation.
+
+Responses are encoded by core/utils/encoding.py (orjson when available).
+GET responses carry an ETag and are answered with 304 when the client
+already holds them, see core/utils/http_cache.py. Operations using
+@defer or @stream are answered as multipart/mixed when the client
+accepts it, see core/utils/incremental.py.
+
+A POST body may also be a JSON array of operations (a batch, at most
+GRAPHQL_BATCH_MAX_OPERATIONS) run with the context of the request, so
+DataLoaders are shared across the batch, and the response is the array
+of their results in the same order. Mutations run one after another in
+array order: each starts once the operations before it are done, and
+the operations after it wait for it. Queries between two mutations run
+concurrently and must not depend on each other. @defer / @stream are
+ignored.
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Union
+
+from django.conf import settings
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+from graphql import DocumentNode, GraphQLError, GraphQLSyntaxError, parse
+from graphql import OperationType as GraphQLOperationType
+from graphql.utilities import get_operation_ast
+from prometheus_client import Counter, Histogram
+from strawberry.exceptions import MissingQueryError
+from strawberry.fastapi import GraphQLRouter as BaseGraphQLRouter
+from strawberry.http.exceptions import HTTPException
+from strawberry.schema.exceptions import InvalidOperationTypeError
+from strawberry.types import ExecutionResult
+from strawberry.types.graphql import OperationType
+from strawberry.types.unset import UNSET
+
+from core.utils.document_cache import document_hash, get_document_cache
+from core.utils.encoding import dumps, dumps_str
+from core.utils.http_cache import NO_STORE, conditional_response, is_cacheable, result_etag
+from core.utils.incremental import (
+    CONTEXT_KEY,
+    MULTIPART_MEDIA_TYPE,
+    IncrementalPublisher,
+    accepts_incremental,
+    multipart_chunks,
+)
+from core.utils.queries import QueryStats
+
+PERSISTED_QUERY_REQUESTS = Counter(
+    "graphql_persisted_query_requests_total",
+    "Automatic Persisted Query lookups",
+    ["result"],
+)
+GRAPHQL_BATCH_OPERATIONS = Histogram(
+    "graphql_batch_operations",
+    "Operations per batched request",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+
+# Operations a batch may contain; subscriptions need a WebSocket
+BATCH_OPERATION_TYPES = {OperationType.QUERY, OperationType.MUTATION}
+
+
+class PersistedQueryError(Exception):
+    code = "PERSISTED_QUERY_ERROR"
+
+    def as_result(self) -> ExecutionResult:
+        return ExecutionResult(
+            data=None,
+            errors=[GraphQLError(str(self), extensions={"code": self.code})],
+        )
+
+
+class PersistedQueryNotFound(PersistedQueryError):
+    code = "PERSISTED_QUERY_NOT_FOUND"
+
+    def __init__(self) -> None:
+        super().__init__("PersistedQueryNotFound")
+
+
+class PersistedQueryNotSupported(PersistedQueryError):
+    code = "PERSISTED_QUERY_NOT_SUPPORTED"
+
+    def __init__(self) -> None:
+        super().__init__("PersistedQueryNotSupported")
+
+
+class PersistedQueryHashMismatch(PersistedQueryError):
+    code = "BAD_USER_INPUT"
+
+    def __init__(self) -> None:
+        super().__init__("provided sha does not match query")
+
+
+def resolve_persisted_query(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill in `query` from `extensions.persistedQuery.sha256Hash`, or check
+    the hash of a query sent alongside it
+    """
+    extensions = data.get("extensions") or {}
+    persisted_query = extensions.get("persistedQuery")
+    if not persisted_query:
+        return data
+    if not settings.GRAPHQL_PERSISTED_QUERIES:
+        raise PersistedQueryNotSupported()
+
+    sha256_hash = persisted_query.get("sha256Hash")
+    query = data.get("query")
+    if query:
+        if document_hash(query) != sha256_hash:
+            raise PersistedQueryHashMismatch()
+        # Registered by the document cache once it validates
+        PERSISTED_QUERY_REQUESTS.labels(result="register").inc()
+        return data
+
+    cached = get_document_cache().get(sha256_hash, record=False) if sha256_hash else None
+    if cached is None:
+        PERSISTED_QUERY_REQUESTS.labels(result="miss").inc()
+        raise PersistedQueryNotFound()
+    PERSISTED_QUERY_REQUESTS.labels(result="hit").inc()
+    return {**data, "query": cached.query}
+
+
+def error_result(message: str) -> ExecutionResult:
+    return ExecutionResult(data=None, errors=[GraphQLError(message)])
+
+
+def is_mutation(data: Any) -> bool:
+    """Whether an operation of a batch is a mutation, False when unknown"""
+    if not isinstance(data, dict):
+        return False
+    document: Optional[DocumentNode] = None
+    query = data.get("query")
+    if query:
+        cached = get_document_cache().get(document_hash(query), record=False)
+    else:
+        persisted_query = (data.get("extensions") or {}).get("persistedQuery") or {}
+        sha256_hash = persisted_query.get("sha256Hash")
+        cached = get_document_cache().get(sha256_hash, record=False) if sha256_hash else None
+    if cached is not None:
+        document = cached.document
+    elif query:
+        try:
+            document = parse(query)
+        except GraphQLSyntaxError:
+            return False
+    if document is None:
+        return False
+    operation = get_operation_ast(document, data.get("operationName"))
+    return operation is not None and operation.operation == GraphQLOperationType.MUTATION
+
+
+async def is_batch(request: Request) -> bool:
+    """Whether the request is a POST of a JSON array of operations"""
+    if request.method != "POST" or "json" not in request.headers.get("content-type", ""):
+        return False
+    # Starlette keeps the body, it is not read twice
+    return (await request.body()).lstrip()[:1] == b"["
+
+
+class GraphQLRouter(BaseGraphQLRouter):
+    """
+    GraphQLRouter with Automatic Persisted Queries support, encoding
+    responses with core/utils/encoding.py, answering conditional GETs,
+    delivering @defer / @stream payloads incrementally and executing
+    batches of operations
+    """
+
+    async def run(self, request, context=UNSET, root_value=UNSET):
+        publisher = None
+        # WebSockets and the GraphiQL page are left alone
+        is_http = isinstance(request, Request)
+        if is_http and isinstance(context, dict):
+            if await is_batch(request):
+                return await self.run_batch(request, context, root_value)
+            # Strawberry 0.252's FastAPI router keeps the sub-response on the
+            # router (temporal_response), and reading the body above let
+            # other requests replace it before the base class takes it up
+            # in get_sub_response(): restore this request's own, which the
+            # context carries. Nothing awaits between here and that call
+            self.temporal_response = context.get("response", self.temporal_response)
+            if accepts_incremental(request):
+                publisher = context[CONTEXT_KEY] = IncrementalPublisher()
+        response = await super().run(request, context=context, root_value=root_value)
+        if publisher is not None and publisher.pending:
+            return self.create_multipart_response(response, publisher)
+        if is_http and request.method == "GET":
+            return conditional_response(request, response)
+        return response
+
+    async def run_batch(self, request: Request, context: Dict[str, Any], root_value: Optional[Any]) -> Response:
+        max_operations = settings.GRAPHQL_BATCH_MAX_OPERATIONS
+        if max_operations <= 0:
+            raise HTTPException(400, "Batched requests are not supported")
+        try:
+            operations = self.parse_json(await request.body())
+        except json.JSONDecodeError as error:
+            raise HTTPException(400, "Unable to parse request body as JSON") from error
+        if not operations:
+            raise HTTPException(400, "The batch contains no operation")
+        if len(operations) > max_operations:
+            raise HTTPException(400, f"At most {max_operations} operations are accepted per batch")
+        GRAPHQL_BATCH_OPERATIONS.observe(len(operations))
+
+        results: List[ExecutionResult] = []
+        queries: List[Any] = []
+        for data in operations:
+            if not is_mutation(data):
+                queries.append(data)
+                continue
+            # The queries listed before a mutation finish before it starts
+            results.extend(await self.execute_concurrently(queries, context, root_value))
+            queries = []
+            results.append(await self.execute_batched(data, context, root_value))
+            # The operations after it must not get rows loaded before it
+            loaders = context.get("loaders")
+            if loaders is not None:
+                loaders.clear_all()
+        results.extend(await self.execute_concurrently(queries, context, root_value))
+
+        response_data: List[Any] = [
+            await self.process_result(request=request, result=result) for result in results
+        ]
+        # Not temporal_response, which other requests replace meanwhile
+        return self.create_response(response_data, sub_response=context["response"])
+
+    async def execute_concurrently(
+        self, operations: List[Any], context: Dict[str, Any], root_value: Optional[Any]
+    ) -> List[ExecutionResult]:
+        return await asyncio.gather(
+            *(self.execute_batched(data, context, root_value) for data in operations)
+        )
+
+    async def execute_batched(self, data: Any, context: Dict[str, Any], root_value: Optional[Any]) -> ExecutionResult:
+        if not isinstance(data, dict):
+            return self.rejected(error_result("Each operation of a batch must be an object"))
+        try:
+            data = resolve_persisted_query(data)
+            # Shares the loaders, request and response of the batch, but
+            # collects the SQL statements of this operation only. The schema
+            # passes its errors to process_errors itself
+            return await self.schema.execute(
+                data.get("query"),
+                root_value=root_value,
+                variable_values=data.get("variables"),
+                context_value={**context, "queries": QueryStats()},
+                operation_name=data.get("operationName"),
+                allowed_operation_types=BATCH_OPERATION_TYPES,
+            )
+        except PersistedQueryError as error:
+            return self.rejected(error.as_result())
+        except MissingQueryError:
+            return self.rejected(error_result("No GraphQL query found in the request"))
+        except InvalidOperationTypeError as error:
+            return self.rejected(error_result(error.as_http_error_reason("POST")))
+
+    def rejected(self, result: ExecutionResult) -> ExecutionResult:
+        """
+        An operation of a batch answered without executing: report its
+        errors through the schema's process_errors, as executions do
+        """
+        self.schema.process_errors(result.errors)
+        return result
+
+    def create_multipart_response(self, response: Response, publisher: IncrementalPublisher) -> StreamingResponse:
+        # The first result is a JSON object: add hasNext without encoding it again
+        initial = response.body[:-1] + b',"hasNext":true}'
+        streaming = StreamingResponse(
+            multipart_chunks(initial, publisher),
+            status_code=response.status_code,
+            media_type=MULTIPART_MEDIA_TYPE,
+        )
+        for name, value in response.headers.items():
+            if name not in ("content-length", "content-type", "etag"):
+                streaming.headers.append(name, value)
+        # Partial results must not be mistaken for the whole response
+        streaming.headers["Cache-Control"] = NO_STORE
+        return streaming
+
+    def encode_json(self, data: Any) -> str:
+        return dumps_str(data)
+
+    def create_response(self, response_data, sub_response: Response) -> Response:
+        # Encoded straight to bytes, skipping the str round trip of encode_json
+        body = dumps(response_data)
+        response = Response(
+            body,
+            media_type="application/json",
+            status_code=sub_response.status_code or status.HTTP_200_OK,
+        )
+        response.headers.raw.extend(sub_response.headers.raw)
+        if is_cacheable(response):
+            response.headers["ETag"] = result_etag(response_data, body)
+        return response
+
+    def parse_json(self, data: Union[str, bytes]) -> Any:
+        payload = super().parse_json(data)
+        if isinstance(payload, dict):
+            return resolve_persisted_query(payload)
+        return payload
+
+    def parse_query_params(self, params) -> Dict[str, Any]:
+        params = super().parse_query_params(params)
+        if params.get("extensions"):
+            params["extensions"] = super().parse_json(params["extensions"])
+        return resolve_persisted_query(params)
+
+    async def execute_operation(self, request, context, root_value: Optional[Any]):
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as error:
+            return error.as_result()
@@ -1,12 +1,49 @@
+from datetime import datetime
+
 import strawberry
+from django.conf import settings
+from strawberry.extensions import QueryDepthLimiter
 from strawberry.schema.config import StrawberryConfig
 
 from apps.api.schema.mutations import Mutation
 from apps.api.schema.queries import Query
+from apps.api.schema.subscriptions import Subscription
+from core.utils.coalescing import CoalescingExtension
+from core.utils.cost import CostLimitExtension
+from core.utils.document_cache import DocumentCacheExtension
+from core.utils.http_cache import HTTPCacheExtension
+from core.utils.incremental import IncrementalExecutionContext, enable_incremental_delivery
+from core.utils.queries import QueryStatsExtension
+from core.utils.replicas import ReplicaRoutingExtension
+from core.utils.response_cache import ResponseCacheExtension
+from core.utils.schema import DateTime
+from core.utils.tracing import MetricsExtension, get_tracing_extensions
 
 schema = strawberry.federation.Schema(
     query=Query,
     mutation=Mutation,
+    subscription=Subscription,
     config=StrawberryConfig(auto_camel_case=False),
     enable_federation_2=True,
+    # Datetimes reach the response encoder unformatted, see core/utils/encoding.py
+    scalar_overrides={datetime: DateTime},
+    # @defer / @stream, see core/utils/incremental.py
+    execution_context_class=IncrementalExecutionContext,
+    # Extensions are passed as classes so each operation gets its own
+    # instance; QueryDepthLimiter only adds a stateless validation rule
+    extensions=[
+        # First, so its timings include every other extension
+        MetricsExtension,
+        *get_tracing_extensions(),
+        QueryStatsExtension,
+        ReplicaRoutingExtension,
+        DocumentCacheExtension,
+        QueryDepthLimiter(max_depth=settings.GRAPHQL_MAX_DEPTH),
+        CostLimitExtension,
+        CoalescingExtension,
+        HTTPCacheExtension,
+        ResponseCacheExtension,
+    ],
 )
+
+enable_incremental_delivery(schema)
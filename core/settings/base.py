@@ -5,7 +5,8 @@ from urllib.parse import quote_plus
 import dj_database_url
 
 from core.config import conf
-from core.utils.settings import getenv
+from core.utils.logs import msgpack_default_encode
+from core.utils.settings import configure_database, getenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -89,6 +90,46 @@ else:
             "NAME": BASE_DIR / "db.sqlite3",
         }
     }
+
+# Connection reuse: "none", "persistent" (CONN_MAX_AGE + health checks)
+# or "pool" (psycopg 3 pool, PostgreSQL on Django 5.1+). Size the pool for
+# the ORM thread pool; every gunicorn worker holds its own pool.
+DATABASE_POOL_MODE = conf.DATABASE_POOL_MODE
+configure_database(
+    DATABASES["default"],
+    DATABASE_POOL_MODE,
+    conn_max_age=conf.DATABASE_CONN_MAX_AGE,
+    health_checks=conf.DATABASE_CONN_HEALTH_CHECKS,
+    pool_min_size=conf.DATABASE_POOL_MIN_SIZE,
+    pool_max_size=conf.DATABASE_POOL_MAX_SIZE,
+    pool_timeout=conf.DATABASE_POOL_TIMEOUT,
+)
+
+# Read replicas: "replica_1", "replica_2", ... serve the reads of query
+# operations, see core/utils/replicas.py. Point a replica URL at the
+# primary's SQLite file to try it locally.
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(conf.DATABASE_REPLICA_URLS, start=1):
+    alias = f"replica_{index}"
+    DATABASES[alias] = configure_database(
+        dj_database_url.parse(replica_url),
+        DATABASE_POOL_MODE,
+        conn_max_age=conf.DATABASE_CONN_MAX_AGE,
+        health_checks=conf.DATABASE_CONN_HEALTH_CHECKS,
+        pool_min_size=conf.DATABASE_POOL_MIN_SIZE,
+        pool_max_size=conf.DATABASE_POOL_MAX_SIZE,
+        pool_timeout=conf.DATABASE_POOL_TIMEOUT,
+    )
+    # Tests read the test database through the replicas
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_REPLICA_STICKY_SECONDS = conf.DATABASE_REPLICA_STICKY_SECONDS
+DATABASE_REPLICA_RETRY_SECONDS = conf.DATABASE_REPLICA_RETRY_SECONDS
+
+# Threads used by async resolvers to run blocking ORM calls
+# 0 falls back to Django's single thread-sensitive executor
+DATABASE_THREAD_POOL_SIZE = conf.DATABASE_THREAD_POOL_SIZE
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -106,7 +147,7 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-# DATABASE_ROUTERS = []  # Add your database routers here if needed
+DATABASE_ROUTERS = ["core.utils.replicas.ReplicaRouter"] if DATABASE_REPLICAS else []
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -138,7 +179,91 @@ MEDIA_ROOT = "mediafiles"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 GRAPHQL_CONNECTION_MAX_RESULTS = conf.GRAPHQL_CONNECTION_MAX_RESULTS
 
-# Logging
+# Parsed-and-validated document cache, also backing persisted queries
+GRAPHQL_DOCUMENT_CACHE_MAX_ENTRIES = conf.GRAPHQL_DOCUMENT_CACHE_MAX_ENTRIES
+GRAPHQL_DOCUMENT_CACHE_MAX_BYTES = conf.GRAPHQL_DOCUMENT_CACHE_MAX_BYTES
+GRAPHQL_PERSISTED_QUERIES = conf.GRAPHQL_PERSISTED_QUERIES
+
+# Query operations over GET, cacheable by CDNs and gateways, see core/utils/http_cache.py
+GRAPHQL_QUERIES_VIA_GET = conf.GRAPHQL_QUERIES_VIA_GET
+
+# Response cache for Query fields: "local" (per worker), "django" (uses
+# the GRAPHQL_RESPONSE_CACHE_ALIAS cache, e.g. Redis) or "" to disable
+GRAPHQL_RESPONSE_CACHE_BACKEND = conf.GRAPHQL_RESPONSE_CACHE_BACKEND
+GRAPHQL_RESPONSE_CACHE_ALIAS = conf.GRAPHQL_RESPONSE_CACHE_ALIAS
+GRAPHQL_RESPONSE_CACHE_TTL = conf.GRAPHQL_RESPONSE_CACHE_TTL
+GRAPHQL_RESPONSE_CACHE_MAX_ENTRIES = conf.GRAPHQL_RESPONSE_CACHE_MAX_ENTRIES
+
+# Ranked hits kept per search (search_examples), see core/utils/search.py
+GRAPHQL_SEARCH_MAX_RESULTS = conf.GRAPHQL_SEARCH_MAX_RESULTS
+
+# Rows fetched per round trip for lists sent with @stream
+GRAPHQL_STREAM_CHUNK_SIZE = conf.GRAPHQL_STREAM_CHUNK_SIZE
+
+# Items accepted by one create_examples / update_examples / delete_examples call
+GRAPHQL_BULK_MUTATION_MAX_ITEMS = conf.GRAPHQL_BULK_MUTATION_MAX_ITEMS
+
+# Identical query operations in flight share one execution, see
+# core/utils/coalescing.py. Operations only share with requests carrying
+# the same values of GRAPHQL_COALESCE_SCOPE_HEADERS (the auth scope, which
+# also keys response cache entries), and only join executions started at
+# most GRAPHQL_COALESCE_MAX_AGE_SECONDS ago: the most a result can lag a
+# mutation committed by another worker
+GRAPHQL_COALESCE_QUERIES = conf.GRAPHQL_COALESCE_QUERIES
+GRAPHQL_COALESCE_SCOPE_HEADERS = conf.GRAPHQL_COALESCE_SCOPE_HEADERS
+GRAPHQL_COALESCE_MAX_AGE_SECONDS = conf.GRAPHQL_COALESCE_MAX_AGE_SECONDS
+
+# Operations accepted in one batched request (a JSON array), 0 disables
+# batching, see core/router.py
+GRAPHQL_BATCH_MAX_OPERATIONS = conf.GRAPHQL_BATCH_MAX_OPERATIONS
+
+# Query limits, see core/utils/cost.py. GRAPHQL_MAX_COST (per operation)
+# and GRAPHQL_CLIENT_COST_BUDGET (per client and window) are disabled at 0
+GRAPHQL_MAX_DEPTH = conf.GRAPHQL_MAX_DEPTH
+GRAPHQL_MAX_COST = conf.GRAPHQL_MAX_COST
+GRAPHQL_CLIENT_COST_BUDGET = conf.GRAPHQL_CLIENT_COST_BUDGET
+GRAPHQL_CLIENT_COST_WINDOW = conf.GRAPHQL_CLIENT_COST_WINDOW
+GRAPHQL_COST_CLIENT_HEADER = conf.GRAPHQL_COST_CLIENT_HEADER
+
+# Operation metrics and spans, see core/utils/tracing.py. Operation names
+# past GRAPHQL_METRICS_MAX_OPERATIONS are labelled "other"; GRAPHQL_TRACING
+# is "", "memory", "console" or "global"
+GRAPHQL_METRICS_MAX_OPERATIONS = conf.GRAPHQL_METRICS_MAX_OPERATIONS
+GRAPHQL_TRACING = conf.GRAPHQL_TRACING
+
+# SQL statements run this often by one operation are reported as repeated
+# (likely N+1), see core/utils/queries.py
+GRAPHQL_QUERY_REPEAT_THRESHOLD = conf.GRAPHQL_QUERY_REPEAT_THRESHOLD
+
+# Response encoding: "orjson" (falls back to "json" when not installed), see
+# core/utils/encoding.py
+JSON_ENCODER = conf.JSON_ENCODER
+
+# Response compression, see core/utils/compression.py. Encodings in server
+# preference order (empty disables); zstd and br need the compression extra
+COMPRESSION_ENCODINGS = conf.COMPRESSION_ENCODINGS
+COMPRESSION_MINIMUM_SIZE = conf.COMPRESSION_MINIMUM_SIZE
+COMPRESSION_GZIP_LEVEL = conf.COMPRESSION_GZIP_LEVEL
+COMPRESSION_BROTLI_LEVEL = conf.COMPRESSION_BROTLI_LEVEL
+COMPRESSION_ZSTD_LEVEL = conf.COMPRESSION_ZSTD_LEVEL
+
+# Pub/sub feeding GraphQL subscriptions, see core/utils/pubsub.py: "local"
+# (this worker only) or "postgres" (LISTEN/NOTIFY, reaches every worker).
+# Messages queued per subscriber before its oldest ones are dropped
+PUBSUB_BACKEND = conf.PUBSUB_BACKEND
+PUBSUB_SUBSCRIBER_QUEUE_SIZE = conf.PUBSUB_SUBSCRIBER_QUEUE_SIZE
+
+# Rows fetched per round trip by the export routes, see core/utils/export.py
+EXPORT_CHUNK_SIZE = conf.EXPORT_CHUNK_SIZE
+
+# Logging: records go through a bounded queue to a listener thread that
+# runs the handlers and ships them to Fluent in batches, see core/utils/logs.py
+LOGGING_CONFIG = "core.utils.logs.configure_logging"
+LOG_LEVEL = conf.LOG_LEVEL
+LOG_QUEUE_SIZE = conf.LOG_QUEUE_SIZE
+LOG_QUEUE_POLICY = conf.LOG_QUEUE_POLICY
+LOG_BATCH_SIZE = conf.LOG_BATCH_SIZE
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -159,9 +284,11 @@ LOGGING = {
     "loggers": {
         "": {
             "handlers": ["console"],
-            "level": "DEBUG",
+            "level": LOG_LEVEL,
             "propagate": False,
         },
+        # Through the root handlers instead of Django's own stderr handler
+        "django": {"handlers": [], "level": LOG_LEVEL, "propagate": True},
     },
 }
 
@@ -174,15 +301,6 @@ FLUENT_HOST = getenv("FLUENT_HOST", None)
 FLUENT_PORT = int(getenv("FLUENT_PORT", 24224))
 
 if FLUENT_HOST and FLUENT_PORT:
-
-    def msgpack_default_encode(obj):
-        if isinstance(obj, Exception):
-            if hasattr(obj, "message"):
-                return obj.message
-            else:
-                return str(obj)
-        return obj
-
     LOGGING = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -197,14 +315,15 @@ if FLUENT_HOST and FLUENT_PORT:
                     "level": "%(levelname)s",
                     "hostname": "%(hostname)s",
                     "location": "%(module)s.%(funcName)s",
-                    "exception": "%(exc_info)s",
+                    # Tracebacks are rendered before records are queued
+                    "exception": "%(exc_text)s",
                     "pathname": "%(pathname)s",
                     "filename": "%(filename)s",
                     "threadname": "%(threadName)s",
                     "environment": ENVIRONMENT,
                     "application_version": APPLICATION_VERSION,
                     "application_name": APPLICATION_NAME,
-                    "application_namespace": APPLICATION_NAMESPACE,
+                    "application_namespace": APPLICATION_NAMESPACE or "",
                 },
             },
         },
@@ -217,20 +336,22 @@ if FLUENT_HOST and FLUENT_PORT:
             },
             "fluent": {
                 "level": "DEBUG",
-                "class": "fluent.handler.FluentHandler",
+                "class": "core.utils.logs.FluentBatchHandler",
                 "formatter": "fluent_formatter",
                 "tag": "python.logging",
                 "host": FLUENT_HOST,
                 "port": FLUENT_PORT,
+                "batch_size": LOG_BATCH_SIZE,
                 "msgpack_kwargs": {"default": msgpack_default_encode},
             },
         },
         "loggers": {
             "": {
                 "handlers": ["fluent", "console"],
-                "level": "DEBUG",
+                "level": LOG_LEVEL,
                 "propagate": False,
             },
+            "django": {"handlers": [], "level": LOG_LEVEL, "propagate": True},
         },
     }
 
@@ -0,0 +1,139 @@
+"""
+In-flight coalescing (singleflight) of identical query operations
+
+When a query operation arrives while an identical one is executing in
+the same worker, it waits for that execution and answers with its
+result instead of running its own resolvers and SQL. Operations are
+identical when they have the same document hash, operation name,
+variables and auth scope (the GRAPHQL_COALESCE_SCOPE_HEADERS request
+headers, Authorization and Cookie by default, so results never cross
+users and clients pinned to the primary by replica stickiness only
+share with each other).
+
+An operation only joins an execution that is still running, and never
+one that started before a mutation of this worker finished (reads
+started while it ran may have read the rows it was changing). Mutations
+of other workers are not seen here, so an operation also only joins an
+execution that started at most GRAPHQL_COALESCE_MAX_AGE_SECONDS ago:
+a coalesced result lags a mutation committed elsewhere by no more than
+that. Older executions keep running for the operations that joined
+them, and the new operation leads a fresh one.
+
+Only query operations coalesce. An execution whose result is the first
+part of an incremental response (core/utils/incremental.py) is not
+shared; the operations that waited for it execute on their own.
+
+    graphql_coalesced_operations_total{role="follower"} /
+    graphql_coalesced_operations_total
+
+is the share of query operations answered without executing.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from graphql import ExecutionResult as GraphQLExecutionResult
+from prometheus_client import Counter
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from core.utils.document_cache import document_hash
+from core.utils.incremental import has_pending_payloads
+from core.utils.permissions import auth_scope
+
+GRAPHQL_COALESCED_OPERATIONS = Counter(
+    "graphql_coalesced_operations_total",
+    "Query operations that executed (leader) or waited for an identical one (follower)",
+    ["role"],
+)
+
+# In-flight executions by key with their start time (monotonic),
+# resolved with their result (None when the result can't be shared)
+_in_flight: Dict[str, Tuple["asyncio.Future[Optional[GraphQLExecutionResult]]", float]] = {}
+# Bumped when a mutation starts and when it ends: later reads never
+# join earlier executions
+_generation = 0
+
+
+def coalescing_key(execution_context) -> Optional[str]:
+    """Key of identical operations, None when the operation can't coalesce"""
+    if execution_context.query is None:
+        return None
+    return hashlib.sha256(
+        json.dumps(
+            [
+                document_hash(execution_context.query),
+                execution_context.operation_name,
+                execution_context.variables,
+                auth_scope(execution_context.context),
+                _generation,
+            ],
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class CoalescingExtension(SchemaExtension):
+    """
+    Share one execution between identical query operations in flight.
+    Place it after the extensions that may answer an operation without
+    executing it (e.g. CostLimitExtension rejections).
+    """
+
+    async def on_execute(self):
+        global _generation
+        execution_context = self.execution_context
+        operation_type = execution_context.operation_type
+        if operation_type == OperationType.MUTATION:
+            _generation += 1
+            try:
+                yield
+            finally:
+                # Reads that started while the mutation ran may hold rows
+                # from before its commit
+                _generation += 1
+            return
+        if (
+            not settings.GRAPHQL_COALESCE_QUERIES
+            or operation_type != OperationType.QUERY
+            or execution_context.result is not None
+        ):
+            yield
+            return
+
+        key = coalescing_key(execution_context)
+        if key is None:
+            yield
+            return
+
+        now = time.monotonic()
+        leader, started = _in_flight.get(key, (None, 0.0))
+        if leader is not None and now - started <= settings.GRAPHQL_COALESCE_MAX_AGE_SECONDS:
+            # Cancelling this operation must not cancel the shared future
+            result = await asyncio.shield(leader)
+            if result is not None:
+                GRAPHQL_COALESCED_OPERATIONS.labels(role="follower").inc()
+                # Strawberry skips execution when a result is already set
+                execution_context.result = result
+            else:
+                GRAPHQL_COALESCED_OPERATIONS.labels(role="leader").inc()
+            yield
+            return
+
+        GRAPHQL_COALESCED_OPERATIONS.labels(role="leader").inc()
+        future = asyncio.get_running_loop().create_future()
+        # Replaces an execution too old to join, which keeps its followers
+        entry = _in_flight[key] = (future, now)
+        result = None
+        try:
+            yield
+            if not has_pending_payloads(execution_context.context):
+                result = execution_context.result
+        finally:
+            if _in_flight.get(key) is entry:
+                del _in_flight[key]
+            future.set_result(result)
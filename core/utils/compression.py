@@ -0,0 +1,275 @@
+"""
+Response compression
+
+CompressionMiddleware compresses responses with the best encoding the
+client accepts (`Accept-Encoding`, q-values honoured) among
+COMPRESSION_ENCODINGS, in server preference order: zstd and br need the
+optional `zstandard` / `brotli` packages (`poetry install -E compression`),
+gzip is always available.
+
+Complete responses smaller than COMPRESSION_MINIMUM_SIZE bytes, responses
+already encoded, and media types that don't compress (images, XLSX, ...)
+pass through untouched. Streaming responses (exports, incremental
+delivery) stay streaming: each chunk is compressed and flushed as it
+arrives instead of buffering the body.
+
+Example usage:
+    fastapp.add_middleware(CompressionMiddleware, minimum_size=1024)
+"""
+import zlib
+from typing import Callable, Dict, Optional, Sequence
+
+from prometheus_client import Counter
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional encoding
+    zstandard = None
+
+COMPRESSED_RESPONSES = Counter(
+    "http_compressed_responses_total",
+    "Responses compressed by CompressionMiddleware",
+    ["encoding"],
+)
+COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total",
+    "Response body bytes before (identity) and after compression",
+    ["encoding"],
+)
+
+# Bodies at least this large are compressed on a worker thread (the
+# compressors release the GIL) instead of blocking the event loop
+THREAD_COMPRESSION_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/graphql-response+json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "multipart/mixed",
+)
+
+
+class Compressor:
+    """Incremental compressor: compress() chunks, then finish()"""
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def flush(self) -> bytes:
+        """Everything compressed so far, so the client can decode it now"""
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        raise NotImplementedError
+
+
+class GzipCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor(Compressor):
+    def __init__(self, level: int) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encodings() -> Dict[str, Callable[[int], Compressor]]:
+    encodings: Dict[str, Callable[[int], Compressor]] = {"gzip": GzipCompressor}
+    if brotli is not None:
+        encodings["br"] = BrotliCompressor
+    if zstandard is not None:
+        encodings["zstd"] = ZstdCompressor
+    return encodings
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """`Accept-Encoding` as {coding: q}"""
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header: str, preferred: Sequence[str]) -> Optional[str]:
+    """
+    Encoding of `preferred` (server order) with the highest q in
+    `header`, None for identity
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in preferred:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing HTTP responses, see the module docstring"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        encodings: Sequence[str] = ("zstd", "br", "gzip"),
+        levels: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        factories = available_encodings()
+        self.factories = {encoding: factories[encoding] for encoding in encodings if encoding in factories}
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.factories:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), list(self.factories)
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        factory, level = self.factories[encoding], self.levels[encoding]
+        responder = CompressionResponder(send, encoding, lambda: factory(level), self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """Compress one response, holding back its start message until the first chunk"""
+
+    def __init__(
+        self, send: Send, encoding: str, compressor: Callable[[], Compressor], minimum_size: int
+    ) -> None:
+        self._send = send
+        self.encoding = encoding
+        self.make_compressor = compressor
+        self.compressor: Optional[Compressor] = None
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        # None: undecided, then True (compressing) or False (passing through)
+        self.compressing: Optional[bool] = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            if not is_compressible(Headers(raw=message["headers"])):
+                self.compressing = False
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.compressing is False:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressing is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.compressing = False
+                await self._send(self.start)
+                await self._send(message)
+                return
+            self.compressing = True
+            await self._send_start(streaming=more_body, body=body)
+            if not more_body:
+                return
+
+        chunk = self.compressor.compress(body)
+        chunk += self.compressor.flush() if more_body else self.compressor.finish()
+        self.count(body, chunk)
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_start(self, streaming: bool, body: bytes) -> None:
+        COMPRESSED_RESPONSES.labels(encoding=self.encoding).inc()
+        self.compressor = self.make_compressor()
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # The compressed bytes are a different representation
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if streaming:
+            if "content-length" in headers:
+                del headers["content-length"]
+            await self._send(self.start)
+            return
+
+        # Complete response: compress it whole so Content-Length is known
+        if len(body) >= THREAD_COMPRESSION_SIZE:
+            compressed = await run_in_threadpool(self.compress_all, body)
+        else:
+            compressed = self.compress_all(body)
+        self.count(body, compressed)
+        headers["Content-Length"] = str(len(compressed))
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    def compress_all(self, body: bytes) -> bytes:
+        return self.compressor.compress(body) + self.compressor.finish()
+
+    def count(self, body: bytes, compressed: bytes) -> None:
+        COMPRESSION_BYTES.labels(encoding="identity").inc(len(body))
+        COMPRESSION_BYTES.labels(encoding=self.encoding).inc(len(compressed))
@@ -0,0 +1,297 @@
+"""
+Query cost analysis
+
+Every operation gets an estimated cost before it executes. Fields cost
+1 when they return an object and 0 for scalars, unless they declare a
+policy in their metadata:
+
+    @strawberry.field(metadata=cost_policy(multiplier=page_size, multiplier_path="edges"))
+    async def examples(self, first: Optional[int] = None, ...) -> ExampleConnection: ...
+
+`multiplier` turns the field arguments into the number of items the
+field returns; the cost of the `multiplier_path` child is multiplied by
+it or, without a path, the cost of every item (1 for the object plus its
+selection). Fields taking a list of items to act on (federation's
+`_entities`, bulk mutations) multiply by its `list_length`. Aliases are
+counted one by one, so 200 aliases of `examples` cost 200 full pages.
+
+Operations costing more than GRAPHQL_MAX_COST are rejected, and so are
+operations from a client (GRAPHQL_COST_CLIENT_HEADER, or its address)
+that spent GRAPHQL_CLIENT_COST_BUDGET over the last
+GRAPHQL_CLIENT_COST_WINDOW seconds. Budgets are tracked per worker; an
+operation costing more than a whole budget is rejected as too expensive
+rather than rate limited, since waiting would not admit it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    GraphQLError,
+    GraphQLObjectType,
+    GraphQLSchema,
+    get_named_type,
+    is_abstract_type,
+    is_composite_type,
+)
+from graphql.execution.collect_fields import collect_fields, collect_sub_fields
+from graphql.execution.values import get_argument_values
+from graphql.utilities import get_operation_root_type
+from graphql.utilities.get_operation_ast import get_operation_ast
+from prometheus_client import Counter, Histogram
+from strawberry.extensions import SchemaExtension
+from strawberry.types import ExecutionResult
+
+from core.utils.pagination import get_page_size
+
+GRAPHQL_OPERATION_COST = Histogram(
+    "graphql_operation_cost",
+    "Estimated cost of GraphQL operations",
+    ["operation_type"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 100000),
+)
+GRAPHQL_COST_REJECTIONS = Counter(
+    "graphql_cost_rejections_total",
+    "GraphQL operations rejected by the cost limits",
+    ["reason"],
+)
+
+# Tracked clients per worker, least recently seen are dropped first
+MAX_TRACKED_CLIENTS = 10_000
+
+
+@dataclass(frozen=True)
+class FieldCost:
+    cost: int = 1
+    multiplier: Optional[Callable[[Dict[str, Any]], int]] = None
+    multiplier_path: Optional[str] = None
+
+
+def cost_policy(
+    cost: int = 1,
+    multiplier: Optional[Callable[[Dict[str, Any]], int]] = None,
+    multiplier_path: Optional[str] = None,
+) -> Dict[str, FieldCost]:
+    """
+    Field metadata declaring the cost of a field. Combine with other
+    metadata as `metadata={**cache_policy(...), **cost_policy(...)}`.
+    """
+    return {"cost": FieldCost(cost=cost, multiplier=multiplier, multiplier_path=multiplier_path)}
+
+
+def page_size(arguments: Dict[str, Any]) -> int:
+    """Multiplier of connection fields: the page size they will return"""
+    requested = arguments.get("last") if arguments.get("first") is None else arguments["first"]
+    try:
+        return get_page_size(requested)
+    except ValueError:
+        return get_page_size(None)
+
+
+def list_length(argument: str) -> Callable[[Dict[str, Any]], int]:
+    """Multiplier of fields acting on a list argument: its length"""
+    return lambda arguments: len(arguments.get(argument) or ())
+
+
+# Fields generated by Strawberry, which can't declare a policy in their metadata
+GENERATED_FIELD_COSTS = {
+    # Federation: one entity per representation
+    "_entities": FieldCost(multiplier=list_length("representations")),
+}
+
+
+class CostEstimator:
+    """Walk an operation's selections and add up field costs"""
+
+    def __init__(self, schema, fragments: Dict[str, FragmentDefinitionNode], variables: Dict[str, Any]) -> None:
+        self.schema = schema
+        self.graphql_schema: GraphQLSchema = schema._schema
+        self.fragments = fragments
+        self.variables = variables
+
+    def selection_cost(self, parent_type: GraphQLObjectType, fields: Dict[str, List[FieldNode]]) -> int:
+        return sum(self.field_cost(parent_type, nodes) for nodes in fields.values())
+
+    def field_cost(self, parent_type: GraphQLObjectType, nodes: List[FieldNode]) -> int:
+        name = nodes[0].name.value
+        # Introspection is bounded by the schema size
+        if name.startswith("__"):
+            return 0
+
+        graphql_field = parent_type.fields[name]
+        return_type = get_named_type(graphql_field.type)
+        field = self.schema.get_field_for_type(name, parent_type.name)
+        policy = (field.metadata or {}).get("cost") if field else None
+        if policy is None:
+            policy = GENERATED_FIELD_COSTS.get(name)
+        if policy is None:
+            policy = FieldCost(cost=1 if is_composite_type(return_type) else 0)
+        if not is_composite_type(return_type):
+            return policy.cost
+
+        multiplier = 1
+        if policy.multiplier is not None:
+            arguments = get_argument_values(graphql_field, nodes[0], self.variables)
+            multiplier = max(policy.multiplier(arguments), 0)
+
+        if is_abstract_type(return_type):
+            possible_types = self.graphql_schema.get_possible_types(return_type)
+        else:
+            possible_types = [return_type]
+
+        children = 0
+        for object_type in possible_types:
+            fields = collect_sub_fields(
+                self.graphql_schema, self.fragments, self.variables, object_type, nodes
+            )
+            if policy.multiplier_path is not None:
+                cost = sum(
+                    self.field_cost(object_type, child_nodes)
+                    * (multiplier if child_nodes[0].name.value == policy.multiplier_path else 1)
+                    for child_nodes in fields.values()
+                )
+            elif policy.multiplier is not None:
+                # Every item is an object of its own
+                cost = multiplier * (1 + self.selection_cost(object_type, fields))
+            else:
+                cost = self.selection_cost(object_type, fields)
+            children = max(children, cost)
+        return policy.cost + children
+
+
+def estimate_cost(execution_context) -> Optional[int]:
+    """Estimated cost of the operation of a validated `execution_context`"""
+    document = execution_context.graphql_document
+    operation = get_operation_ast(document, execution_context.operation_name)
+    if operation is None:
+        return None
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    estimator = CostEstimator(
+        execution_context.schema, fragments, execution_context.variables or {}
+    )
+    graphql_schema = estimator.graphql_schema
+    root_type = get_operation_root_type(graphql_schema, operation)
+    fields = collect_fields(
+        graphql_schema, fragments, estimator.variables, root_type, operation.selection_set
+    )
+    return estimator.selection_cost(root_type, fields)
+
+
+class ClientBudgets:
+    """
+    Token buckets per client: `budget` tokens, refilled over `window`
+    seconds
+    """
+
+    def __init__(self, budget: int, window: float) -> None:
+        self.budget = budget
+        self.window = window
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def spend(self, client: str, cost: int) -> Optional[float]:
+        """Take `cost` tokens from `client`, or return seconds to wait"""
+        now = time.monotonic()
+        rate = self.budget / self.window
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.budget, now))
+            tokens = min(self.budget, tokens + (now - updated) * rate)
+            retry_after = None
+            if cost > tokens:
+                retry_after = (cost - tokens) / rate
+            else:
+                tokens -= cost
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+_client_budgets: Optional[ClientBudgets] = None
+
+
+def get_client_budgets() -> Optional[ClientBudgets]:
+    """Per-client budgets, None when GRAPHQL_CLIENT_COST_BUDGET is 0"""
+    global _client_budgets
+    if settings.GRAPHQL_CLIENT_COST_BUDGET <= 0:
+        return None
+    if _client_budgets is None:
+        _client_budgets = ClientBudgets(
+            settings.GRAPHQL_CLIENT_COST_BUDGET, settings.GRAPHQL_CLIENT_COST_WINDOW
+        )
+    return _client_budgets
+
+
+def get_client_id(context: Any) -> Optional[str]:
+    """Client of the request: GRAPHQL_COST_CLIENT_HEADER or the remote address"""
+    request = context.get("request") if isinstance(context, dict) else None
+    if request is None:
+        return None
+    client = request.headers.get(settings.GRAPHQL_COST_CLIENT_HEADER)
+    if client:
+        return client
+    return request.client.host if request.client else None
+
+
+def rejection(message: str, code: str, **extensions: Any) -> ExecutionResult:
+    return ExecutionResult(
+        data=None,
+        errors=[GraphQLError(message, extensions={"code": code, **extensions})],
+    )
+
+
+class CostLimitExtension(SchemaExtension):
+    """
+    Estimate the cost of every operation and reject it before execution
+    when it is over GRAPHQL_MAX_COST or over its client's budget
+    """
+
+    def on_execute(self):
+        execution_context = self.execution_context
+        cost = estimate_cost(execution_context)
+        if cost is None:
+            yield
+            return
+
+        GRAPHQL_OPERATION_COST.labels(
+            operation_type=execution_context.operation_type.value
+        ).observe(cost)
+
+        max_cost = settings.GRAPHQL_MAX_COST
+        budgets = get_client_budgets()
+        client = get_client_id(execution_context.context) if budgets else None
+        if client is not None:
+            # Over a whole budget, retrying later would not help either
+            max_cost = min(max_cost, budgets.budget) if max_cost else budgets.budget
+        if max_cost and cost > max_cost:
+            GRAPHQL_COST_REJECTIONS.labels(reason="operation").inc()
+            # Strawberry skips execution when a result is already set
+            execution_context.result = rejection(
+                f"Query cost {cost} exceeds the maximum of {max_cost}",
+                "QUERY_TOO_EXPENSIVE",
+                cost=cost,
+                max_cost=max_cost,
+            )
+            yield
+            return
+
+        if client is not None:
+            retry_after = budgets.spend(client, cost)
+            if retry_after is not None:
+                GRAPHQL_COST_REJECTIONS.labels(reason="client").inc()
+                execution_context.result = rejection(
+                    f"Query cost budget exhausted, retry in {retry_after:.1f}s",
+                    "RATE_LIMITED",
+                    cost=cost,
+                    retry_after=round(retry_after, 1),
+                )
+        yield
@@ -0,0 +1,206 @@
+"""
+Database helpers for async resolvers
+
+Django's ORM is synchronous. Calling it straight from a coroutine either
+raises ``SynchronousOnlyOperation`` or blocks the event loop for every
+other request served by the worker. ``database_sync_to_async`` runs the
+wrapped function on a bounded thread pool sized by
+``DATABASE_THREAD_POOL_SIZE`` instead.
+
+Connections are reused according to DATABASE_POOL_MODE (see
+core/settings/base.py). The time spent getting a usable connection
+before each call is exported as `database_connection_checkout_seconds`,
+and psycopg pool statistics as `database_pool_*` metrics.
+
+Calls made by query operations read from a replica when
+DATABASE_REPLICA_URLS is set, failing over to the next replica and then
+the primary (see core/utils/replicas.py).
+
+Example usage:
+    @database_sync_to_async
+    def get_example(pk: int) -> ExampleModel:
+        return ExampleModel.objects.get(pk=pk)
+
+    obj = await get_example(1)
+"""
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, InterfaceError, OperationalError, close_old_connections, connections
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+from core.utils.queries import recording_queries
+from core.utils.replicas import get_replica_set, read_databases, reading_from
+
+DATABASE_CONNECTION_CHECKOUT = Histogram(
+    "database_connection_checkout_seconds",
+    "Time to get a usable database connection for an ORM call",
+    ["alias"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[ThreadPoolExecutor]:
+    """
+    Return the shared ORM thread pool, creating it on first use.
+    Returns None when DATABASE_THREAD_POOL_SIZE is 0, in which case
+    Django's single thread-sensitive executor is used.
+    """
+    global _executor
+    if settings.DATABASE_THREAD_POOL_SIZE <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DATABASE_THREAD_POOL_SIZE,
+                    thread_name_prefix="orm",
+                )
+    return _executor
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """Shut the ORM thread pool down (e.g. on application shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def close_database_connections() -> None:
+    """
+    Close the ORM thread pool and every database connection and
+    connection pool of the process, e.g. in the gunicorn master before
+    it forks workers, which must open their own instead of sharing its
+    sockets
+    """
+    shutdown_executor()
+    for alias in connections:
+        connection = connections[alias]
+        connection.close()
+        close_pool = getattr(connection, "close_pool", None)
+        if close_pool is not None:
+            close_pool()
+
+
+def _forget_executor_after_fork() -> None:
+    # Threads don't survive fork(): a forked worker starts its own pool
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+def checkout_connection(alias: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Open (or take from the pool) the connection of `alias` and run the
+    CONN_HEALTH_CHECKS check up front, recording how long it took
+    """
+    connection = connections[alias]
+    started = time.perf_counter()
+    connection.ensure_connection()
+    connection.close_if_health_check_failed()
+    connection.ensure_connection()
+    DATABASE_CONNECTION_CHECKOUT.labels(alias=alias).observe(time.perf_counter() - started)
+
+
+class DatabasePoolCollector:
+    """Prometheus collector reading psycopg pool statistics at scrape time"""
+
+    def collect(self) -> Iterator[Metric]:
+        size = GaugeMetricFamily(
+            "database_pool_size", "Connections opened by the pool", labels=["alias"]
+        )
+        available = GaugeMetricFamily(
+            "database_pool_available", "Idle connections in the pool", labels=["alias"]
+        )
+        max_size = GaugeMetricFamily(
+            "database_pool_max_size", "Maximum size of the pool", labels=["alias"]
+        )
+        waiting = GaugeMetricFamily(
+            "database_pool_requests_waiting",
+            "Checkouts waiting for a free connection",
+            labels=["alias"],
+        )
+        wait_time = CounterMetricFamily(
+            "database_pool_wait_seconds",
+            "Time checkouts spent waiting for a free connection",
+            labels=["alias"],
+        )
+        requests = CounterMetricFamily(
+            "database_pool_requests", "Connections requested from the pool", labels=["alias"]
+        )
+        for alias in connections:
+            if not connections.settings[alias].get("OPTIONS", {}).get("pool"):
+                continue
+            # DatabaseWrapper.pool only exists on Django 5.1+
+            pool = getattr(connections[alias], "pool", None)
+            if pool is None:
+                continue
+            stats = pool.get_stats()
+            size.add_metric([alias], stats.get("pool_size", 0))
+            available.add_metric([alias], stats.get("pool_available", 0))
+            max_size.add_metric([alias], stats.get("pool_max", 0))
+            waiting.add_metric([alias], stats.get("requests_waiting", 0))
+            wait_time.add_metric([alias], stats.get("requests_wait_ms", 0) / 1000)
+            requests.add_metric([alias], stats.get("requests_num", 0))
+        yield from (size, available, max_size, waiting, wait_time, requests)
+
+
+REGISTRY.register(DatabasePoolCollector())
+
+
+def database_sync_to_async(func: Callable) -> Callable:
+    """
+    Decorator turning a blocking ORM function into an awaitable one.
+    Stale connections are closed before and after the call, like Django
+    does around each request; with persistent or pooled connections
+    that only returns them for reuse. Statements are counted against the
+    current GraphQL operation (core/utils/queries.py).
+    """
+
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            for alias in read_databases():
+                if alias == DEFAULT_DB_ALIAS:
+                    checkout_connection(alias)
+                    with recording_queries():
+                        return func(*args, **kwargs)
+                try:
+                    checkout_connection(alias)
+                    with reading_from(alias), recording_queries():
+                        result = func(*args, **kwargs)
+                except (OperationalError, InterfaceError):
+                    get_replica_set().mark_down(alias)
+                    connections[alias].close()
+                    continue
+                get_replica_set().mark_up(alias)
+                return result
+        finally:
+            close_old_connections()
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        executor = get_executor()
+        if executor is None:
+            return await sync_to_async(inner)(*args, **kwargs)
+        return await sync_to_async(
+            inner, thread_sensitive=False, executor=executor
+        )(*args, **kwargs)
+
+    return wrapper
+
+
+os.register_at_fork(after_in_child=_forget_executor_after_fork)
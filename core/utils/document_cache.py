@@ -0,0 +1,172 @@
+"""
+Parsed-and-validated GraphQL document cache
+
+The gateway sends the same handful of operations over and over, so the
+parsed AST of every document that passed validation is kept in an LRU
+keyed by the sha256 of the query text. Hits skip both parsing and
+validation. The same hash is the Automatic Persisted Queries key (see
+core/router.py), so a client can send only
+`extensions.persistedQuery.sha256Hash` once the query is known.
+
+The cache is bounded by entry count and by an estimate of the memory
+held by the cached ASTs.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from django.conf import settings
+from graphql import DocumentNode
+from graphql.language import Node, Token
+from prometheus_client import Counter, Gauge
+from strawberry.extensions import SchemaExtension
+
+DOCUMENT_CACHE_REQUESTS = Counter(
+    "graphql_document_cache_requests_total",
+    "GraphQL document cache lookups",
+    ["result"],
+)
+DOCUMENT_CACHE_ENTRIES = Gauge(
+    "graphql_document_cache_entries",
+    "Documents held by the GraphQL document cache",
+)
+DOCUMENT_CACHE_BYTES = Gauge(
+    "graphql_document_cache_bytes",
+    "Estimated memory held by the GraphQL document cache",
+)
+
+
+def document_hash(query: str) -> str:
+    """Cache / persisted query key of a query string"""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def estimate_size(query: str, document: DocumentNode) -> int:
+    """Rough memory footprint of a parsed document, tokens included"""
+    size = sys.getsizeof(query)
+    stack = [document]
+    while stack:
+        node = stack.pop()
+        size += sys.getsizeof(node)
+        for key in node.keys:
+            value = getattr(node, key, None)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, tuple):
+                size += sys.getsizeof(value)
+                stack.extend(item for item in value if isinstance(item, Node))
+            elif isinstance(value, str):
+                size += sys.getsizeof(value)
+
+    token: Optional[Token] = document.loc.start_token if document.loc else None
+    while token is not None:
+        size += sys.getsizeof(token)
+        token = token.next
+    return size
+
+
+@dataclass
+class CachedDocument:
+    query: str
+    document: DocumentNode
+    size: int
+
+
+class DocumentCache:
+    """
+    LRU of validated documents bounded by `max_entries` and `max_bytes`
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, CachedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, record: bool = True) -> Optional[CachedDocument]:
+        """Look `key` up, counting the hit or miss unless `record` is False"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if record:
+            DOCUMENT_CACHE_REQUESTS.labels(result="hit" if entry else "miss").inc()
+        return entry
+
+    def set(self, key: str, query: str, document: DocumentNode) -> None:
+        size = estimate_size(query, document)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = CachedDocument(query, document, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+            DOCUMENT_CACHE_ENTRIES.set(len(self._entries))
+            DOCUMENT_CACHE_BYTES.set(self.size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            DOCUMENT_CACHE_ENTRIES.set(0)
+            DOCUMENT_CACHE_BYTES.set(0)
+
+
+_document_cache: Optional[DocumentCache] = None
+
+
+def get_document_cache() -> DocumentCache:
+    global _document_cache
+    if _document_cache is None:
+        _document_cache = DocumentCache(
+            max_entries=settings.GRAPHQL_DOCUMENT_CACHE_MAX_ENTRIES,
+            max_bytes=settings.GRAPHQL_DOCUMENT_CACHE_MAX_BYTES,
+        )
+    return _document_cache
+
+
+class DocumentCacheExtension(SchemaExtension):
+    """
+    Skip parsing and validation for documents already seen.
+    Only documents that validated without errors are cached.
+    Pass the class (not an instance) to the schema so every operation
+    gets its own extension state.
+    """
+
+    def __init__(self, *, execution_context=None) -> None:
+        super().__init__(execution_context=execution_context)
+        self.key: Optional[str] = None
+        self.hit = False
+
+    def on_parse(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        if execution_context.query:
+            self.key = document_hash(execution_context.query)
+            cached = get_document_cache().get(self.key)
+            if cached is not None:
+                execution_context.graphql_document = cached.document
+                self.hit = True
+        yield
+
+    def on_validate(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        if self.hit:
+            # Strawberry skips validation when errors are already set
+            execution_context.errors = []
+        yield
+        if not self.hit and self.key and not execution_context.errors:
+            get_document_cache().set(
+                self.key, execution_context.query, execution_context.graphql_document
+            )
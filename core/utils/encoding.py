@@ -0,0 +1,71 @@
+"""
+JSON encoding of responses
+
+GraphQL results and the REST routes are encoded with orjson when it is
+installed and JSON_ENCODER is "orjson", and with the standard library
+otherwise. orjson encodes datetimes, dates, UUIDs and dataclasses
+natively, so resolvers hand them over as they are (see the DateTime
+scalar in core/utils/schema.py) instead of formatting strings eagerly;
+the standard library path formats them in `json_default`.
+
+Example usage:
+    from core.utils.encoding import JSONResponse
+
+    fastapp = FastAPI(default_response_class=JSONResponse)
+"""
+import dataclasses
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from django.conf import settings
+from starlette.responses import JSONResponse as BaseJSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def json_default(value: Any) -> Any:
+    """Encode what orjson handles natively with the standard library"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def orjson_default(value: Any) -> Any:
+    # orjson handles datetime, UUID and dataclasses itself
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def use_orjson() -> bool:
+    return orjson is not None and settings.JSON_ENCODER == "orjson"
+
+
+def dumps(data: Any) -> bytes:
+    """`data` as compact UTF-8 JSON"""
+    if use_orjson():
+        return orjson.dumps(data, default=orjson_default)
+    return json.dumps(
+        data, default=json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def dumps_str(data: Any) -> str:
+    return dumps(data).decode("utf-8")
+
+
+class JSONResponse(BaseJSONResponse):
+    """JSONResponse encoding with `dumps`"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
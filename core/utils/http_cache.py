@@ -0,0 +1,214 @@
+"""
+HTTP caching of GraphQL reads
+
+Query operations can be sent as GET (`/api/graphql/?query=...`, or only
+`extensions` with an Automatic Persisted Query hash), so CDNs and
+gateways in front of the service can cache them. Mutations are rejected
+over GET.
+
+Fields declare how long their data may be cached in their metadata:
+
+    @strawberry.field(metadata=cache_control(max_age=60))
+    async def examples(self, ...) -> ExampleConnection: ...
+
+The operation gets the smallest max-age of the fields it selects, and
+`private` when any of them is private. A root field without a hint
+makes the operation uncacheable (`no-cache`); nested fields without one
+inherit from their parent. Responses with errors are `no-store`.
+
+Every cacheable GET response carries an ETag computed from its result
+(`extensions`, such as the SQL statistics of dev, are left out), and a
+request whose `If-None-Match` matches gets an empty 304. Together
+with the response cache (core/utils/response_cache.py), a repeated read
+then costs neither database work nor body bytes.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    GraphQLObjectType,
+    get_named_type,
+    is_abstract_type,
+    is_composite_type,
+)
+from graphql.execution.collect_fields import collect_fields, collect_sub_fields
+from graphql.utilities.get_operation_ast import get_operation_ast
+from prometheus_client import Counter
+from starlette.requests import Request
+from starlette.responses import Response
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from core.utils.encoding import dumps
+
+CONDITIONAL_REQUESTS = Counter(
+    "graphql_conditional_requests_total",
+    "GET operations sent with If-None-Match",
+    ["result"],
+)
+
+NO_CACHE = "no-cache"
+NO_STORE = "no-store"
+
+
+@dataclass(frozen=True)
+class CacheControl:
+    max_age: int
+    private: bool = False
+
+
+def cache_control(max_age: int, private: bool = False) -> Dict[str, CacheControl]:
+    """
+    Field metadata declaring how many seconds HTTP caches may keep
+    responses selecting the field; `private` keeps them out of shared
+    caches. Combine as `metadata={**cache_policy(...), **cache_control(...)}`.
+    """
+    return {"cache_control": CacheControl(max_age=max_age, private=private)}
+
+
+class CacheControlCollector:
+    """Walk an operation's selections and gather the hints of its fields"""
+
+    def __init__(self, schema, fragments: Dict[str, FragmentDefinitionNode], variables: Dict[str, Any]) -> None:
+        self.schema = schema
+        self.graphql_schema = schema._schema
+        self.fragments = fragments
+        self.variables = variables
+        self.hints: List[CacheControl] = []
+
+    def get_hint(self, parent_type: GraphQLObjectType, name: str) -> Optional[CacheControl]:
+        field = self.schema.get_field_for_type(name, parent_type.name)
+        return (field.metadata or {}).get("cache_control") if field else None
+
+    def collect(self, parent_type: GraphQLObjectType, nodes: List[FieldNode]) -> None:
+        name = nodes[0].name.value
+        if name.startswith("__"):
+            return
+        hint = self.get_hint(parent_type, name)
+        if hint is not None:
+            self.hints.append(hint)
+
+        return_type = get_named_type(parent_type.fields[name].type)
+        if not is_composite_type(return_type):
+            return
+        if is_abstract_type(return_type):
+            possible_types = self.graphql_schema.get_possible_types(return_type)
+        else:
+            possible_types = [return_type]
+        for object_type in possible_types:
+            fields = collect_sub_fields(
+                self.graphql_schema, self.fragments, self.variables, object_type, nodes
+            )
+            for child_nodes in fields.values():
+                self.collect(object_type, child_nodes)
+
+
+def operation_cache_control(execution_context) -> Optional[CacheControl]:
+    """
+    Cache policy of the query operation of a validated
+    `execution_context`, None when it must not be cached
+    """
+    document = execution_context.graphql_document
+    operation = get_operation_ast(document, execution_context.operation_name)
+    if operation is None:
+        return None
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    collector = CacheControlCollector(
+        execution_context.schema, fragments, execution_context.variables or {}
+    )
+    query_type = collector.graphql_schema.query_type
+    fields = collect_fields(
+        collector.graphql_schema, fragments, collector.variables, query_type, operation.selection_set
+    )
+    for nodes in fields.values():
+        name = nodes[0].name.value
+        if not name.startswith("__") and collector.get_hint(query_type, name) is None:
+            return None
+        collector.collect(query_type, nodes)
+
+    if not collector.hints:
+        return None
+    max_age = min(hint.max_age for hint in collector.hints)
+    if max_age <= 0:
+        return None
+    return CacheControl(max_age=max_age, private=any(hint.private for hint in collector.hints))
+
+
+def cache_control_header(policy: Optional[CacheControl]) -> str:
+    if policy is None:
+        # Caches may keep the response but revalidate it (ETag) every time
+        return NO_CACHE
+    scope = "private" if policy.private else "public"
+    return f"{scope}, max-age={policy.max_age}"
+
+
+class HTTPCacheExtension(SchemaExtension):
+    """
+    Set the Cache-Control header of query operations sent over GET from
+    the hints of the fields they select
+    """
+
+    def on_execute(self):
+        execution_context = self.execution_context
+        context = execution_context.context
+        request = context.get("request") if isinstance(context, dict) else None
+        response = context.get("response") if isinstance(context, dict) else None
+        if (
+            request is None
+            or response is None
+            or getattr(request, "method", None) != "GET"
+            or execution_context.operation_type != OperationType.QUERY
+        ):
+            yield
+            return
+
+        policy = operation_cache_control(execution_context)
+        yield
+        result = execution_context.result
+        if result is None or result.errors:
+            response.headers["Cache-Control"] = NO_STORE
+        else:
+            response.headers["Cache-Control"] = cache_control_header(policy)
+
+
+def is_cacheable(response: Response) -> bool:
+    value = response.headers.get("cache-control")
+    return response.status_code == 200 and bool(value) and NO_STORE not in value
+
+
+def result_etag(response_data: Dict[str, Any], body: bytes) -> str:
+    """ETag of an encoded GraphQL response, leaving out its `extensions`"""
+    if "extensions" in response_data:
+        body = dumps({key: value for key, value in response_data.items() if key != "extensions"})
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: str, tag: str) -> bool:
+    """Weak comparison, as compression turns our ETags into weak ones"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == tag for candidate in candidates)
+
+
+def conditional_response(request: Request, response: Response) -> Response:
+    """A 304 in place of `response` when the client already holds it"""
+    tag = response.headers.get("etag")
+    if_none_match = request.headers.get("if-none-match")
+    if tag is None or if_none_match is None:
+        return response
+    if not etag_matches(if_none_match, tag):
+        CONDITIONAL_REQUESTS.labels(result="modified").inc()
+        return response
+    CONDITIONAL_REQUESTS.labels(result="not_modified").inc()
+    return Response(
+        status_code=304,
+        headers={"ETag": tag, "Cache-Control": response.headers["cache-control"]},
+    )
@@ -0,0 +1,596 @@
+"""
+Incremental delivery: @defer and @stream
+
+Clients sending `Accept: multipart/mixed` may mark fragments with
+`@defer` and list fields with `@stream(initialCount: N)`. The first part
+of the response holds everything else (and the first N items of each
+streamed list); deferred fragments and the remaining items follow as
+further parts as soon as they are ready:
+
+    query {
+      examples(first: 500) {
+        page_info { has_next_page end_cursor }
+        edges @stream(initialCount: 10) { node { id name } }
+      }
+    }
+
+Responses follow the multipart format of Apollo Client and Router
+(`deferSpec=20220824`): every part is a JSON payload, subsequent ones
+shaped as `{"incremental": [...], "hasNext": true}`. Without the Accept
+header, or for mutations, the directives are ignored and the full
+result is returned at once.
+
+graphql-core 3.2 has no incremental delivery, so the directives are
+added to the schema by `enable_incremental_delivery` and implemented by
+IncrementalExecutionContext. Resolvers feeding a streamed list can return
+an async iterator: rows are then completed and sent as they arrive,
+`stream_queryset` reading them from a database cursor. The time to the
+first part no longer depends on the size of the list.
+"""
+import asyncio
+import contextlib
+import copy
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import Annotated, Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import strawberry
+from django.conf import settings
+from django.db.models import Model, QuerySet
+from graphql import (
+    DirectiveLocation,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLObjectType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+    is_non_null_type,
+    located_error,
+)
+from graphql.execution import ExecutionContext
+from graphql.execution.collect_fields import (
+    does_fragment_condition_match,
+    get_field_entry_key,
+    should_include_node,
+)
+from graphql.execution.execute import CollectedErrors, invalid_return_type_error
+from graphql.execution.values import get_directive_values
+from graphql.pyutils import Path, is_iterable
+from prometheus_client import Counter
+from strawberry.types import Info
+
+from core.utils.encoding import dumps
+from core.utils.export import iterate_in_thread, until_stopped
+from core.utils.queries import recording_queries
+from core.utils.replicas import read_databases, reading_from
+from core.utils.selection import selected_fields
+
+logger = logging.getLogger(__name__)
+
+INCREMENTAL_PAYLOADS = Counter(
+    "graphql_incremental_payloads_total",
+    "Deferred fragments and streamed items sent after the first part",
+    ["kind"],
+)
+
+CONTEXT_KEY = "incremental"
+MULTIPART_MEDIA_TYPE = 'multipart/mixed; boundary="-"; deferSpec=20220824'
+PART_HEADER = b"\r\n---\r\nContent-Type: application/json; charset=utf-8\r\n\r\n"
+MULTIPART_END = b"\r\n-----\r\n"
+# Payloads buffered ahead of the client, per response
+QUEUE_SIZE = 64
+
+
+@strawberry.directive(
+    locations=[DirectiveLocation.FRAGMENT_SPREAD, DirectiveLocation.INLINE_FRAGMENT],
+    description="Send the fragment in a later part of the response",
+)
+def defer(
+    if_: Annotated[bool, strawberry.argument(name="if")] = True,
+    label: Optional[str] = strawberry.UNSET,
+) -> None:
+    """Declaration only, IncrementalExecutionContext implements it"""
+
+
+@strawberry.directive(
+    locations=[DirectiveLocation.FIELD],
+    description="Send the list items after the first `initialCount` in later parts of the response",
+)
+def stream(
+    if_: Annotated[bool, strawberry.argument(name="if")] = True,
+    label: Optional[str] = strawberry.UNSET,
+    initial_count: Annotated[int, strawberry.argument(name="initialCount")] = 0,
+) -> None:
+    """Declaration only, IncrementalExecutionContext implements it"""
+
+
+def enable_incremental_delivery(schema) -> None:
+    """
+    Declare @defer and @stream on a Strawberry schema. They are converted
+    by Strawberry, so the schema printer (and `_service { sdl }`) emits
+    them, but not passed as `directives=`: that would wrap every resolver
+    in Strawberry's DirectivesExtension.
+    """
+    graphql_schema: GraphQLSchema = schema._schema
+    graphql_schema.directives = (
+        *graphql_schema.directives,
+        schema.schema_converter.from_directive(defer),
+        schema.schema_converter.from_directive(stream),
+    )
+
+
+@dataclass
+class IncrementalRecord:
+    """Deferred fragment or streamed list: payloads with the records they uncovered"""
+
+    path: List[Any]
+    payloads: AsyncIterator[Tuple[Dict[str, Any], List["IncrementalRecord"]]]
+
+
+def _is_present(data: Any, path: Sequence[Any]) -> bool:
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return False
+    return data is not None
+
+
+def _keep_present(records: Iterable[IncrementalRecord], data: Any, base: Sequence[Any]) -> List[IncrementalRecord]:
+    """Drop records whose parent was nulled by an error after they were registered"""
+    return [record for record in records if _is_present(data, record.path[len(base):])]
+
+
+class IncrementalPublisher:
+    """
+    Runs the records of one response and hands their payloads to the
+    client, merged into one part per batch of ready payloads
+    """
+
+    def __init__(self) -> None:
+        self.records: List[IncrementalRecord] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._running = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.records)
+
+    def add(self, records: List[IncrementalRecord]) -> None:
+        if self._queue is None:
+            self.records.extend(records)
+            return
+        for record in records:
+            self._start(record)
+
+    def _start(self, record: IncrementalRecord) -> None:
+        self._running += 1
+        task = asyncio.ensure_future(self._run(record))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, record: IncrementalRecord) -> None:
+        try:
+            async for payload, children in record.payloads:
+                await self._queue.put(payload)
+                self.add(children)
+        except Exception:
+            logger.exception("Incremental delivery of %s failed", record.path)
+        finally:
+            self._running -= 1
+        # Wakes the consumer up when this was the last record
+        await self._queue.put(None)
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """Subsequent parts of the response, until every record is done"""
+        self._queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        records, self.records = self.records, []
+        self.add(records)
+        if not self._running:
+            yield {"hasNext": False}
+            return
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                incremental = _merge([payload for payload in batch if payload is not None])
+                if incremental or not self._running:
+                    part: Dict[str, Any] = {"hasNext": self._running > 0}
+                    if incremental:
+                        part = {"incremental": incremental, **part}
+                    yield part
+                if not self._running:
+                    return
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+
+
+def _merge(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Join consecutive items of the same stream into one payload"""
+    merged: List[Dict[str, Any]] = []
+    streamed = 0
+    for payload in payloads:
+        streamed += "items" in payload
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and "items" in payload
+            and previous.get("items")
+            and payload["items"] is not None
+            and "errors" not in previous
+            and "errors" not in payload
+            and previous.get("label") == payload.get("label")
+            and previous["path"][:-1] == payload["path"][:-1]
+            and previous["path"][-1] + len(previous["items"]) == payload["path"][-1]
+        ):
+            previous["items"].extend(payload["items"])
+            continue
+        merged.append(payload)
+    if streamed:
+        INCREMENTAL_PAYLOADS.labels(kind="stream").inc(streamed)
+    if len(payloads) > streamed:
+        INCREMENTAL_PAYLOADS.labels(kind="defer").inc(len(payloads) - streamed)
+    return merged
+
+
+def get_publisher(context: Any) -> Optional[IncrementalPublisher]:
+    return context.get(CONTEXT_KEY) if isinstance(context, dict) else None
+
+
+def has_pending_payloads(context: Any) -> bool:
+    """Whether the result of the operation is only the first part of the response"""
+    publisher = get_publisher(context)
+    return publisher is not None and publisher.pending
+
+
+def accepts_incremental(request) -> bool:
+    return "multipart/mixed" in request.headers.get("accept", "")
+
+
+def _defer_arguments(schema: GraphQLSchema, variable_values: Dict[str, Any], node) -> Optional[Dict[str, Any]]:
+    values = get_directive_values(schema.get_directive("defer"), node, variable_values)
+    return values if values and values["if"] else None
+
+
+def _stream_arguments(
+    schema: GraphQLSchema, variable_values: Dict[str, Any], node: FieldNode
+) -> Optional[Dict[str, Any]]:
+    values = get_directive_values(schema.get_directive("stream"), node, variable_values)
+    return values if values and values["if"] else None
+
+
+@dataclass
+class DeferredFragment:
+    label: Optional[str]
+    selection_set: SelectionSetNode
+
+
+def collect_fields_deferring(
+    schema: GraphQLSchema,
+    fragments: Dict[str, FragmentDefinitionNode],
+    variable_values: Dict[str, Any],
+    runtime_type: GraphQLObjectType,
+    selection_set: SelectionSetNode,
+    fields: Dict[str, List[FieldNode]],
+    deferred: List[DeferredFragment],
+    visited_fragment_names: Optional[Set[str]] = None,
+) -> None:
+    """
+    graphql-core's `collect_fields_impl`, setting fragments marked with
+    @defer aside in `deferred` instead of collecting their fields
+    """
+    if visited_fragment_names is None:
+        visited_fragment_names = set()
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            if should_include_node(variable_values, selection):
+                fields.setdefault(get_field_entry_key(selection), []).append(selection)
+            continue
+        if isinstance(selection, InlineFragmentNode):
+            fragment = selection
+        else:
+            name = selection.name.value
+            if name in visited_fragment_names:
+                continue
+            fragment = fragments.get(name)
+        if (
+            fragment is None
+            or not should_include_node(variable_values, selection)
+            or not does_fragment_condition_match(schema, fragment, runtime_type)
+        ):
+            continue
+        defer = _defer_arguments(schema, variable_values, selection)
+        if defer is not None:
+            deferred.append(DeferredFragment(defer.get("label"), fragment.selection_set))
+            continue
+        if isinstance(selection, FragmentSpreadNode):
+            visited_fragment_names.add(selection.name.value)
+        collect_fields_deferring(
+            schema,
+            fragments,
+            variable_values,
+            runtime_type,
+            fragment.selection_set,
+            fields,
+            deferred,
+            visited_fragment_names,
+        )
+
+
+class IncrementalExecutionContext(ExecutionContext):
+    """
+    ExecutionContext honouring @defer and @stream when the request
+    context holds an IncrementalPublisher (see core/router.py). Without
+    one it executes exactly like graphql-core's.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        publisher = get_publisher(self.context_value)
+        if self.operation.operation != OperationType.QUERY:
+            publisher = None
+        self.publisher = publisher
+        self.records: List[IncrementalRecord] = []
+        self._deferring_cache: Dict[tuple, Tuple[Dict[str, List[FieldNode]], List[DeferredFragment]]] = {}
+
+    def child(self) -> "IncrementalExecutionContext":
+        """Context executing one deferred fragment or streamed item"""
+        context = copy.copy(self)
+        context.collected_errors = CollectedErrors()
+        context.records = []
+        return context
+
+    def execute_operation(self, operation: OperationDefinitionNode, root_value: Any):
+        if self.publisher is None:
+            return super().execute_operation(operation, root_value)
+        root_type = self.schema.query_type
+        fields: Dict[str, List[FieldNode]] = {}
+        deferred: List[DeferredFragment] = []
+        collect_fields_deferring(
+            self.schema,
+            self.fragments,
+            self.variable_values,
+            root_type,
+            operation.selection_set,
+            fields,
+            deferred,
+        )
+        self.defer(root_type, root_value, None, deferred)
+        return self.execute_fields(root_type, root_value, None, fields)
+
+    def build_response(self, data: Optional[Dict[str, Any]], errors: List[GraphQLError]):
+        if self.publisher is not None:
+            self.publisher.add(_keep_present(self.records, data, []))
+        return ExecutionContext.build_response(data, errors)
+
+    def complete_object_value(self, return_type, field_nodes, info, path, result):
+        if self.publisher is None:
+            return super().complete_object_value(return_type, field_nodes, info, path, result)
+
+        key = (return_type, *map(id, field_nodes))
+        collected = self._deferring_cache.get(key)
+        if collected is None:
+            fields: Dict[str, List[FieldNode]] = {}
+            deferred: List[DeferredFragment] = []
+            for node in field_nodes:
+                if node.selection_set:
+                    collect_fields_deferring(
+                        self.schema,
+                        self.fragments,
+                        self.variable_values,
+                        return_type,
+                        node.selection_set,
+                        fields,
+                        deferred,
+                    )
+            collected = self._deferring_cache[key] = (fields, deferred)
+        fields, deferred = collected
+
+        if return_type.is_type_of:
+            is_type_of = return_type.is_type_of(result, info)
+            if self.is_awaitable(is_type_of):
+
+                async def execute_subfields_async():
+                    if not await is_type_of:
+                        raise invalid_return_type_error(return_type, result, field_nodes)
+                    self.defer(return_type, result, path, deferred)
+                    return self.execute_fields(return_type, result, path, fields)
+
+                return execute_subfields_async()
+            if not is_type_of:
+                raise invalid_return_type_error(return_type, result, field_nodes)
+
+        self.defer(return_type, result, path, deferred)
+        return self.execute_fields(return_type, result, path, fields)
+
+    def complete_list_value(self, return_type, field_nodes, info, path, result):
+        stream = None
+        if self.publisher is not None:
+            stream = _stream_arguments(self.schema, self.variable_values, field_nodes[0])
+        if stream is None:
+            return super().complete_list_value(return_type, field_nodes, info, path, result)
+
+        initial_count = stream["initialCount"]
+        if initial_count < 0:
+            raise GraphQLError("initialCount must be a non-negative integer", field_nodes)
+        label = stream.get("label")
+
+        if not is_iterable(result) and hasattr(result, "__aiter__"):
+            iterator = result.__aiter__()
+
+            async def complete_initial_items():
+                items = []
+                exhausted = False
+                while len(items) < initial_count:
+                    try:
+                        items.append(await iterator.__anext__())
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                completed = super(IncrementalExecutionContext, self).complete_list_value(
+                    return_type, field_nodes, info, path, items
+                )
+                if self.is_awaitable(completed):
+                    completed = await completed
+                if not exhausted:
+                    self.stream(iterator, len(items), return_type, field_nodes, info, path, label)
+                return completed
+
+            return complete_initial_items()
+
+        iterator = iter(result)
+        items = list(itertools.islice(iterator, initial_count))
+        completed = super().complete_list_value(return_type, field_nodes, info, path, items)
+        self.stream(iterator, len(items), return_type, field_nodes, info, path, label)
+        return completed
+
+    def defer(self, parent_type, source, path: Optional[Path], deferred: List[DeferredFragment]) -> None:
+        for fragment in deferred:
+            record_path = path.as_list() if path else []
+            self.records.append(
+                IncrementalRecord(
+                    record_path,
+                    self._deferred_payloads(parent_type, source, path, record_path, fragment),
+                )
+            )
+
+    def stream(self, iterator, start: int, return_type, field_nodes, info, path: Path, label) -> None:
+        record_path = path.as_list()
+        self.records.append(
+            IncrementalRecord(
+                record_path,
+                self._streamed_payloads(
+                    iterator, start, return_type.of_type, field_nodes, info, path, label
+                ),
+            )
+        )
+
+    def payload(self, payload: Dict[str, Any], label: Optional[str]) -> Dict[str, Any]:
+        if label is not None:
+            payload["label"] = label
+        errors = self.collected_errors.errors
+        if errors:
+            self.schema._strawberry_schema.process_errors(errors)
+            payload["errors"] = [error.formatted for error in errors]
+        return payload
+
+    async def _deferred_payloads(self, parent_type, source, path, record_path, fragment: DeferredFragment):
+        context = self.child()
+        fields: Dict[str, List[FieldNode]] = {}
+        deferred: List[DeferredFragment] = []
+        collect_fields_deferring(
+            self.schema,
+            self.fragments,
+            self.variable_values,
+            parent_type,
+            fragment.selection_set,
+            fields,
+            deferred,
+        )
+        context.defer(parent_type, source, path, deferred)
+        try:
+            data = context.execute_fields(parent_type, source, path, fields)
+            if self.is_awaitable(data):
+                data = await data
+        except GraphQLError as error:
+            # A non-null field of the fragment failed
+            context.collected_errors.add(error, path)
+            data = None
+        payload = context.payload({"data": data, "path": record_path}, fragment.label)
+        yield payload, _keep_present(context.records, data, record_path)
+
+    async def _streamed_payloads(self, iterator, index: int, item_type, field_nodes, info, path, label):
+        is_async = not is_iterable(iterator)
+        context = self.child()
+        try:
+            while True:
+                if context.collected_errors.errors or context.records:
+                    context = self.child()
+                item_path = path.add_key(index, None)
+                try:
+                    item = await iterator.__anext__() if is_async else next(iterator)
+                except (StopAsyncIteration, StopIteration):
+                    return
+                except Exception as raw_error:
+                    # The source failed: report it and end the stream
+                    error = located_error(raw_error, field_nodes, path.as_list())
+                    context.collected_errors.add(error, path)
+                    yield context.payload({"items": None, "path": item_path.as_list()}, label), []
+                    return
+
+                try:
+                    completed = context.complete_value(item_type, field_nodes, info, item_path, item)
+                    if self.is_awaitable(completed):
+                        completed = await completed
+                    items = [completed]
+                except Exception as raw_error:
+                    error = located_error(raw_error, field_nodes, item_path.as_list())
+                    context.collected_errors.add(error, item_path)
+                    if is_non_null_type(item_type):
+                        # The list can't hold a null: the stream ends here
+                        yield context.payload({"items": None, "path": item_path.as_list()}, label), []
+                        return
+                    items = [None]
+
+                payload = context.payload({"items": items, "path": item_path.as_list()}, label)
+                yield payload, _keep_present(context.records, items[0], item_path.as_list())
+                index += 1
+        finally:
+            if is_async and hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+
+def is_streamed(info: Info, name: str) -> bool:
+    """
+    Whether the child field `name` of the current field is marked with
+    an active @stream, i.e. the resolver may return its items as an
+    async iterator
+    """
+    raw_info = info._raw_info
+    if get_publisher(raw_info.context) is None or raw_info.operation.operation != OperationType.QUERY:
+        return False
+    return any(
+        _stream_arguments(raw_info.schema, raw_info.variable_values, field)
+        for field in selected_fields(info)
+        if field.name.value == name
+    )
+
+
+async def stream_queryset(queryset: QuerySet) -> AsyncIterator[Model]:
+    """
+    Rows of `queryset` as they are fetched from a database cursor,
+    GRAPHQL_STREAM_CHUNK_SIZE at a time, for lists streamed with @stream.
+    The cursor runs on its own thread (see core/utils/export.py), reading
+    from the replica the operation would read from.
+    """
+    chunk_size = settings.GRAPHQL_STREAM_CHUNK_SIZE
+    alias = read_databases()[0]
+
+    def chunks(stopped):
+        with reading_from(alias), recording_queries():
+            rows = until_stopped(queryset.iterator(chunk_size=chunk_size), stopped)
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                yield chunk
+
+    # Closing the rows (client gone) stops the cursor thread
+    async with contextlib.aclosing(iterate_in_thread(chunks)) as chunks_iterator:
+        async for chunk in chunks_iterator:
+            for row in chunk:
+                yield row
+
+
+async def multipart_chunks(initial: bytes, publisher: IncrementalPublisher) -> AsyncIterator[bytes]:
+    """Body of a multipart/mixed response: the first result, then every later part"""
+    yield PART_HEADER + initial
+    async for part in publisher.subscribe():
+        yield PART_HEADER + dumps(part)
+    yield MULTIPART_END
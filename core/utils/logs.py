@@ -0,0 +1,224 @@
+"""
+Non-blocking log shipping
+
+Log calls must not wait on stdout or on the Fluent socket from the event
+loop. `configure_logging` (Django's LOGGING_CONFIG) applies LOGGING, then
+moves the root logger's handlers behind a QueueHandler: log calls only
+put the record on a bounded queue, and a QueueListener thread runs the
+real handlers.
+
+The listener drains whatever is queued (up to LOG_BATCH_SIZE records)
+before flushing its handlers, and FluentBatchHandler sends each batch as
+one msgpack-encoded Forward mode message, so a busy worker makes one
+socket write per batch instead of one per record.
+
+When the queue (LOG_QUEUE_SIZE records) is full, LOG_QUEUE_POLICY
+decides: "drop" discards the record and counts it in
+`log_records_dropped_total`, "block" makes the caller wait for room.
+"""
+import atexit
+import copy
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+from typing import Any, Dict, List, Optional
+
+import msgpack
+from fluent.handler import FluentHandler
+from prometheus_client import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+)
+
+_exception_formatter = logging.Formatter()
+
+
+def msgpack_default_encode(obj: Any) -> Any:
+    if isinstance(obj, Exception):
+        if hasattr(obj, "message"):
+            return obj.message
+        return str(obj)
+    return str(obj)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a bounded queue, dropping or blocking when it is full"""
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop") -> None:
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown LOG_QUEUE_POLICY: {policy}")
+        super().__init__(log_queue)
+        self.policy = policy
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments and render the traceback now, as they may
+        # change before the listener runs; formatting is left to the
+        # listener's handlers
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class BatchQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener handling queued records in batches of up to
+    `batch_size` and flushing its handlers after each batch
+    """
+
+    def __init__(self, log_queue: queue.Queue, *handlers: logging.Handler, batch_size: int = 500) -> None:
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+
+    def enqueue_sentinel(self) -> None:
+        # Wait for room: the sentinel must not be dropped
+        self.queue.put(self._sentinel)
+
+    def _monitor(self) -> None:
+        while True:
+            records = [self.dequeue(True)]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+
+            stopped = False
+            for record in records:
+                if record is self._sentinel:
+                    stopped = True
+                else:
+                    self.handle(record)
+                self.queue.task_done()
+            for handler in self.handlers:
+                handler.flush()
+            if stopped:
+                return
+
+
+class FluentBatchHandler(FluentHandler):
+    """
+    FluentHandler buffering records until flush(), then sending them as a
+    single Forward mode message: [tag, [[time, record], ...]]
+    """
+
+    def __init__(self, *args, batch_size: int = 500, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.batch_size = batch_size
+        self.entries: List[list] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.entries.append([int(record.created), self.format(record)])
+        except Exception:
+            self.handleError(record)
+        if len(self.entries) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            entries, self.entries = self.entries, []
+            if not entries:
+                return
+            packet = msgpack.packb([self.tag, entries], **(self._msgpack_kwargs or {}))
+            # FluentSender reconnects and buffers failed sends (up to bufmax)
+            self.sender._send(packet)
+        except Exception:
+            self.handleError(logging.makeLogRecord({"msg": f"{len(entries)} records not sent"}))
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        self.flush()
+        super().close()
+
+
+_listener: Optional[BatchQueueListener] = None
+
+
+def start_log_listener(
+    queue_size: int = 10_000, policy: str = "drop", batch_size: int = 500
+) -> Optional[BatchQueueListener]:
+    """Move the root logger's handlers to a listener thread behind a queue"""
+    global _listener
+    stop_log_listener()
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    if not handlers:
+        return None
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(BoundedQueueHandler(log_queue, policy))
+    _listener = BatchQueueListener(log_queue, *handlers, batch_size=batch_size)
+    _listener.start()
+    return _listener
+
+
+def stop_log_listener() -> None:
+    """Ship the queued records and put the handlers back on the root logger"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, BoundedQueueHandler):
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+
+def _restart_listener_after_fork() -> None:
+    # Threads don't survive fork(): forked workers (e.g. gunicorn with
+    # preload_app) get their own queue, listener thread and Fluent socket
+    if _listener is None:
+        return
+    log_queue: queue.Queue = queue.Queue(maxsize=_listener.queue.maxsize)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, BoundedQueueHandler):
+            handler.queue = log_queue
+    for handler in _listener.handlers:
+        if isinstance(handler, FluentHandler):
+            handler._sender = None
+    _listener.queue = log_queue
+    _listener._thread = None
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+atexit.register(stop_log_listener)
+
+
+def configure_logging(logging_settings: Dict[str, Any]) -> None:
+    """LOGGING_CONFIG: dictConfig(LOGGING), then queue the root handlers"""
+    from django.conf import settings
+
+    # Hand the queued handlers back first: dictConfig replaces them, and
+    # a second django.setup() would otherwise ship every record twice
+    stop_log_listener()
+    logging.config.dictConfig(logging_settings)
+    start_log_listener(
+        queue_size=settings.LOG_QUEUE_SIZE,
+        policy=settings.LOG_QUEUE_POLICY,
+        batch_size=settings.LOG_BATCH_SIZE,
+    )
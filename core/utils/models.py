@@ -1,36 +1,28 @@
-from typing import List, Optional, Sequence, Tuple, Union
+from typing import Iterable, Optional
 
 from django.db.models import Model
 
 
 def model_to_dict(
     instance: Model,
-    fields: Optional[List[str]] = None,
-    exclude: Optional[Sequence[str]] = None,
+    fields: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
 ) -> dict:
-    instance_dict = instance.__dict__.copy()
-    instance_fields_dict = {}
-
-    del instance_dict["_state"]
-
-    if fields is None:
-        fields = tuple(instance_dict.keys())
-
-    if exclude is None:
-        exclude = ()
-
-    if type(fields) in (list, tuple):
-        for instance_field in instance_dict.keys():
-            if instance_field in fields:
-                instance_fields_dict[instance_field] = instance_dict[instance_field]
-
-    instance_exclude_dict = {}
-
-    if type(exclude) in (list, tuple):
-        for instance_field in instance_fields_dict.keys():
-            if instance_field not in exclude:
-                instance_exclude_dict[instance_field] = instance_fields_dict[
-                    instance_field
-                ]
-
-    return instance_exclude_dict
+    """
+    Loaded attributes of `instance` (without Django's `_state`), limited
+    to `fields` when given and without `exclude`, in one pass over the
+    instance with set lookups instead of a copy and list scans
+    """
+    selected = None if fields is None else set(fields)
+    excluded = {"_state", *exclude} if exclude else {"_state"}
+    if selected is None:
+        return {
+            name: value
+            for name, value in instance.__dict__.items()
+            if name not in excluded
+        }
+    return {
+        name: value
+        for name, value in instance.__dict__.items()
+        if name in selected and name not in excluded
+    }
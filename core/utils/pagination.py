@@ -0,0 +1,170 @@
+"""
+Keyset (cursor) pagination for Relay connections
+
+Cursors are opaque base64 strings holding the ordering values of a row,
+so fetching any page is a single indexed range scan instead of an
+OFFSET that grows with the page number.
+
+Example usage:
+    page = paginate_queryset(ExampleModel.objects.all(), first=20, after=cursor)
+    edges = [(page.cursor(obj), obj) for obj in page.items]
+"""
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from django.conf import settings
+from django.db.models import Model, Q, QuerySet
+from graphql_relay.utils import base64, unbase64
+
+DEFAULT_ORDERING = ("-created_at", "-id")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor_values(values: Sequence[Any]) -> str:
+    """Build an opaque cursor from ordering values"""
+    return base64(json.dumps([_serialize(value) for value in values], separators=(",", ":")))
+
+
+def encode_cursor(instance: Model, ordering: Sequence[str] = DEFAULT_ORDERING) -> str:
+    """Build the opaque cursor of `instance` from its ordering values"""
+    return encode_cursor_values([getattr(instance, field.lstrip("-")) for field in ordering])
+
+
+def decode_cursor(cursor: str, ordering: Sequence[str] = DEFAULT_ORDERING) -> List[Any]:
+    try:
+        values = json.loads(unbase64(cursor))
+    except ValueError as exc:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from exc
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return values
+
+
+def keyset_filter(
+    values: Sequence[Any], ordering: Sequence[str], forward: bool = True
+) -> Q:
+    """
+    Rows strictly after (forward) or before the row holding `values`,
+    expanded lexicographically: (a > x) OR (a = x AND b > y) OR ...
+    The leading `a >= x` bound is redundant but lets the database turn
+    the predicate into an index range scan.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip("-")
+        descending = field.startswith("-")
+        lookup = "lt" if descending == forward else "gt"
+        term = Q(**{f"{name}__{lookup}": values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            term &= Q(**{previous.lstrip("-"): value})
+        condition |= term
+
+    leading = ordering[0]
+    lookup = "lte" if leading.startswith("-") == forward else "gte"
+    return Q(**{f"{leading.lstrip('-')}__{lookup}": values[0]}) & condition
+
+
+def _reverse(ordering: Sequence[str]) -> List[str]:
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+@dataclass
+class Page:
+    items: List[Model]
+    has_next_page: bool
+    has_previous_page: bool
+    ordering: Sequence[str] = DEFAULT_ORDERING
+
+    def cursor(self, instance: Model) -> str:
+        return encode_cursor(instance, self.ordering)
+
+
+def get_page_size(requested: Optional[int]) -> int:
+    """Clamp a requested page size to GRAPHQL_CONNECTION_MAX_RESULTS"""
+    max_results = settings.GRAPHQL_CONNECTION_MAX_RESULTS
+    if requested is None:
+        return max_results
+    if requested < 0:
+        raise ValueError("Page size must be a non-negative integer")
+    return min(requested, max_results)
+
+
+def _filter_bounds(
+    queryset: QuerySet, after: Optional[str], before: Optional[str], ordering: Sequence[str]
+) -> QuerySet:
+    if after is not None:
+        queryset = queryset.filter(keyset_filter(decode_cursor(after, ordering), ordering))
+    if before is not None:
+        queryset = queryset.filter(
+            keyset_filter(decode_cursor(before, ordering), ordering, forward=False)
+        )
+    return queryset
+
+
+def page_queryset(
+    queryset: QuerySet,
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    ordering: Sequence[str] = DEFAULT_ORDERING,
+) -> QuerySet:
+    """
+    Rows of the forward page `first`/`after` as an unevaluated queryset,
+    for callers iterating it lazily (edges streamed with @stream)
+    """
+    limit = get_page_size(first)
+    return _filter_bounds(queryset, after, None, ordering).order_by(*ordering)[:limit]
+
+
+def paginate_queryset(
+    queryset: QuerySet,
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    last: Optional[int] = None,
+    before: Optional[str] = None,
+    ordering: Sequence[str] = DEFAULT_ORDERING,
+) -> Page:
+    """
+    Fetch one page of `queryset` using keyset pagination on `ordering`.
+    `first`/`after` page forward, `last`/`before` page backward. Only
+    page size + 1 rows are read, whatever the position in the table.
+    """
+    if first is not None and last is not None:
+        raise ValueError("Passing both `first` and `last` is not supported")
+
+    forward = last is None
+    limit = get_page_size(first if forward else last)
+    queryset = _filter_bounds(queryset, after, before, ordering)
+
+    if forward:
+        rows = list(queryset.order_by(*ordering)[: limit + 1])
+    else:
+        rows = list(queryset.order_by(*_reverse(ordering))[: limit + 1])
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if forward:
+        return Page(
+            items=rows,
+            has_next_page=has_more,
+            has_previous_page=after is not None,
+            ordering=ordering,
+        )
+    rows.reverse()
+    return Page(
+        items=rows,
+        has_next_page=before is not None,
+        has_previous_page=has_more,
+        ordering=ordering,
+    )
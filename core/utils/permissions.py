@@ -8,12 +8,24 @@ Example usage:
         def protected_field(self, info) -> str:
             return "This is protected"
 """
-from typing import Any, Awaitable, Union
+from typing import Any, Awaitable, List, Union
 
+from django.conf import settings
 from strawberry.permission import BasePermission
 from strawberry.types import Info
 
 
+def auth_scope(context: Any) -> List[str]:
+    """
+    Values of the GRAPHQL_COALESCE_SCOPE_HEADERS request headers: shared
+    results (coalescing, the response cache) only go to requests with
+    the same scope
+    """
+    request = context.get("request") if isinstance(context, dict) else None
+    headers = getattr(request, "headers", {})
+    return [headers.get(name, "") for name in settings.GRAPHQL_COALESCE_SCOPE_HEADERS]
+
+
 class IsAuthenticated(BasePermission):
     """
     Permission class to check if user is authenticated
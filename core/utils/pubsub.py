@@ -0,0 +1,274 @@
+"""
+In-process pub/sub with a pluggable cross-worker broadcast
+
+Writers publish JSON-serializable messages on a channel; every worker
+receives them through the broadcast backend and fans them out to its
+own subscribers (GraphQL subscriptions, see apps/api/schema/subscriptions.py).
+
+Example usage:
+
+    publish("examples", {"kind": "updated", "id": 42})
+
+    async with contextlib.aclosing(subscribe("examples")) as messages:
+        async for message in messages:
+            ...
+
+`publish()` only puts the message in an outbox and returns: sending it
+to the backend and the fan-out run in the broker's own tasks, off the
+request path. Each subscriber has a bounded queue of
+PUBSUB_SUBSCRIBER_QUEUE_SIZE messages; a subscriber that falls behind
+loses its oldest messages (counted in pubsub_messages_total) instead of
+slowing down the others or growing without bound. Subscribers share the
+message objects and must not modify them.
+
+Backends are pluggable through PUBSUB_BACKEND:
+    "local"    - this worker only; the stand-in for tests and single
+                 worker deployments
+    "postgres" - LISTEN/NOTIFY on the primary database, every worker
+                 receives the messages of all workers. NOTIFY payloads
+                 are limited to 8000 bytes, so messages should carry ids
+                 rather than rows.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from prometheus_client import Counter, Gauge
+
+from core.utils.encoding import dumps_str
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_MESSAGES = Counter(
+    "pubsub_messages_total",
+    "Pub/sub messages by channel: published here, received from the backend, "
+    "delivered to subscribers and dropped for slow subscribers",
+    ["channel", "event"],
+)
+PUBSUB_SUBSCRIBERS = Gauge(
+    "pubsub_subscribers",
+    "Open pub/sub subscriptions",
+    ["channel"],
+)
+
+# Subscribers served before the fan-out yields to other tasks
+FAN_OUT_BATCH = 500
+
+Receive = Callable[[str, Dict[str, Any]], None]
+
+
+class BroadcastBackend:
+    """Carries messages to the broker of every worker, this one included"""
+
+    async def start(self, receive: Receive) -> None:
+        """Begin calling `receive(channel, message)` for incoming messages"""
+        self.receive = receive
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBackend(BroadcastBackend):
+    """Loops messages back to this worker"""
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self.receive(channel, message)
+
+
+class PostgresBackend(BroadcastBackend):
+    """
+    LISTEN/NOTIFY on one Postgres channel for all pub/sub channels, with
+    a dedicated connection for each direction. The listener reconnects
+    when its connection drops or fails; messages sent meanwhile are lost.
+    Malformed notifications are logged and skipped.
+    """
+
+    PG_CHANNEL = "graphql_pubsub"
+    MAX_PAYLOAD = 8000
+    RECONNECT_SECONDS = 1.0
+
+    def __init__(self, alias: str = DEFAULT_DB_ALIAS) -> None:
+        self.alias = alias
+        self._notifier = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        import psycopg
+        from django.db import connections
+
+        params = connections[self.alias].get_connection_params()
+        # Django's sync cursor classes and adapters don't apply here
+        params.pop("cursor_factory", None)
+        params.pop("context", None)
+        return await psycopg.AsyncConnection.connect(**params, autocommit=True)
+
+    async def start(self, receive: Receive) -> None:
+        await super().start(receive)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        import psycopg
+
+        while True:
+            try:
+                async with await self.connect() as connection:
+                    await connection.execute(f"LISTEN {self.PG_CHANNEL}")
+                    async for notify in connection.notifies():
+                        self._deliver(notify.payload)
+            except psycopg.OperationalError:
+                logger.warning("Lost the pub/sub LISTEN connection, reconnecting", exc_info=True)
+            except Exception:
+                # Anything else would end the task, and the subscriptions
+                # of this worker would stop getting events
+                logger.exception("The pub/sub listener failed, reconnecting")
+            await asyncio.sleep(self.RECONNECT_SECONDS)
+
+    def _deliver(self, payload: str) -> None:
+        try:
+            envelope = json.loads(payload)
+            channel, message = envelope["channel"], envelope["message"]
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Skipping a malformed pub/sub notification: %.200r", payload)
+            return
+        self.receive(channel, message)
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        payload = dumps_str({"channel": channel, "message": message})
+        if len(payload.encode("utf-8")) >= self.MAX_PAYLOAD:
+            raise ValueError(f"Message on {channel} exceeds the NOTIFY payload limit")
+        if self._notifier is None or self._notifier.closed:
+            self._notifier = await self.connect()
+        await self._notifier.execute("SELECT pg_notify(%s, %s)", (self.PG_CHANNEL, payload))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._notifier is not None:
+            await self._notifier.close()
+
+
+class Broker:
+    """Sends this worker's messages to the backend and fans incoming ones out"""
+
+    def __init__(self, backend: BroadcastBackend, queue_size: int) -> None:
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._inbox: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._outbox = asyncio.Queue()
+        self._inbox = asyncio.Queue()
+        self._tasks = [
+            loop.create_task(self._send()),
+            loop.create_task(self._fan_out()),
+        ]
+
+    def _receive(self, channel: str, message: Dict[str, Any]) -> None:
+        PUBSUB_MESSAGES.labels(channel=channel, event="received").inc()
+        self._inbox.put_nowait((channel, message))
+
+    async def _send(self) -> None:
+        await self.backend.start(self._receive)
+        while True:
+            channel, message = await self._outbox.get()
+            try:
+                await self.backend.publish(channel, message)
+            except Exception:
+                logger.exception("Could not publish a message on %s", channel)
+
+    async def _fan_out(self) -> None:
+        while True:
+            channel, message = await self._inbox.get()
+            delivered = dropped = 0
+            for index, queue in enumerate(tuple(self._subscribers.get(channel, ()))):
+                if queue.full():
+                    queue.get_nowait()
+                    dropped += 1
+                queue.put_nowait(message)
+                delivered += 1
+                if index % FAN_OUT_BATCH == FAN_OUT_BATCH - 1:
+                    await asyncio.sleep(0)
+            PUBSUB_MESSAGES.labels(channel=channel, event="delivered").inc(delivered)
+            if dropped:
+                PUBSUB_MESSAGES.labels(channel=channel, event="dropped").inc(dropped)
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self._ensure_started()
+        PUBSUB_MESSAGES.labels(channel=channel, event="published").inc()
+        self._outbox.put_nowait((channel, message))
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Dict[str, Any]]:
+        self._ensure_started()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[channel].add(queue)
+        PUBSUB_SUBSCRIBERS.labels(channel=channel).inc()
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].discard(queue)
+            PUBSUB_SUBSCRIBERS.labels(channel=channel).dec()
+
+    def subscribers(self, channel: str) -> int:
+        return len(self._subscribers.get(channel, ()))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._loop = None
+        await self.backend.close()
+
+
+_broker: Optional[Broker] = None
+
+
+def get_broker() -> Broker:
+    """Broker with the backend configured by PUBSUB_BACKEND"""
+    global _broker
+    if _broker is None:
+        name = settings.PUBSUB_BACKEND
+        if name == "local":
+            backend: BroadcastBackend = LocalBackend()
+        elif name == "postgres":
+            backend = PostgresBackend()
+        else:
+            raise ValueError(f"Unknown pub/sub backend: {name}")
+        _broker = Broker(backend, settings.PUBSUB_SUBSCRIBER_QUEUE_SIZE)
+    return _broker
+
+
+def set_broker(broker: Optional[Broker]) -> None:
+    """Swap the broker, e.g. for one on a local backend in tests"""
+    global _broker
+    _broker = broker
+
+
+def publish(channel: str, message: Dict[str, Any]) -> None:
+    """Send `message` to the subscribers of `channel` in every worker"""
+    get_broker().publish(channel, message)
+
+
+def subscribe(channel: str) -> AsyncIterator[Dict[str, Any]]:
+    """Messages published on `channel` from now on, until the iterator is closed"""
+    return get_broker().subscribe(channel)
+
+
+async def close_broker() -> None:
+    if _broker is not None:
+        await _broker.close()
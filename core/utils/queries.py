@@ -0,0 +1,172 @@
+"""
+SQL statements per GraphQL operation
+
+`get_context` (core/asgi.py) puts a fresh QueryStats in the context of
+every request. QueryStatsExtension makes it the current one for the
+operation, and `database_sync_to_async` installs it as an
+`execute_wrapper` on the connections of the worker thread running each
+ORM call, so every statement of the operation is counted wherever it
+runs.
+
+Statements are grouped by fingerprint (the SQL with literals and
+`IN (...)` lists collapsed). A fingerprint run
+GRAPHQL_QUERY_REPEAT_THRESHOLD times or more in one operation is
+reported as repeated - usually an N+1 that a DataLoader should batch.
+
+Metrics, labelled by operation name:
+    graphql_operation_queries            statements per operation
+    graphql_operation_query_seconds      time spent in the database
+    graphql_repeated_queries_total       operations with repeated statements
+
+With ENVIRONMENT=dev the response also carries the numbers:
+    {"data": ..., "extensions": {"queries": {"count": 21, "duration_ms": 4.2,
+        "repeated": [{"statement": "SELECT ... WHERE id = ?", "count": 20}]}}}
+"""
+import contextlib
+import re
+import threading
+import time
+from collections import Counter as Tally
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from prometheus_client import Counter, Histogram
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from core.utils.tracing import get_operation_label
+
+GRAPHQL_OPERATION_QUERIES = Histogram(
+    "graphql_operation_queries",
+    "SQL statements run by GraphQL operations",
+    ["operation_name"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+GRAPHQL_OPERATION_QUERY_DURATION = Histogram(
+    "graphql_operation_query_seconds",
+    "Time GraphQL operations spent running SQL statements",
+    ["operation_name"],
+)
+GRAPHQL_REPEATED_QUERIES = Counter(
+    "graphql_repeated_queries_total",
+    "GraphQL operations running the same SQL statement repeatedly (likely N+1)",
+    ["operation_name"],
+)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """`sql` with parameters and literals as `?` and value lists as `(...)`"""
+    sql = _LITERALS.sub("?", sql)
+    sql = _LISTS.sub("(...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class QueryStats:
+    """
+    Statements run on behalf of one operation. Instances are execute
+    wrappers and may be installed on several threads at once.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Tally = Tally()
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            key = fingerprint(sql)
+            with self._lock:
+                self.count += 1
+                self.duration += duration
+                self.statements[key] += 1
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Fingerprints run at least `threshold` times, most frequent first"""
+        if threshold is None:
+            threshold = settings.GRAPHQL_QUERY_REPEAT_THRESHOLD
+        with self._lock:
+            return [
+                (statement, count)
+                for statement, count in self.statements.most_common()
+                if count >= threshold
+            ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "duration_ms": round(self.duration * 1000, 3),
+            "repeated": [
+                {"statement": statement, "count": count}
+                for statement, count in self.repeated()
+            ],
+        }
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    """QueryStats of the operation being executed, if any"""
+    return _current_stats.get()
+
+
+@contextlib.contextmanager
+def recording_queries() -> Iterator[None]:
+    """
+    Count the statements run on this thread while the block runs against
+    the current operation. Contextvars follow ORM calls into the thread
+    pool, see core/utils/db.py.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield
+
+
+class QueryStatsExtension(SchemaExtension):
+    """
+    Record the SQL statements of each operation in the QueryStats found
+    at `context["queries"]` (a new one when the context has none)
+    """
+
+    def on_operation(self):
+        context = self.execution_context.context
+        stats = context.get("queries") if isinstance(context, dict) else None
+        if stats is None:
+            stats = QueryStats()
+        self.stats = stats
+        token = _current_stats.set(stats)
+        try:
+            yield
+        finally:
+            _current_stats.reset(token)
+
+        label = get_operation_label(self.execution_context)
+        GRAPHQL_OPERATION_QUERIES.labels(operation_name=label).observe(stats.count)
+        GRAPHQL_OPERATION_QUERY_DURATION.labels(operation_name=label).observe(stats.duration)
+        if stats.repeated():
+            GRAPHQL_REPEATED_QUERIES.labels(operation_name=label).inc()
+
+    def get_results(self) -> Dict[str, Any]:
+        if settings.ENVIRONMENT != "dev":
+            return {}
+        # Subscription events read their rows outside the operation, once
+        # for all subscribers (see apps/api/schema/subscriptions.py)
+        if self.execution_context.operation_type == OperationType.SUBSCRIPTION:
+            return {}
+        return {"queries": self.stats.as_dict()}
@@ -0,0 +1,190 @@
+"""
+Read replicas
+
+DATABASE_REPLICA_URLS adds `replica_1`, `replica_2`, ... next to the
+`default` (primary) database. Reads of query operations go to the
+replicas; mutations and everything outside GraphQL (admin, exports,
+management commands) stay on the primary.
+
+- ReplicaRoutingExtension marks query operations as replica reads,
+  unless the client ran a mutation in the last
+  DATABASE_REPLICA_STICKY_SECONDS: mutations set the STICKY_COOKIE
+  cookie for that long, so clients read their own writes from the
+  primary while the replicas catch up.
+- `database_sync_to_async` (core/utils/db.py) picks a replica for each
+  ORM call, round robin among the healthy ones, and ReplicaRouter sends
+  the reads of the call there.
+- A replica whose connection or statements fail is skipped for
+  DATABASE_REPLICA_RETRY_SECONDS, and the call is retried on the next
+  replica, then on the primary. Query resolvers must therefore be
+  read-only.
+
+Replication lag is not measured: keep the sticky window above the lag
+the replicas usually have.
+
+The response cache (core/utils/response_cache.py) stores what a query
+read under the tag versions current at that time. A read from a lagging
+replica just after a mutation's `invalidate()` would be cached under the
+new versions for the whole TTL, for every client, so operations filling
+the cache within DATABASE_REPLICA_STICKY_SECONDS of an invalidation of
+their tags read from the primary (`primary_reads`).
+"""
+import contextlib
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from prometheus_client import Counter
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICA_FAILURES = Counter(
+    "database_replica_failures_total",
+    "ORM calls moved off a failing replica",
+    ["alias"],
+)
+
+STICKY_COOKIE = "read_primary"
+
+# True while a query operation may read from the replicas
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+# Database the reads of the current ORM call go to
+_read_database: ContextVar[str] = ContextVar("read_database", default=DEFAULT_DB_ALIAS)
+
+
+class ReplicaSet:
+    """Round robin over replicas, skipping the ones that failed recently"""
+
+    def __init__(self, aliases: Sequence[str], retry_after: float) -> None:
+        self.aliases = list(aliases)
+        self.retry_after = retry_after
+        self._down_until: Dict[str, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def candidates(self) -> List[str]:
+        """Replicas to try, in order, for one call"""
+        if not self.aliases:
+            return []
+        now = time.monotonic()
+        start = next(self._counter) % len(self.aliases)
+        ordered = self.aliases[start:] + self.aliases[:start]
+        with self._lock:
+            return [alias for alias in ordered if self._down_until.get(alias, 0) <= now]
+
+    def mark_down(self, alias: str) -> None:
+        DATABASE_REPLICA_FAILURES.labels(alias=alias).inc()
+        with self._lock:
+            was_up = alias not in self._down_until
+            self._down_until[alias] = time.monotonic() + self.retry_after
+        if was_up:
+            logger.warning("Replica %s failed, reading from the primary", alias)
+
+    def mark_up(self, alias: str) -> None:
+        with self._lock:
+            if self._down_until.pop(alias, None) is not None:
+                logger.info("Replica %s is back", alias)
+
+
+_replica_set: Optional[ReplicaSet] = None
+_replica_set_lock = threading.Lock()
+
+
+def get_replica_set() -> ReplicaSet:
+    global _replica_set
+    if _replica_set is None:
+        with _replica_set_lock:
+            if _replica_set is None:
+                _replica_set = ReplicaSet(
+                    settings.DATABASE_REPLICAS, settings.DATABASE_REPLICA_RETRY_SECONDS
+                )
+    return _replica_set
+
+
+def read_databases() -> List[str]:
+    """Databases an ORM call may read from, in the order to try them"""
+    if not _replica_reads.get() or not settings.DATABASE_REPLICAS:
+        return [DEFAULT_DB_ALIAS]
+    return [*get_replica_set().candidates(), DEFAULT_DB_ALIAS]
+
+
+@contextlib.contextmanager
+def primary_reads() -> Iterator[None]:
+    """Keep the reads of the block on the primary, even in a query operation"""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextlib.contextmanager
+def reading_from(alias: str) -> Iterator[None]:
+    """Send the reads of the block to `alias`"""
+    token = _read_database.set(alias)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Django database router: reads go to the database chosen for the
+    current ORM call, writes and migrations to the primary
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints) -> str:
+        # Also for instances read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints) -> bool:
+        return db == DEFAULT_DB_ALIAS
+
+
+def is_sticky(request) -> bool:
+    """Whether the client wrote recently and must read from the primary"""
+    return request is not None and STICKY_COOKIE in getattr(request, "cookies", {})
+
+
+class ReplicaRoutingExtension(SchemaExtension):
+    """
+    Let query operations read from the replicas, and keep the client on
+    the primary for DATABASE_REPLICA_STICKY_SECONDS after a mutation
+    """
+
+    def on_execute(self):
+        execution_context = self.execution_context
+        context = execution_context.context if isinstance(execution_context.context, dict) else {}
+        if not settings.DATABASE_REPLICAS:
+            yield
+            return
+
+        operation_type = execution_context.operation_type
+        if operation_type == OperationType.QUERY and not is_sticky(context.get("request")):
+            token = _replica_reads.set(True)
+            try:
+                yield
+            finally:
+                _replica_reads.reset(token)
+            return
+
+        yield
+        response = context.get("response")
+        sticky_seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+        if operation_type == OperationType.MUTATION and response is not None and sticky_seconds > 0:
+            response.set_cookie(STICKY_COOKIE, "1", max_age=sticky_seconds, httponly=True, samesite="lax")
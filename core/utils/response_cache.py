@@ -0,0 +1,369 @@
+"""
+Response cache for read operations
+
+Query fields opt in by declaring a cache policy in their metadata:
+
+    @strawberry.field(metadata=cache_policy(tags=lambda args: [f"example:{args['id']}"]))
+    async def example(self, id: strawberry.ID) -> Optional[ExampleType]: ...
+
+A query operation whose root fields all declare a policy is served from
+the cache. The key is built from the query text, operation name,
+variables, auth scope (the GRAPHQL_COALESCE_SCOPE_HEADERS request
+headers, as for coalescing) and the current version of every tag
+derived from the root field arguments, so a response cached for one
+client is never served to another. Mutations call `invalidate(*tags)`, which gives those
+tags a new version: entries built on the old versions are never read
+again, so cached reads stay correct without relying on short TTLs.
+
+With read replicas (core/utils/replicas.py), a replica may not have the
+mutation's rows yet when the next read fills the cache, and its stale
+result would be kept under the new versions. Tag versions record when
+they were invalidated, and an operation filling the cache within
+DATABASE_REPLICA_STICKY_SECONDS of an invalidation of one of its tags
+reads from the primary.
+
+Backends are pluggable through GRAPHQL_RESPONSE_CACHE_BACKEND:
+    "local"  - in-process LRU with TTL (per worker)
+    "django" - Django cache alias GRAPHQL_RESPONSE_CACHE_ALIAS, shared
+               between workers when it points at Redis/Memcached; a
+               LocMemCache alias stands in for it locally
+    ""       - disabled
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from django.conf import settings
+from graphql import ExecutionResult as GraphQLExecutionResult
+from graphql import FragmentDefinitionNode, OperationDefinitionNode
+from graphql.execution.collect_fields import collect_fields
+from graphql.execution.values import get_argument_values
+from prometheus_client import Counter
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+from core.utils.incremental import has_pending_payloads
+from core.utils.permissions import auth_scope
+from core.utils.replicas import primary_reads
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "graphql_response_cache_requests_total",
+    "GraphQL response cache lookups",
+    ["result"],
+)
+
+TAG_PREFIX = "graphql:tag:"
+ENTRY_PREFIX = "graphql:response:"
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    tags: Callable[[Dict[str, Any]], Iterable[str]]
+    ttl: Optional[int] = None
+
+
+def cache_policy(
+    tags: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None,
+    ttl: Optional[int] = None,
+) -> Dict[str, CachePolicy]:
+    """
+    Field metadata making a Query field cacheable. `tags` receives the
+    field arguments and returns the tags to invalidate it by; `ttl`
+    lowers GRAPHQL_RESPONSE_CACHE_TTL for operations using the field.
+    """
+    return {"cache": CachePolicy(tags=tags or (lambda arguments: ()), ttl=ttl)}
+
+
+class CacheBackend:
+    """Async key/value interface used by the response cache"""
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    async def set_many(self, values: Mapping[str, Any], ttl: Optional[int] = None) -> None:
+        for key, value in values.items():
+            await self.set(key, value, ttl)
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    In-process LRU with TTL. Tag versions live outside the LRU so they
+    are never evicted before the entries that depend on them.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: Optional[int] = None) -> None:
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> Any:
+        if key.startswith(TAG_PREFIX):
+            return self._tags.get(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            values = {key: self._get(key, now) for key in keys}
+        return {key: value for key, value in values.items() if value is not None}
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            if key.startswith(TAG_PREFIX):
+                self._tags[key] = value
+                return
+            ttl = ttl if ttl is not None else self.default_ttl
+            expires = time.monotonic() + ttl if ttl else None
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+class DjangoCacheBackend(CacheBackend):
+    """Shared backend on top of a Django cache alias"""
+
+    def __init__(self, alias: str, default_ttl: Optional[int] = None) -> None:
+        from django.core.cache import caches
+
+        self.cache = caches[alias]
+        self.default_ttl = default_ttl
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        return await self.cache.aget_many(keys)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        if key.startswith(TAG_PREFIX):
+            ttl = None
+        else:
+            ttl = ttl if ttl is not None else self.default_ttl
+        await self.cache.aset(key, value, timeout=ttl)
+
+    async def set_many(self, values: Mapping[str, Any], ttl: Optional[int] = None) -> None:
+        # Only used for tag versions, which must not expire
+        await self.cache.aset_many(dict(values), timeout=None)
+
+    async def clear(self) -> None:
+        await self.cache.aclear()
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[CacheBackend]:
+    """Backend configured by GRAPHQL_RESPONSE_CACHE_BACKEND, None when disabled"""
+    global _backend
+    name = settings.GRAPHQL_RESPONSE_CACHE_BACKEND
+    if not name:
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if name == "local":
+                    _backend = LocalCacheBackend(
+                        max_entries=settings.GRAPHQL_RESPONSE_CACHE_MAX_ENTRIES,
+                        default_ttl=settings.GRAPHQL_RESPONSE_CACHE_TTL,
+                    )
+                elif name == "django":
+                    _backend = DjangoCacheBackend(
+                        alias=settings.GRAPHQL_RESPONSE_CACHE_ALIAS,
+                        default_ttl=settings.GRAPHQL_RESPONSE_CACHE_TTL,
+                    )
+                else:
+                    raise ValueError(f"Unknown response cache backend: {name}")
+    return _backend
+
+
+def set_response_cache(backend: Optional[CacheBackend]) -> None:
+    """Swap the backend, e.g. for a local stand-in in tests"""
+    global _backend
+    _backend = backend
+
+
+def new_version(invalidated_at: float) -> str:
+    return f"{invalidated_at}:{uuid.uuid4().hex}"
+
+
+def invalidated_at(version: Any) -> float:
+    """When (time.time()) `invalidate` created a tag version, 0 if it didn't"""
+    stamp, _, _ = str(version).partition(":")
+    try:
+        return float(stamp)
+    except ValueError:
+        return 0.0
+
+
+async def get_tag_versions(backend: CacheBackend, tags: Iterable[str]) -> Dict[str, Any]:
+    """
+    Current version of every tag. Unknown tags get a fresh version, so
+    a tag that disappeared from the backend can't revive old entries.
+    """
+    keys = sorted({f"{TAG_PREFIX}{tag}" for tag in tags})
+    versions = await backend.get_many(keys) if keys else {}
+    missing = {key: new_version(0) for key in keys if key not in versions}
+    if missing:
+        await backend.set_many(missing)
+        versions.update(missing)
+    return versions
+
+
+async def invalidate(*tags: str) -> None:
+    """Make every cached response depending on `tags` stale"""
+    backend = get_response_cache()
+    if backend is None or not tags:
+        return
+    now = time.time()
+    await backend.set_many({f"{TAG_PREFIX}{tag}": new_version(now) for tag in tags})
+
+
+class ResponseCacheExtension(SchemaExtension):
+    """
+    Serve query operations from the response cache when all their root
+    fields declare a cache policy. Pass the class (not an instance) to
+    the schema so every operation gets its own extension state.
+    """
+
+    def __init__(self, *, execution_context=None) -> None:
+        super().__init__(execution_context=execution_context)
+        self.key: Optional[str] = None
+        self.ttl: Optional[int] = None
+
+    def get_policies(self) -> Optional[Dict[str, tuple]]:
+        """Root fields of the operation with their policy and arguments"""
+        execution_context = self.execution_context
+        document = execution_context.graphql_document
+        operation = next(
+            (
+                definition
+                for definition in document.definitions
+                if isinstance(definition, OperationDefinitionNode)
+                and (
+                    execution_context.operation_name is None
+                    or definition.name
+                    and definition.name.value == execution_context.operation_name
+                )
+            ),
+            None,
+        )
+        if operation is None:
+            return None
+
+        graphql_schema = execution_context.schema._schema
+        query_type = graphql_schema.query_type
+        fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        variables = execution_context.variables or {}
+        fields = collect_fields(
+            graphql_schema, fragments, variables, query_type, operation.selection_set
+        )
+
+        policies = {}
+        for response_key, nodes in fields.items():
+            name = nodes[0].name.value
+            if name == "__typename":
+                continue
+            field = execution_context.schema.get_field_for_type(name, query_type.name)
+            policy = (field.metadata or {}).get("cache") if field else None
+            if policy is None:
+                return None
+            arguments = get_argument_values(query_type.fields[name], nodes[0], variables)
+            policies[response_key] = (policy, arguments)
+        return policies
+
+    @staticmethod
+    def recently_invalidated(versions: Dict[str, Any]) -> bool:
+        """Whether a tag was invalidated within DATABASE_REPLICA_STICKY_SECONDS"""
+        if not settings.DATABASE_REPLICAS:
+            return False
+        since = time.time() - settings.DATABASE_REPLICA_STICKY_SECONDS
+        return any(invalidated_at(version) > since for version in versions.values())
+
+    async def on_execute(self):
+        execution_context = self.execution_context
+        backend = get_response_cache()
+        if (
+            backend is None
+            or execution_context.operation_type != OperationType.QUERY
+            # Already answered, e.g. rejected by CostLimitExtension
+            or execution_context.result is not None
+        ):
+            yield
+            return
+
+        policies = self.get_policies()
+        if not policies:
+            yield
+            return
+
+        tags = [tag for policy, arguments in policies.values() for tag in policy.tags(arguments)]
+        ttls = [policy.ttl for policy, _ in policies.values() if policy.ttl is not None]
+        self.ttl = min(ttls) if ttls else None
+        versions = await get_tag_versions(backend, tags)
+        self.key = ENTRY_PREFIX + hashlib.sha256(
+            json.dumps(
+                [
+                    execution_context.query,
+                    execution_context.operation_name,
+                    execution_context.variables,
+                    auth_scope(execution_context.context),
+                    sorted(versions.items()),
+                ],
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+        ).hexdigest()
+
+        cached = (await backend.get_many([self.key])).get(self.key)
+        RESPONSE_CACHE_REQUESTS.labels(result="hit" if cached is not None else "miss").inc()
+        if cached is not None:
+            # Strawberry skips execution when a result is already set
+            execution_context.result = GraphQLExecutionResult(data=cached, errors=None)
+            yield
+            return
+
+        if self.recently_invalidated(versions):
+            # Replicas may not have the rows of that mutation yet
+            with primary_reads():
+                yield
+        else:
+            yield
+
+        result = execution_context.result
+        if (
+            result is not None
+            and not result.errors
+            and result.data is not None
+            # Only the first part of an incremental response, see core/utils/incremental.py
+            and not has_pending_payloads(execution_context.context)
+        ):
+            await backend.set(self.key, result.data, self.ttl)
@@ -1,4 +1,5 @@
 import json
+from datetime import datetime
 from typing import Any, NewType
 
 import strawberry
@@ -9,3 +10,14 @@ JSON = strawberry.scalar(
     serialize=lambda v: v,
     parse_value=lambda v: v,
 )
+
+# Replaces Strawberry's DateTime (see `scalar_overrides` in core/schema.py):
+# values are left as datetimes for the response encoder, which formats
+# them as ISO-8601 strings (core/utils/encoding.py)
+DateTime = strawberry.scalar(
+    NewType("DateTime", datetime),
+    name="DateTime",
+    description="Date with time (ISO-8601)",
+    serialize=lambda v: v,
+    parse_value=datetime.fromisoformat,
+)
@@ -0,0 +1,168 @@
+"""
+Ranked text search over model columns
+
+`SearchIndex.search()` returns the ids of the best matching rows with a
+relevance score (higher is better), capped at GRAPHQL_SEARCH_MAX_RESULTS.
+The backend follows the database vendor:
+
+    postgresql - pg_trgm word similarity (`%>`), served by GIN
+                 `gin_trgm_ops` indexes on the searched columns
+    sqlite     - an external-content FTS5 table using the trigram
+                 tokenizer, ranked by bm25
+    other      - `icontains` on every column, newest first
+
+Trigram indexes can't serve needles shorter than three characters, so
+those always use the `icontains` fallback.
+
+Hits are paged with the same opaque cursors as other connections,
+holding (score, id) instead of the keyset ordering values.
+
+Example usage:
+    index = SearchIndex(ExampleModel, fields=("name", "description"), fts_table="example_search")
+    hits = index.search("widget")  # [(id, score), ...] best first
+    page_hits, has_next_page, has_previous_page = paginate_hits(hits, first=20)
+"""
+from functools import reduce
+from operator import or_
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Model, Q
+from django.db.models.functions import Greatest
+
+from core.utils.pagination import decode_cursor, get_page_size
+
+# Trigram indexes only work for needles of at least 3 characters
+MIN_TRIGRAM_LENGTH = 3
+
+SearchHit = Tuple[int, float]
+
+# Cursor fields of search results: instances carry their `search_score`
+SEARCH_ORDERING = ("-search_score", "-id")
+
+
+def get_search_limit(requested: Optional[int] = None) -> int:
+    """Clamp a requested number of hits to GRAPHQL_SEARCH_MAX_RESULTS"""
+    max_results = settings.GRAPHQL_SEARCH_MAX_RESULTS
+    if requested is None:
+        return max_results
+    return max(0, min(requested, max_results))
+
+
+def fts5_phrase(query: str) -> str:
+    """Quote `query` as a single FTS5 phrase (a substring with the trigram tokenizer)"""
+    return '"{}"'.format(query.replace('"', '""'))
+
+
+class SearchIndex:
+    """
+    Search `fields` of `model`. `fts_table` names the FTS5 table
+    mirroring those fields on SQLite (see the api app migrations).
+    """
+
+    def __init__(
+        self,
+        model: Type[Model],
+        fields: Sequence[str],
+        fts_table: Optional[str] = None,
+    ) -> None:
+        self.model = model
+        self.fields = tuple(fields)
+        self.fts_table = fts_table
+        self._fts_available: Dict[str, bool] = {}
+
+    def has_fts_table(self, alias: str) -> bool:
+        """Whether the FTS5 table exists (SQLite builds without trigram skip it)"""
+        if alias not in self._fts_available:
+            with connections[alias].cursor() as cursor:
+                tables = connections[alias].introspection.table_names(cursor)
+            self._fts_available[alias] = self.fts_table in tables
+        return self._fts_available[alias]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[SearchHit]:
+        """Best matching `(id, score)` pairs for `query`, best first"""
+        query = query.strip()
+        limit = get_search_limit(limit)
+        if not query or not limit:
+            return []
+
+        alias = router.db_for_read(self.model)
+        vendor = connections[alias].vendor
+        if len(query) >= MIN_TRIGRAM_LENGTH:
+            if vendor == "postgresql":
+                return self._search_trigram(alias, query, limit)
+            if vendor == "sqlite" and self.fts_table and self.has_fts_table(alias):
+                return self._search_fts5(alias, query, limit)
+        return self._search_contains(alias, query, limit)
+
+    def _search_trigram(self, alias: str, query: str, limit: int) -> List[SearchHit]:
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        condition = reduce(
+            or_, (Q(**{f"{field}__trigram_word_similar": query}) for field in self.fields)
+        )
+        scores = [TrigramWordSimilarity(query, field) for field in self.fields]
+        # GREATEST ignores NULL columns on PostgreSQL
+        score = Greatest(*scores) if len(scores) > 1 else scores[0]
+        rows = (
+            self.model._default_manager.using(alias)
+            .filter(condition)
+            .annotate(search_score=score)
+            .order_by("-search_score", "-pk")
+            .values_list("pk", "search_score")[:limit]
+        )
+        return [(pk, float(score)) for pk, score in rows]
+
+    def _search_fts5(self, alias: str, query: str, limit: int) -> List[SearchHit]:
+        # bm25 ranks are negative, lower is better
+        sql = (
+            f'SELECT rowid, -rank FROM "{self.fts_table}" '
+            f'WHERE "{self.fts_table}" MATCH %s ORDER BY rank, rowid DESC LIMIT %s'
+        )
+        with connections[alias].cursor() as cursor:
+            cursor.execute(sql, [fts5_phrase(query), limit])
+            return [(pk, float(score)) for pk, score in cursor.fetchall()]
+
+    def _search_contains(self, alias: str, query: str, limit: int) -> List[SearchHit]:
+        condition = reduce(or_, (Q(**{f"{field}__icontains": query}) for field in self.fields))
+        rows = (
+            self.model._default_manager.using(alias)
+            .filter(condition)
+            .order_by("-pk")
+            .values_list("pk", flat=True)[:limit]
+        )
+        return [(pk, 0.0) for pk in rows]
+
+
+def paginate_hits(
+    hits: Sequence[SearchHit],
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    last: Optional[int] = None,
+    before: Optional[str] = None,
+) -> Tuple[List[SearchHit], bool, bool]:
+    """
+    One page of ranked `hits` (best first), with has_next_page and
+    has_previous_page, using cursors built from SEARCH_ORDERING
+    """
+    if first is not None and last is not None:
+        raise ValueError("Passing both `first` and `last` is not supported")
+
+    def key(hit: SearchHit) -> Tuple[float, int]:
+        pk, score = hit
+        return (score, pk)
+
+    if after is not None:
+        bound = tuple(decode_cursor(after, SEARCH_ORDERING))
+        hits = [hit for hit in hits if key(hit) < bound]
+    if before is not None:
+        bound = tuple(decode_cursor(before, SEARCH_ORDERING))
+        hits = [hit for hit in hits if key(hit) > bound]
+
+    if last is None:
+        limit = get_page_size(first)
+        return list(hits[:limit]), len(hits) > limit, after is not None
+    limit = get_page_size(last)
+    start = max(len(hits) - limit, 0)
+    return list(hits[start:]), before is not None, start > 0
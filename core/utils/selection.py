@@ -0,0 +1,86 @@
+"""
+Selection-set driven column projection
+
+Turns the fields a client selected into the list of model columns a
+resolver actually needs, so narrow queries skip wide columns such as
+TextFields.
+
+Example usage:
+    @strawberry.field
+    async def examples(self, info: Info) -> ExampleConnection:
+        columns = get_only_fields(info, ExampleModel, path=("edges", "node"))
+        queryset = ExampleModel.objects.only(*columns)
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Type
+
+from django.db.models import Model
+from graphql import FieldNode, FragmentDefinitionNode, InlineFragmentNode, SelectionSetNode
+from strawberry.types import Info
+
+
+def _flatten(
+    selection_sets: Iterable[Optional[SelectionSetNode]],
+    fragments: Dict[str, FragmentDefinitionNode],
+) -> Iterator[FieldNode]:
+    """Yield selected fields, looking through inline fragments and fragment spreads"""
+    for selection_set in selection_sets:
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from _flatten([selection.selection_set], fragments)
+            elif selection.name.value in fragments:
+                yield from _flatten([fragments[selection.name.value].selection_set], fragments)
+
+
+def selected_fields(info: Info, path: Sequence[str] = ()) -> List[FieldNode]:
+    """
+    Field nodes selected under the current field, after walking down
+    `path` (e.g. ("edges", "node") for a Relay connection). Works on
+    graphql-core nodes: Strawberry's `info.selected_fields` can't convert
+    inline fragments without a type condition (`... @defer { name }`).
+    """
+    raw_info = info._raw_info
+    fields = list(_flatten((node.selection_set for node in raw_info.field_nodes), raw_info.fragments))
+    for name in path:
+        fields = list(
+            _flatten(
+                (field.selection_set for field in fields if field.name.value == name),
+                raw_info.fragments,
+            )
+        )
+    return fields
+
+
+def selected_field_names(info: Info, path: Sequence[str] = ()) -> Set[str]:
+    """
+    Names of the fields selected under the current field, after walking
+    down `path` (e.g. ("edges", "node") for a Relay connection)
+    """
+    return {field.name.value for field in selected_fields(info, path)}
+
+
+def get_only_fields(
+    info: Info,
+    model: Type[Model],
+    path: Sequence[str] = (),
+    required: Sequence[str] = ("id",),
+    field_map: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    """
+    Model columns needed to resolve the current selection, suitable for
+    `QuerySet.only()` / `QuerySet.values()`. `required` columns are always
+    included (primary key, cursor fields, ...); `field_map` maps GraphQL
+    field names that differ from the model field name. Selected fields
+    without a matching concrete column are ignored.
+    """
+    field_map = field_map or {}
+    concrete = {field.name for field in model._meta.concrete_fields}
+    columns = set(required)
+    for name in selected_field_names(info, path):
+        name = field_map.get(name, name)
+        if name in concrete:
+            columns.add(name)
+    return sorted(columns)
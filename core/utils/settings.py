@@ -2,6 +2,8 @@ import logging
 import os
 from typing import Optional
 
+import django
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,3 +37,45 @@ def getvar(key, default=None, required=True):
     elif value == "False":
         return False
     return value
+
+
+def configure_database(
+    database: dict,
+    mode: str,
+    conn_max_age: int = 60,
+    health_checks: bool = True,
+    pool_min_size: int = 2,
+    pool_max_size: int = 8,
+    pool_timeout: float = 10.0,
+) -> dict:
+    """Apply a DATABASE_POOL_MODE to a DATABASES entry
+    Modes:
+        none: a new connection for every request / ORM call
+        persistent: connections are kept for `conn_max_age` seconds and
+            health-checked before reuse
+        pool: psycopg 3 connection pool (PostgreSQL on Django 5.1+,
+            `persistent` otherwise)
+    Returns:
+        the updated `database` dict
+    """
+    if mode not in ("none", "persistent", "pool"):
+        raise ValueError(f"Unknown DATABASE_POOL_MODE: {mode}")
+
+    if mode == "pool" and django.VERSION < (5, 1):
+        # OPTIONS["pool"] would reach psycopg.connect() as a connection option
+        logger.warning("DATABASE_POOL_MODE=pool needs Django 5.1+, using persistent connections")
+        mode = "persistent"
+
+    database["CONN_HEALTH_CHECKS"] = health_checks and mode != "none"
+    if mode == "pool" and database["ENGINE"] == "django.db.backends.postgresql":
+        # Connections go back to the pool when Django closes them
+        database["CONN_MAX_AGE"] = 0
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": pool_min_size,
+            "max_size": pool_max_size,
+            "timeout": pool_timeout,
+        }
+    else:
+        database["CONN_MAX_AGE"] = conn_max_age if mode != "none" else 0
+        database.get("OPTIONS", {}).pop("pool", None)
+    return database
@@ -0,0 +1,74 @@
+"""
+Test helpers
+
+Query budgets keep N+1 regressions out: a test runs an operation
+against the schema and fails when it needs more SQL statements than
+allowed, or repeats one statement (see core/utils/queries.py).
+
+Example usage:
+    from core.utils.testing import assert_query_budget
+
+    @pytest.mark.django_db(transaction=True)
+    def test_examples_query_budget():
+        assert_query_budget(
+            "{ examples(first: 20) { edges { node { id name } } } }",
+            max_queries=2,
+        )
+
+ORM calls run on the database thread pool, outside the transaction
+pytest-django opens around each test, so tests need `transaction=True`
+to see their own rows.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from strawberry.types import ExecutionResult
+
+from core.utils.queries import QueryStats
+
+
+async def execute_counting_queries(
+    query: str,
+    variables: Optional[Dict[str, Any]] = None,
+    operation_name: Optional[str] = None,
+) -> Tuple[ExecutionResult, QueryStats]:
+    """Execute an operation with a request-like context, returning its QueryStats"""
+    from core.asgi import get_context
+    from core.schema import schema
+
+    context = await get_context()
+    result = await schema.execute(
+        query,
+        variable_values=variables,
+        context_value=context,
+        operation_name=operation_name,
+    )
+    return result, context["queries"]
+
+
+def assert_query_budget(
+    query: str,
+    max_queries: int,
+    variables: Optional[Dict[str, Any]] = None,
+    operation_name: Optional[str] = None,
+    allow_repeated: bool = False,
+) -> ExecutionResult:
+    """
+    Execute a Query or Mutation operation and fail if it errors, runs
+    more than `max_queries` SQL statements or (unless `allow_repeated`)
+    runs one statement GRAPHQL_QUERY_REPEAT_THRESHOLD times or more
+    """
+    result, stats = async_to_sync(execute_counting_queries)(query, variables, operation_name)
+    assert not result.errors, f"Operation failed: {result.errors}"
+
+    statements = "\n".join(
+        f"  {count} x {statement}" for statement, count in stats.statements.most_common()
+    )
+    assert stats.count <= max_queries, (
+        f"{stats.count} SQL statements run, budget is {max_queries}:\n{statements}"
+    )
+    repeated = stats.repeated()
+    assert allow_repeated or not repeated, (
+        f"Statements repeated {repeated[0][1]} times (likely N+1):\n{statements}"
+    )
+    return result
@@ -0,0 +1,227 @@
+"""
+GraphQL operation metrics and tracing
+
+MetricsExtension exports, labelled by operation name:
+    graphql_operation_duration_seconds  whole operation
+    graphql_phase_duration_seconds      parse / validate / execute
+    graphql_resolver_duration_seconds   Query / Mutation root fields
+    graphql_errors_total                errors by code
+
+Operation names come from clients, so only the first
+GRAPHQL_METRICS_MAX_OPERATIONS distinct names get their own series;
+later ones are reported as "other", unnamed operations as "anonymous".
+
+Spans: GRAPHQL_TRACING turns on Strawberry's OpenTelemetry extension
+(operation, parsing, validation and resolver spans). It needs the
+optional `opentelemetry-sdk` package (`poetry install -E tracing`):
+    "memory"  - keep spans in an InMemorySpanExporter, see get_span_exporter()
+    "console" - print spans to stdout
+    "global"  - use the tracer provider configured by the deployment
+                (e.g. `opentelemetry-instrument` with an OTLP exporter)
+"""
+import threading
+import time
+from inspect import isawaitable
+from typing import Any, Dict, List, Optional, Set
+
+from django.conf import settings
+from graphql.utilities.get_operation_ast import get_operation_ast
+from prometheus_client import Counter, Histogram
+from strawberry.extensions import SchemaExtension
+
+GRAPHQL_OPERATION_DURATION = Histogram(
+    "graphql_operation_duration_seconds",
+    "Duration of GraphQL operations",
+    ["operation_name", "operation_type"],
+)
+GRAPHQL_PHASE_DURATION = Histogram(
+    "graphql_phase_duration_seconds",
+    "Duration of the parse, validate and execute phases of GraphQL operations",
+    ["operation_name", "phase"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+GRAPHQL_RESOLVER_DURATION = Histogram(
+    "graphql_resolver_duration_seconds",
+    "Duration of Query and Mutation root field resolvers",
+    ["operation_name", "parent_type", "field"],
+)
+GRAPHQL_ERRORS = Counter(
+    "graphql_errors_total",
+    "Errors returned by GraphQL operations",
+    ["operation_name", "code"],
+)
+
+ROOT_TYPES = ("Query", "Mutation")
+
+_operation_names: Set[str] = set()
+_operation_names_lock = threading.Lock()
+
+
+def operation_label(name: Optional[str]) -> str:
+    """Bounded-cardinality label for a client supplied operation name"""
+    if not name:
+        return "anonymous"
+    if name in _operation_names:
+        return name
+    with _operation_names_lock:
+        if len(_operation_names) >= settings.GRAPHQL_METRICS_MAX_OPERATIONS:
+            return "other"
+        _operation_names.add(name)
+    return name
+
+
+def get_operation_label(execution_context) -> str:
+    """Metric label of the operation of `execution_context`"""
+    name = execution_context.operation_name
+    if name is None and execution_context.graphql_document is not None:
+        operation = get_operation_ast(execution_context.graphql_document)
+        name = operation.name.value if operation and operation.name else None
+    return operation_label(name)
+
+
+def error_code(error: Any) -> str:
+    code = (getattr(error, "extensions", None) or {}).get("code")
+    if code:
+        return str(code)
+    # Resolver errors carry the path of the field that raised
+    return "RESOLVER_ERROR" if getattr(error, "path", None) else "REQUEST_ERROR"
+
+
+class MetricsExtension(SchemaExtension):
+    """
+    Prometheus metrics per operation, phase and root resolver.
+    Pass the class (not an instance) to the schema so every operation
+    gets its own extension state.
+    """
+
+    def __init__(self, *, execution_context=None) -> None:
+        super().__init__(execution_context=execution_context)
+        self.phases: Dict[str, float] = {}
+        self.label: Optional[str] = None
+
+    def get_label(self) -> str:
+        if self.label is None:
+            self.label = get_operation_label(self.execution_context)
+        return self.label
+
+    def get_operation_type(self) -> str:
+        if self.execution_context.graphql_document is None:
+            return "unknown"
+        try:
+            return self.execution_context.operation_type.value
+        except RuntimeError:
+            return "unknown"
+
+    def get_errors(self) -> List[Any]:
+        execution_context = self.execution_context
+        result = execution_context.result
+        if result is not None and result.errors:
+            return list(result.errors)
+        return list(execution_context.errors or [])
+
+    def on_operation(self):
+        started = time.perf_counter()
+        yield
+        duration = time.perf_counter() - started
+        label = self.get_label()
+        GRAPHQL_OPERATION_DURATION.labels(
+            operation_name=label, operation_type=self.get_operation_type()
+        ).observe(duration)
+        for phase, seconds in self.phases.items():
+            GRAPHQL_PHASE_DURATION.labels(operation_name=label, phase=phase).observe(seconds)
+        for error in self.get_errors():
+            GRAPHQL_ERRORS.labels(operation_name=label, code=error_code(error)).inc()
+
+    def on_parse(self):
+        started = time.perf_counter()
+        yield
+        self.phases["parse"] = time.perf_counter() - started
+
+    def on_validate(self):
+        started = time.perf_counter()
+        yield
+        self.phases["validate"] = time.perf_counter() - started
+
+    def on_execute(self):
+        started = time.perf_counter()
+        yield
+        self.phases["execute"] = time.perf_counter() - started
+
+    def resolve(self, _next, root, info, *args, **kwargs) -> Any:
+        # Only root fields: nested fields would multiply the series
+        if info.path.prev is not None or info.parent_type.name not in ROOT_TYPES:
+            return _next(root, info, *args, **kwargs)
+
+        # Strawberry builds its resolver middleware from the extensions of
+        # the first operation, so nothing per-operation is read from self
+        operation = info.operation
+        labels = {
+            "operation_name": operation_label(operation.name.value if operation.name else None),
+            "parent_type": info.parent_type.name,
+            "field": info.field_name,
+        }
+        started = time.perf_counter()
+        try:
+            result = _next(root, info, *args, **kwargs)
+        except BaseException:
+            GRAPHQL_RESOLVER_DURATION.labels(**labels).observe(time.perf_counter() - started)
+            raise
+        if isawaitable(result):
+            return self.await_resolver(result, labels, started)
+        GRAPHQL_RESOLVER_DURATION.labels(**labels).observe(time.perf_counter() - started)
+        return result
+
+    @staticmethod
+    async def await_resolver(result: Any, labels: Dict[str, str], started: float) -> Any:
+        try:
+            return await result
+        finally:
+            GRAPHQL_RESOLVER_DURATION.labels(**labels).observe(time.perf_counter() - started)
+
+
+_span_exporter = None
+
+
+def get_span_exporter():
+    """The InMemorySpanExporter used when GRAPHQL_TRACING is "memory" """
+    return _span_exporter
+
+
+def get_tracing_extensions() -> list:
+    """
+    Schema extensions producing OpenTelemetry spans, empty when
+    GRAPHQL_TRACING is off. Installs the tracer provider it asks for.
+    """
+    global _span_exporter
+    mode = settings.GRAPHQL_TRACING
+    if not mode:
+        return []
+    if mode not in ("memory", "console", "global"):
+        raise ValueError(f"Unknown GRAPHQL_TRACING: {mode}")
+
+    from strawberry.extensions.tracing import OpenTelemetryExtension
+
+    if mode != "global":
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import (
+            BatchSpanProcessor,
+            ConsoleSpanExporter,
+            SimpleSpanProcessor,
+        )
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+            InMemorySpanExporter,
+        )
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.APPLICATION_NAME})
+        )
+        if mode == "memory":
+            _span_exporter = InMemorySpanExporter()
+            provider.add_span_processor(SimpleSpanProcessor(_span_exporter))
+        else:
+            provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+        trace.set_tracer_provider(provider)
+
+    return [OpenTelemetryExtension]
@@ -1,12 +1,35 @@
+import gc
 import logging
+import math
 import multiprocessing
 import os
 
-WORKERS = os.getenv("WORKERS", multiprocessing.cpu_count() * 2 + 1)
+
+def available_cpus() -> int:
+    """CPUs this process may use: its CPU set, capped by a cgroup v2 CPU quota"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = multiprocessing.cpu_count()
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+# Uvicorn workers serve many requests concurrently on one event loop, so
+# one per CPU keeps every core busy; more only adds memory and pools
+WORKERS = int(os.getenv("WORKERS", available_cpus()))
 TIMEOUT = os.getenv("APPLICATION_TIMEOUT", 30)
 BIND_PORT = os.getenv("PORT", 8000)
 BIND_HOST = os.getenv("BIND", "0.0.0.0")
-LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Import the application once in the master and fork the workers from it
+PRELOAD_APP = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
 
 logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger("GUNICORN_CONFIGURATION")
@@ -14,6 +37,7 @@ logger.info("APPLICATION_WORKERS: %s", WORKERS)
 logger.info("APPLICATION_TIMEOUT: %s", TIMEOUT)
 logger.info("APPLICATION_BIND: %s", f"{BIND_HOST}:{BIND_PORT}")
 logger.info("APPLICATION_LOG_LEVEL: %s", LOG_LEVEL)
+logger.info("APPLICATION_PRELOAD: %s", PRELOAD_APP)
 
 bind = f"{BIND_HOST}:{BIND_PORT}"
 workers = WORKERS
@@ -23,3 +47,23 @@ accesslog = "-"
 errorlog = "-"
 loglevel = LOG_LEVEL
 worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = PRELOAD_APP
+
+if PRELOAD_APP:
+    # Collections while importing leave freed holes in the pages the
+    # workers will share; gc.freeze() runs before forking instead
+    gc.disable()
+
+
+def when_ready(server):
+    """Runs in the master once the application is loaded, before forking"""
+    if not PRELOAD_APP:
+        return
+    from core.utils.db import close_database_connections
+
+    # Workers open their own connections after fork
+    close_database_connections()
+    # Move everything imported so far out of the collector's reach: the
+    # workers' collections then never write to (and copy) shared pages
+    gc.freeze()
+    gc.enable()